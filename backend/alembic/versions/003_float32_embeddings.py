@@ -0,0 +1,55 @@
+"""Store video embeddings as packed float32 bytes
+
+Revision ID: 003
+Revises: 002
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import numpy as np
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '003'
+down_revision = '002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('videos', sa.Column('embedding_f32', sa.LargeBinary(), nullable=True))
+    # float4send() yields the big-endian bytes that Float32Vector decodes
+    op.execute("""
+        UPDATE videos SET embedding_f32 = (
+            SELECT string_agg(float4send(x::float4), ''::bytea ORDER BY i)
+            FROM unnest(embedding) WITH ORDINALITY AS t(x, i)
+        )
+        WHERE embedding IS NOT NULL
+    """)
+    op.drop_column('videos', 'embedding')
+    op.alter_column('videos', 'embedding_f32', new_column_name='embedding')
+
+
+def downgrade() -> None:
+    op.add_column('videos', sa.Column('embedding_f8', postgresql.ARRAY(sa.Float()), nullable=True))
+    # Postgres has no SQL-callable float4recv(), so unpack in batches here
+    conn = op.get_bind()
+    last_id = 0
+    while True:
+        rows = conn.execute(
+            sa.text("SELECT id, embedding FROM videos WHERE id > :last_id AND embedding IS NOT NULL "
+                    "ORDER BY id LIMIT 1000"),
+            {"last_id": last_id}
+        ).all()
+        if not rows:
+            break
+        conn.execute(
+            sa.text("UPDATE videos SET embedding_f8 = :embedding WHERE id = :id").bindparams(
+                sa.bindparam("embedding", type_=postgresql.ARRAY(sa.Float()))
+            ),
+            [{"id": row[0], "embedding": np.frombuffer(row[1], dtype=">f4").tolist()} for row in rows]
+        )
+        last_id = rows[-1][0]
+    op.drop_column('videos', 'embedding')
+    op.alter_column('videos', 'embedding_f8', new_column_name='embedding')
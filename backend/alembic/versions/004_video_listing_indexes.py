@@ -0,0 +1,37 @@
+"""Add full-text search vector and keyset pagination index to videos
+
+Revision ID: 004
+Revises: 003
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '004'
+down_revision = '003'
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
+def upgrade() -> None:
+    # Stored generated column (Postgres 12+); adding it rewrites the table once
+    op.add_column(
+        'videos',
+        sa.Column('search_vector', postgresql.TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True))
+    )
+    op.create_index('ix_videos_search_vector', 'videos', ['search_vector'], postgresql_using='gin')
+    op.create_index('ix_videos_created_at_id', 'videos', ['created_at', 'id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_videos_created_at_id', table_name='videos')
+    op.drop_index('ix_videos_search_vector', table_name='videos')
+    op.drop_column('videos', 'search_vector')
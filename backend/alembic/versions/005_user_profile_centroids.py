@@ -0,0 +1,29 @@
+"""Add interest centroids to user profiles
+
+Revision ID: 005
+Revises: 004
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '005'
+down_revision = '004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled in lazily by the recommender when USER_PROFILE_CENTROIDS > 1
+    op.add_column('user_profiles', sa.Column('centroids', sa.LargeBinary(), nullable=True))
+    op.add_column('user_profiles', sa.Column('centroid_weights', postgresql.ARRAY(sa.Float()), nullable=True))
+    op.add_column('user_profiles', sa.Column('centroids_watch_count', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('user_profiles', 'centroids_watch_count')
+    op.drop_column('user_profiles', 'centroid_weights')
+    op.drop_column('user_profiles', 'centroids')
@@ -0,0 +1,23 @@
+"""Index videos.updated_at for incremental metadata refreshes
+
+Revision ID: 007
+Revises: 006
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = '007'
+down_revision = '006'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # VideoMetadataStore.refresh re-reads rows with updated_at past its last load
+    op.create_index(op.f('ix_videos_updated_at'), 'videos', ['updated_at'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_videos_updated_at'), table_name='videos')
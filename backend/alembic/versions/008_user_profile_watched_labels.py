@@ -0,0 +1,45 @@
+"""Store watched categories and tags with user profiles
+
+Revision ID: 008
+Revises: 007
+Create Date: 2026-10-17 00:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '008'
+down_revision = '007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('user_profiles', sa.Column(
+        'watched_categories', postgresql.ARRAY(sa.String()), nullable=False, server_default='{}'
+    ))
+    op.add_column('user_profiles', sa.Column(
+        'watched_tags', postgresql.ARRAY(sa.String()), nullable=False, server_default='{}'
+    ))
+    # Existing profiles start from their full watch history; watches merge into them from now on
+    op.execute("""
+        UPDATE user_profiles AS p SET
+            watched_categories = coalesce((
+                SELECT array_agg(DISTINCT v.category ORDER BY v.category)
+                FROM watch_history AS w JOIN videos AS v ON v.id = w.video_id
+                WHERE w.user_id = p.user_id AND v.category IS NOT NULL
+            ), '{}'),
+            watched_tags = coalesce((
+                SELECT array_agg(DISTINCT t.tag ORDER BY t.tag)
+                FROM watch_history AS w JOIN videos AS v ON v.id = w.video_id
+                CROSS JOIN LATERAL unnest(v.tags) AS t(tag)
+                WHERE w.user_id = p.user_id
+            ), '{}')
+    """)
+
+
+def downgrade() -> None:
+    op.drop_column('user_profiles', 'watched_tags')
+    op.drop_column('user_profiles', 'watched_categories')
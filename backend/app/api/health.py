@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from app.core.redis_client import redis_client
+from app.core.redis_client import async_redis_client
 
 router = APIRouter()
 
@@ -9,7 +9,7 @@ async def health_check():
     """Health check endpoint"""
     # Check Redis connection
     try:
-        redis_client.ping()
+        await async_redis_client.ping()
         redis_status = "connected"
     except:
         redis_status = "disconnected"
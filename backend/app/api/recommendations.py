@@ -1,76 +1,206 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
-from app.core.database import get_db
-from app.core.redis_client import get_cache, set_cache
-from app.schemas.recommendation import RecommendationResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import undefer
+from app.core.database import get_async_db
+from app.core.executor import run_cpu_bound
+from app.core.redis_client import (
+    get_cache_many_async, set_cache_async, set_cache_many_async,
+    get_user_cache_versions_async,
+    recommendations_cache_key, precomputed_recommendations_key
+)
+from app.schemas.recommendation import (
+    RecommendationResponse, BatchRecommendationRequest, BatchRecommendationResponse
+)
+from app.ml.metrics import recommendation_metrics
 from app.ml.recommender import recommendation_service
+from app.ml.popularity import popularity_service
+from app.ml.video_metadata import VideoFilter, video_metadata
 from app.core.config import settings
 from typing import Optional
 
 router = APIRouter()
 
 
+def from_precomputed(
+    user_id: int,
+    cached: Optional[dict],
+    limit: int,
+    exclude_watched: bool
+) -> Optional[RecommendationResponse]:
+    """Serve a request from an offline-computed list if it can satisfy it"""
+    if not cached or cached.get("exclude_watched") != exclude_watched:
+        return None
+    
+    # A shorter list than requested is only complete if the job wasn't truncated by its own limit
+    recommendations = cached["recommendations"]
+    if len(recommendations) < limit and len(recommendations) >= cached["limit"]:
+        return None
+    
+    recommendations = recommendations[:limit]
+    return RecommendationResponse(
+        user_id=user_id,
+        recommendations=recommendations,
+        total=len(recommendations)
+    )
+
+
 @router.get("/user/{user_id}", response_model=RecommendationResponse)
 async def get_recommendations(
     user_id: int,
     limit: int = Query(default=10, ge=1, le=50),
     exclude_watched: bool = Query(default=True),
-    db: Session = Depends(get_db)
+    category: Optional[str] = Query(default=None),
+    min_duration: Optional[int] = Query(default=None, ge=0, description="Minimum duration in seconds"),
+    max_duration: Optional[int] = Query(default=None, ge=0, description="Maximum duration in seconds"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get video recommendations for a user"""
-    # Check cache
-    cache_key = f"recommendations:user:{user_id}:limit:{limit}:exclude:{exclude_watched}"
-    cached = get_cache(cache_key)
+    """Get video recommendations for a user, optionally only of one category and/or duration range"""
+    video_filter = VideoFilter(category, min_duration, max_duration)
+    
+    # Check cache (keys embed the user's version, bumped on every watch)
+    version = (await get_user_cache_versions_async([user_id]))[user_id]
+    cache_key = recommendations_cache_key(user_id, version, limit, exclude_watched, video_filter)
+    cached, precomputed = await get_cache_many_async(
+        [cache_key, precomputed_recommendations_key(user_id, version)]
+    )
     if cached:
         return RecommendationResponse(**cached)
     
+    # Precomputed lists are unfiltered
+    precomputed = None if video_filter.active else from_precomputed(user_id, precomputed, limit, exclude_watched)
+    if precomputed:
+        return precomputed
+    
     # Get recommendations
-    recommendations = recommendation_service.get_recommendations(
+    recommendations = (await recommendation_service.get_recommendations_batch_async(
         db=db,
-        user_id=user_id,
+        user_ids=[user_id],
         limit=limit,
-        exclude_watched=exclude_watched
-    )
+        exclude_watched=exclude_watched,
+        video_filter=video_filter
+    ))[0]
     
     # Cache results
-    set_cache(cache_key, recommendations.model_dump(), ttl=settings.CACHE_TTL)
+    await set_cache_async(cache_key, recommendations.model_dump(), ttl=settings.CACHE_TTL)
     
     return recommendations
 
 
+@router.post("/batch", response_model=BatchRecommendationResponse)
+async def get_recommendations_batch(
+    request: BatchRecommendationRequest,
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get video recommendations for many users in one request"""
+    user_ids = list(dict.fromkeys(request.user_ids))
+    video_filter = VideoFilter(request.category, request.min_duration, request.max_duration)
+    versions = await get_user_cache_versions_async(user_ids)
+    cache_keys = {
+        user_id: recommendations_cache_key(
+            user_id, versions[user_id], request.limit, request.exclude_watched, video_filter
+        )
+        for user_id in user_ids
+    }
+    
+    # Serve cached users, compute the rest together
+    values = await get_cache_many_async(
+        [cache_keys[user_id] for user_id in user_ids] +
+        [precomputed_recommendations_key(user_id, versions[user_id]) for user_id in user_ids]
+    )
+    results = {}
+    for user_id, cached, precomputed in zip(user_ids, values[:len(user_ids)], values[len(user_ids):]):
+        if cached:
+            results[user_id] = RecommendationResponse(**cached)
+            continue
+        
+        # Precomputed lists are unfiltered
+        if video_filter.active:
+            continue
+        precomputed = from_precomputed(user_id, precomputed, request.limit, request.exclude_watched)
+        if precomputed:
+            results[user_id] = precomputed
+    
+    missing_user_ids = [user_id for user_id in user_ids if user_id not in results]
+    if missing_user_ids:
+        computed = await recommendation_service.get_recommendations_batch_async(
+            db=db,
+            user_ids=missing_user_ids,
+            limit=request.limit,
+            exclude_watched=request.exclude_watched,
+            video_filter=video_filter
+        )
+        for recommendations in computed:
+            results[recommendations.user_id] = recommendations
+        await set_cache_many_async(
+            {cache_keys[r.user_id]: r.model_dump() for r in computed},
+            ttl=settings.CACHE_TTL
+        )
+    
+    return BatchRecommendationResponse(
+        results=[results[user_id] for user_id in user_ids],
+        total=len(user_ids)
+    )
+
+
+@router.get("/popular")
+async def get_popular_videos(
+    category: Optional[str] = Query(default=None),
+    limit: int = Query(default=10, ge=1, le=50),
+    db: AsyncSession = Depends(get_async_db)
+):
+    """Get the most popular videos, optionally within one category"""
+    await popularity_service.ensure_loaded()
+    recommendations = await db.run_sync(popularity_service.get_popular, limit, category)
+    return {
+        "category": category,
+        "recommendations": recommendations,
+        "total": len(recommendations)
+    }
+
+
+@router.get("/metrics")
+async def get_recommendation_metrics():
+    """How this worker process served personalized recommendations (backfill rate, over-fetch)"""
+    return recommendation_metrics.snapshot()
+
+
 @router.get("/similar/{video_id}")
 async def get_similar_videos(
     video_id: int,
     limit: int = Query(default=10, ge=1, le=50),
-    db: Session = Depends(get_db)
+    category: Optional[str] = Query(default=None),
+    min_duration: Optional[int] = Query(default=None, ge=0, description="Minimum duration in seconds"),
+    max_duration: Optional[int] = Query(default=None, ge=0, description="Maximum duration in seconds"),
+    db: AsyncSession = Depends(get_async_db)
 ):
-    """Get videos similar to a specific video"""
+    """Get videos similar to a specific video, optionally only of one category and/or duration range"""
     from app.models.video import Video
     from app.schemas.video import VideoResponse
     from app.ml.faiss_index import faiss_index
-    import numpy as np
     
     # Get video
-    video = db.query(Video).filter(Video.id == video_id).first()
+    video = await db.get(Video, video_id, options=[undefer(Video.embedding)])
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     
     # Check if video has embedding
-    if not video.embedding:
-        from app.ml.recommender import recommendation_service
-        recommendation_service.update_video_embedding(db, video_id)
-        video = db.query(Video).filter(Video.id == video_id).first()
+    if video.embedding is None:
+        await recommendation_service.update_video_embedding_async(db, video_id)
     
-    # Search for similar videos
-    embedding = np.array(video.embedding)
-    similar_videos = faiss_index.search(embedding, k=limit + 1)  # +1 to exclude self
+    # Search for similar videos, excluding the video itself and any not passing the filter
+    id_filter = await db.run_sync(video_metadata.bitmap, VideoFilter(category, min_duration, max_duration))
+    similar_videos = await run_cpu_bound(
+        faiss_index.search, video.embedding, k=limit, exclude_ids=[video_id], id_filter=id_filter
+    )
     
-    # Filter out the same video and format
+    # Format
+    candidates = await db.run_sync(
+        recommendation_service.hydrate_videos,
+        [vid_id for vid_id, _ in similar_videos]
+    )
     results = []
     for vid_id, similarity in similar_videos:
-        if vid_id == video_id:
-            continue
-        similar_video = db.query(Video).filter(Video.id == vid_id).first()
+        similar_video = candidates.get(vid_id)
         if similar_video:
             results.append({
                 "video": VideoResponse.model_validate(similar_video),
@@ -84,4 +214,3 @@ async def get_similar_videos(
         "similar_videos": results,
         "total": len(results)
     }
-
@@ -15,7 +15,7 @@ def get_password_hash(password: str) -> str:
 
 
 @router.post("/", response_model=UserResponse)
-async def create_user(user: UserCreate, db: Session = Depends(get_db)):
+def create_user(user: UserCreate, db: Session = Depends(get_db)):
     """Create a new user"""
     # Check if user exists
     db_user = db.query(User).filter(User.username == user.username).first()
@@ -41,7 +41,7 @@ async def create_user(user: UserCreate, db: Session = Depends(get_db)):
 
 
 @router.get("/{user_id}", response_model=UserResponse)
-async def get_user(user_id: int, db: Session = Depends(get_db)):
+def get_user(user_id: int, db: Session = Depends(get_db)):
     """Get user by ID"""
     user = db.query(User).filter(User.id == user_id).first()
     if not user:
@@ -50,7 +50,7 @@ async def get_user(user_id: int, db: Session = Depends(get_db)):
 
 
 @router.get("/", response_model=List[UserResponse])
-async def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+def get_users(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
     """Get all users"""
     users = db.query(User).offset(skip).limit(limit).all()
     return users
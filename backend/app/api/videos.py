@@ -1,17 +1,77 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import base64
+from datetime import datetime, timezone
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import TypeAdapter, ValidationError
+from sqlalchemy import func, tuple_
+from sqlalchemy.orm import Query as ORMQuery, Session, load_only
 from app.core.database import get_db
 from app.core.redis_client import get_cache, set_cache
-from app.schemas.video import VideoCreate, VideoResponse
-from app.models.video import Video
-from app.ml.recommender import recommendation_service
-from typing import List, Optional
+from app.schemas.video import VideoCreate, VideoResponse, VideoPage
+from app.schemas.watch_history import WatchEventCreate, WatchEventBatchResponse
+from app.models.video import Video, VIDEO_RESPONSE_COLUMNS
+from app.ml.ingestion import ingestion_worker
+from app.ml.watch_events import WatchEvent, watch_event_writer
+from typing import AsyncIterator, List, Optional, Tuple
 
 router = APIRouter()
 
+NDJSON_MEDIA_TYPES = ("application/x-ndjson", "application/jsonl")
+# Suggested wait before resending watch events refused because the write queue was full
+WATCH_RETRY_AFTER_SECONDS = 1
+watch_event_list = TypeAdapter(List[WatchEventCreate])
+
+
+def encode_cursor(video: Video) -> str:
+    """Opaque cursor for the (created_at, id) position after video"""
+    raw = f"{video.created_at.isoformat()}|{video.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Inverse of encode_cursor; raises 400 for anything else"""
+    try:
+        created_at, video_id = base64.urlsafe_b64decode(cursor.encode()).decode().rsplit("|", 1)
+        return datetime.fromisoformat(created_at), int(video_id)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def filter_videos(
+    db: Session,
+    category: Optional[str],
+    search: Optional[str],
+    q: Optional[str] = None
+) -> ORMQuery:
+    """Videos matching the listing filters, loading only the columns VideoResponse serializes
+    
+    Args:
+        db: Database session
+        category: Exact category
+        search: Case-insensitive substring of title or description
+        q: Full-text query (websearch syntax) over title and description
+    
+    Returns:
+        Unordered query over the matching videos
+    """
+    query = db.query(Video).options(load_only(*VIDEO_RESPONSE_COLUMNS))
+    
+    if category:
+        query = query.filter(Video.category == category)
+    
+    if search:
+        # Substring match, served by the pg_trgm indexes from migration 006
+        query = query.filter(Video.title.ilike(f"%{search}%") | Video.description.ilike(f"%{search}%"))
+    
+    if q:
+        # Full-text match on title and description, served by the GIN index
+        query = query.filter(Video.search_vector.op("@@")(func.websearch_to_tsquery("english", q)))
+    
+    return query
+
 
 @router.post("/", response_model=VideoResponse)
-async def create_video(video: VideoCreate, db: Session = Depends(get_db)):
+def create_video(video: VideoCreate, db: Session = Depends(get_db)):
     """Create a new video"""
     # Check if video_id already exists
     db_video = db.query(Video).filter(Video.video_id == video.video_id).first()
@@ -24,77 +84,172 @@ async def create_video(video: VideoCreate, db: Session = Depends(get_db)):
     db.commit()
     db.refresh(db_video)
     
-    # Generate embedding and add to FAISS index
-    recommendation_service.update_video_embedding(db, db_video.id)
+    # Embedding and index update happen in the background ingestion worker
+    ingestion_worker.enqueue(db_video.id)
     
     return db_video
 
 
+@router.get("/page", response_model=VideoPage)
+def get_videos_page(
+    limit: int = Query(default=20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    category: Optional[str] = None,
+    search: Optional[str] = None,
+    q: Optional[str] = None,
+    db: Session = Depends(get_db)
+):
+    """Get videos newest first, paginated by cursor instead of offset"""
+    query = filter_videos(db, category, search, q)
+    
+    # Seek past the last row of the previous page via the (created_at, id) index
+    if cursor:
+        created_at, video_id = decode_cursor(cursor)
+        query = query.filter(tuple_(Video.created_at, Video.id) < tuple_(created_at, video_id))
+    
+    videos = query.order_by(Video.created_at.desc(), Video.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(videos[limit - 1]) if len(videos) > limit else None
+    
+    return VideoPage(
+        videos=[VideoResponse.model_validate(video) for video in videos[:limit]],
+        next_cursor=next_cursor
+    )
+
+
 @router.get("/{video_id}", response_model=VideoResponse)
-async def get_video(video_id: int, db: Session = Depends(get_db)):
+def get_video(video_id: int, db: Session = Depends(get_db)):
     """Get video by ID"""
-    video = db.query(Video).filter(Video.id == video_id).first()
+    video = db.query(Video).options(
+        load_only(*VIDEO_RESPONSE_COLUMNS)
+    ).filter(Video.id == video_id).first()
     if not video:
         raise HTTPException(status_code=404, detail="Video not found")
     return video
 
 
 @router.get("/", response_model=List[VideoResponse])
-async def get_videos(
+def get_videos(
     skip: int = 0,
     limit: int = 100,
     category: Optional[str] = None,
     search: Optional[str] = None,
+    q: Optional[str] = None,
     db: Session = Depends(get_db)
 ):
-    """Get videos with optional filtering"""
-    query = db.query(Video)
-    
-    if category:
-        query = query.filter(Video.category == category)
-    
-    if search:
-        query = query.filter(
-            Video.title.ilike(f"%{search}%") |
-            Video.description.ilike(f"%{search}%")
-        )
-    
-    videos = query.order_by(Video.created_at.desc()).offset(skip).limit(limit).all()
+    """Get videos with optional filtering (offset pagination; prefer /page for deep pages)"""
+    query = filter_videos(db, category, search, q)
+    videos = query.order_by(Video.created_at.desc(), Video.id.desc()).offset(skip).limit(limit).all()
     return videos
 
 
 @router.post("/{video_id}/watch")
-async def record_watch(
+def record_watch(
     video_id: int,
     user_id: int,
     watch_duration: Optional[float] = None,
     watch_percentage: Optional[float] = None,
     db: Session = Depends(get_db)
 ):
-    """Record a video watch event"""
-    from app.models.watch_history import WatchHistory
+    """
+    Record a video watch event
     
-    video = db.query(Video).filter(Video.id == video_id).first()
-    if not video:
+    The view count, watch history row, profile update and cache invalidation
+    are written in the background by the watch event writer, within
+    WATCH_FLUSH_INTERVAL_SECONDS. The video lookup is the only round-trip here.
+    Answers 503 while the writer's queue is full.
+    """
+    if not db.query(Video.id).filter(Video.id == video_id).first():
         raise HTTPException(status_code=404, detail="Video not found")
     
-    # Update video views
-    video.views += 1
-    db.commit()
-    
-    # Record watch history
-    watch_history = WatchHistory(
+    recorded = watch_event_writer.record(WatchEvent(
         user_id=user_id,
         video_id=video_id,
         watch_duration=watch_duration,
-        watch_percentage=watch_percentage
-    )
-    db.add(watch_history)
-    db.commit()
-    
-    # Clear user recommendation cache
-    from app.core.redis_client import clear_user_cache
-    clear_user_cache(user_id)
+        watch_percentage=watch_percentage,
+        watched_at=datetime.now(timezone.utc)
+    ))
+    if not recorded:
+        raise watch_queue_full()
     
     return {"message": "Watch recorded", "video_id": video_id, "user_id": user_id}
 
+
+def watch_queue_full() -> HTTPException:
+    """503 for watch events the writer's queue has no room for"""
+    return HTTPException(status_code=503, detail="Watch event queue is full, retry later",
+                         headers={"Retry-After": str(WATCH_RETRY_AFTER_SECONDS)})
+
+
+def to_watch_event(event: WatchEventCreate) -> WatchEvent:
+    """Queue entry for a client-submitted event; naive timestamps are taken as UTC"""
+    watched_at = event.watched_at or datetime.now(timezone.utc)
+    if watched_at.tzinfo is None:
+        watched_at = watched_at.replace(tzinfo=timezone.utc)
+    return WatchEvent(
+        user_id=event.user_id,
+        video_id=event.video_id,
+        watch_duration=event.watch_duration,
+        watch_percentage=event.watch_percentage,
+        watched_at=watched_at
+    )
+
+
+async def iter_lines(request: Request) -> AsyncIterator[bytes]:
+    """Lines of a streamed request body, yielded as chunks arrive"""
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            yield line
+    if pending:
+        yield pending
+
+
+@router.post("/watch-events", response_model=WatchEventBatchResponse)
+async def record_watch_events(request: Request):
+    """
+    Record many watch events in one request
+    
+    The body is either a JSON array of events or NDJSON (Content-Type
+    application/x-ndjson, one event per line), which is queued line by line
+    as it streams in. Events are written by the watch event writer; those
+    for unknown videos or users are dropped at that point. An invalid JSON
+    array is rejected with 422, while malformed NDJSON lines are skipped and
+    counted.
+    
+    Once the writer's queue is full the remaining events are refused and
+    counted, so the client can resend the tail of its request; a request
+    of which nothing was accepted gets a 503.
+    """
+    accepted = 0
+    rejected = 0
+    refused = 0
+    
+    if request.headers.get("content-type", "").split(";")[0].strip() in NDJSON_MEDIA_TYPES:
+        async for line in iter_lines(request):
+            if not line.strip():
+                continue
+            try:
+                event = WatchEventCreate.model_validate_json(line)
+            except ValidationError:
+                rejected += 1
+                continue
+            if refused or not watch_event_writer.record(to_watch_event(event)):
+                refused += 1
+            else:
+                accepted += 1
+    else:
+        try:
+            events = watch_event_list.validate_json(await request.body())
+        except ValidationError as e:
+            raise RequestValidationError([{**error, "loc": ("body", *error["loc"])} for error in e.errors()])
+        for event in events:
+            if not watch_event_writer.record(to_watch_event(event)):
+                break
+            accepted += 1
+        refused = len(events) - accepted
+    
+    if refused and not accepted:
+        raise watch_queue_full()
+    return WatchEventBatchResponse(accepted=accepted, rejected=rejected, refused=refused)
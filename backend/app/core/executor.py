@@ -0,0 +1,21 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable
+from app.core.config import settings
+
+# FAISS and torch release the GIL, so threads give real parallelism here
+cpu_executor = ThreadPoolExecutor(
+    max_workers=settings.CPU_EXECUTOR_WORKERS,
+    thread_name_prefix="cpu-bound"
+)
+
+# Bounds queued + running work; ThreadPoolExecutor's own queue is unbounded
+_pending = asyncio.Semaphore(settings.CPU_EXECUTOR_MAX_PENDING)
+
+
+async def run_cpu_bound(fn: Callable[..., Any], *args, **kwargs) -> Any:
+    """Run CPU-bound work (FAISS search, model inference) without blocking the event loop"""
+    async with _pending:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(cpu_executor, partial(fn, *args, **kwargs))
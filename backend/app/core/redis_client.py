@@ -1,6 +1,7 @@
 import redis
+import redis.asyncio
 import json
-from typing import Optional, Any
+from typing import Optional, Any, Dict, List
 from app.core.config import settings
 
 redis_client = redis.from_url(
@@ -10,6 +11,13 @@ redis_client = redis.from_url(
     socket_timeout=5
 )
 
+async_redis_client = redis.asyncio.from_url(
+    settings.REDIS_URL,
+    decode_responses=True,
+    socket_connect_timeout=5,
+    socket_timeout=5
+)
+
 
 def get_cache(key: str) -> Optional[Any]:
     """Get value from Redis cache"""
@@ -23,6 +31,17 @@ def get_cache(key: str) -> Optional[Any]:
         return None
 
 
+def get_cache_many(keys: List[str]) -> List[Optional[Any]]:
+    """Get many values from Redis cache with a single MGET"""
+    if not keys:
+        return []
+    try:
+        return [json.loads(value) if value else None for value in redis_client.mget(keys)]
+    except Exception as e:
+        print(f"Redis mget error: {e}")
+        return [None] * len(keys)
+
+
 def set_cache(key: str, value: Any, ttl: int = settings.CACHE_TTL) -> bool:
     """Set value in Redis cache with TTL"""
     try:
@@ -37,6 +56,56 @@ def set_cache(key: str, value: Any, ttl: int = settings.CACHE_TTL) -> bool:
         return False
 
 
+def set_cache_many(items: Dict[str, Any], ttl: int = settings.CACHE_TTL) -> bool:
+    """Set many values in Redis cache with TTL using a single pipeline round-trip"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, ttl, json.dumps(value, default=str))
+        pipe.execute()
+        return True
+    except Exception as e:
+        print(f"Redis set many error: {e}")
+        return False
+
+
+def user_cache_version_key(user_id: int) -> str:
+    """Key of the counter embedded in all of a user's recommendation cache keys"""
+    return f"recommendations:user:{user_id}:version"
+
+
+def get_user_cache_versions(user_ids: List[int]) -> Dict[int, int]:
+    """Get cache versions for many users with a single MGET"""
+    if not user_ids:
+        return {}
+    try:
+        values = redis_client.mget([user_cache_version_key(user_id) for user_id in user_ids])
+        return {user_id: int(value or 0) for user_id, value in zip(user_ids, values)}
+    except Exception as e:
+        print(f"Redis version get error: {e}")
+        return {user_id: 0 for user_id in user_ids}
+
+
+def recommendations_cache_key(
+    user_id: int, version: int, limit: int, exclude_watched: bool, video_filter: Optional[Any] = None
+) -> str:
+    """Cache key for an online-computed recommendation response (video_filter: an optional VideoFilter)"""
+    key = f"recommendations:user:{user_id}:v{version}:limit:{limit}:exclude:{exclude_watched}"
+    if video_filter is not None and video_filter.active:
+        key += ":" + video_filter.cache_suffix()
+    return key
+
+
+def precomputed_recommendations_key(user_id: int, version: int) -> str:
+    """Cache key for the offline-computed recommendation list of a user"""
+    return f"recommendations:user:{user_id}:v{version}:precomputed"
+
+
+def popular_videos_key() -> str:
+    """Cache key for the precomputed popularity ranking shared by all workers"""
+    return "popular:videos"
+
+
 def delete_cache(key: str) -> bool:
     """Delete key from Redis cache"""
     try:
@@ -48,14 +117,71 @@ def delete_cache(key: str) -> bool:
 
 
 def clear_user_cache(user_id: int) -> bool:
-    """Clear all cache entries for a user"""
+    """
+    Invalidate all cache entries for a user
+    
+    Bumps the user's cache version in O(1); entries written under older
+    versions are never read again and expire through their TTL.
+    """
     try:
-        pattern = f"recommendations:user:{user_id}:*"
-        keys = redis_client.keys(pattern)
-        if keys:
-            redis_client.delete(*keys)
+        redis_client.incr(user_cache_version_key(user_id))
         return True
     except Exception as e:
         print(f"Redis clear cache error: {e}")
         return False
 
+
+def clear_user_caches(user_ids: List[int]) -> bool:
+    """Invalidate the cache of many users with one pipelined round-trip"""
+    if not user_ids:
+        return True
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.incr(user_cache_version_key(user_id))
+        pipe.execute()
+        return True
+    except Exception as e:
+        print(f"Redis clear cache error: {e}")
+        return False
+
+
+async def get_cache_many_async(keys: List[str]) -> List[Optional[Any]]:
+    """Get many values from Redis cache with a single MGET, without blocking the event loop"""
+    if not keys:
+        return []
+    try:
+        return [json.loads(value) if value else None for value in await async_redis_client.mget(keys)]
+    except Exception as e:
+        print(f"Redis mget error: {e}")
+        return [None] * len(keys)
+
+
+async def set_cache_async(key: str, value: Any, ttl: int = settings.CACHE_TTL) -> bool:
+    """Set value in Redis cache with TTL, without blocking the event loop"""
+    return await set_cache_many_async({key: value}, ttl)
+
+
+async def set_cache_many_async(items: Dict[str, Any], ttl: int = settings.CACHE_TTL) -> bool:
+    """Set many values in Redis cache with TTL using a single pipeline round-trip"""
+    try:
+        pipe = async_redis_client.pipeline(transaction=False)
+        for key, value in items.items():
+            pipe.setex(key, ttl, json.dumps(value, default=str))
+        await pipe.execute()
+        return True
+    except Exception as e:
+        print(f"Redis set many error: {e}")
+        return False
+
+
+async def get_user_cache_versions_async(user_ids: List[int]) -> Dict[int, int]:
+    """Get cache versions for many users with a single MGET"""
+    if not user_ids:
+        return {}
+    try:
+        values = await async_redis_client.mget([user_cache_version_key(user_id) for user_id in user_ids])
+        return {user_id: int(value or 0) for user_id, value in zip(user_ids, values)}
+    except Exception as e:
+        print(f"Redis version get error: {e}")
+        return {user_id: 0 for user_id in user_ids}
@@ -1,14 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.core.config import settings
 from app.api import recommendations, videos, users, health
+from app.ml.embeddings import embedding_service
+from app.ml.faiss_index import faiss_index
+from app.ml.ingestion import ingestion_worker
+from app.ml.recommender import recommendation_service
+from app.ml.watch_events import watch_event_writer
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the model and index before serving, so no request pays for it
+    if settings.WARM_UP_ON_STARTUP:
+        recommendation_service.warm_up()
+    embedding_service.cache.prune_other_models()
+    ingestion_worker.start()
+    watch_event_writer.start()
+    faiss_index.start_watcher()
+    yield
+    faiss_index.stop_watcher()
+    watch_event_writer.stop()
+    ingestion_worker.stop()
+
 
 app = FastAPI(
     title="Intelligent Video Recommendation API",
     description="YouTube-like recommendation system with ML-powered similarity search",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    lifespan=lifespan
 )
 
 # CORS middleware
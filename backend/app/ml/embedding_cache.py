@@ -0,0 +1,168 @@
+import hashlib
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
+import numpy as np
+
+
+class EmbeddingCache:
+    """
+    Two-tier cache of text embeddings keyed by a hash of model name + text
+
+    An in-process LRU sits in front of a SQLite file, so embeddings survive
+    restarts and are shared by all worker processes on the host. The file
+    is opened on first use and keeps at most max_rows rows: each write drops
+    the oldest written rows beyond the cap. prune_other_models() deletes the
+    rows of previous models; the app runs it at startup.
+    """
+
+    def __init__(self, model_name: str, dimension: int, max_entries: int = 10000,
+                 path: Optional[str] = None, max_rows: int = 0):
+        self.model_name = model_name
+        self.dimension = dimension
+        self.max_entries = max_entries
+        self.path = path
+        self.max_rows = max_rows
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn = None
+        self._connect_failed = False
+        self.hits = 0
+        self.misses = 0
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        """The SQLite connection, opened on first use (call under self._lock); None without a disk tier"""
+        if self._conn is None and self.path and not self._connect_failed:
+            try:
+                self._conn = self._connect(self.path)
+            except sqlite3.Error as e:
+                # Memory-only from here on rather than retrying on every call
+                self._connect_failed = True
+                print(f"Embedding cache error: {e}")
+        return self._conn
+
+    def _connect(self, path: str) -> sqlite3.Connection:
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL, model TEXT)"
+        )
+        if "model" not in [row[1] for row in conn.execute("PRAGMA table_info(embeddings)")]:
+            # Files from before rows recorded their model; prune_other_models() drops those rows
+            conn.execute("ALTER TABLE embeddings ADD COLUMN model TEXT")
+        conn.execute("CREATE TABLE IF NOT EXISTS cache_info (key TEXT PRIMARY KEY, value TEXT NOT NULL)")
+        conn.commit()
+        return conn
+
+    def prune_other_models(self) -> int:
+        """
+        Delete the rows of models other than the current one
+
+        Keys hash the model name, so those rows can never be hit again. The
+        file records the model it was last pruned for, so only the first
+        process to start after a model change scans the table.
+
+        Returns:
+            Number of rows deleted
+        """
+        with self._lock:
+            conn = self._connection()
+            if conn is None:
+                return 0
+            try:
+                row = conn.execute("SELECT value FROM cache_info WHERE key = 'model'").fetchone()
+                if row is not None and row[0] == self.model_name:
+                    return 0
+                deleted = conn.execute("DELETE FROM embeddings WHERE model IS NOT ?", (self.model_name,)).rowcount
+                conn.execute("INSERT OR REPLACE INTO cache_info (key, value) VALUES ('model', ?)", (self.model_name,))
+                conn.commit()
+            except sqlite3.Error as e:
+                print(f"Embedding cache error: {e}")
+                return 0
+        if deleted:
+            print(f"Embedding cache: dropped {deleted} embeddings of other models")
+        return deleted
+
+    def key(self, text: str) -> str:
+        """Cache key for a text under the current model"""
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: List[str]) -> Dict[str, np.ndarray]:
+        """
+        Look up embeddings, memory first, then disk
+
+        Args:
+            keys: Cache keys from key()
+
+        Returns:
+            Dict of key -> embedding for the keys that were found
+        """
+        found = {}
+        with self._lock:
+            for key in keys:
+                vector = self._memory.get(key)
+                if vector is not None:
+                    self._memory.move_to_end(key)
+                    found[key] = vector
+
+            missing = [key for key in dict.fromkeys(keys) if key not in found]
+            conn = self._connection() if missing else None
+            if conn is not None:
+                try:
+                    for start in range(0, len(missing), 500):
+                        chunk = missing[start:start + 500]
+                        rows = conn.execute(
+                            f"SELECT key, vector FROM embeddings WHERE key IN ({','.join('?' * len(chunk))})",
+                            chunk
+                        ).fetchall()
+                        for key, blob in rows:
+                            vector = np.frombuffer(blob, dtype="float32")
+                            if vector.shape[0] == self.dimension:
+                                found[key] = vector
+                                self._remember(key, vector)
+                except sqlite3.Error as e:
+                    print(f"Embedding cache error: {e}")
+
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]):
+        """Store embeddings in both tiers"""
+        if not items:
+            return
+
+        items = {key: np.asarray(vector, dtype="float32") for key, vector in items.items()}
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+
+            conn = self._connection()
+            if conn is not None:
+                try:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO embeddings (key, vector, model) VALUES (?, ?, ?)",
+                        [(key, vector.tobytes(), self.model_name) for key, vector in items.items()]
+                    )
+                    if self.max_rows > 0:
+                        # Writes get increasing rowids, so this keeps at most the max_rows newest
+                        conn.execute(
+                            "DELETE FROM embeddings WHERE rowid <= (SELECT MAX(rowid) FROM embeddings) - ?",
+                            (self.max_rows,)
+                        )
+                    conn.commit()
+                except sqlite3.Error as e:
+                    print(f"Embedding cache error: {e}")
+
+    def _remember(self, key: str, vector: np.ndarray):
+        vector.flags.writeable = False
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
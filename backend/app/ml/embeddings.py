@@ -1,8 +1,9 @@
 import numpy as np
-from sentence_transformers import SentenceTransformer
 from typing import List, Optional
 import os
+import threading
 from app.core.config import settings
+from app.ml.embedding_cache import EmbeddingCache
 
 
 class EmbeddingService:
@@ -10,8 +11,78 @@ class EmbeddingService:
     
     def __init__(self):
         self.model_name = settings.EMBEDDING_MODEL
-        self.model = SentenceTransformer(self.model_name)
+        self._model = None
+        self._model_lock = threading.Lock()
         self.dimension = settings.EMBEDDING_DIMENSION
+        self.cache = EmbeddingCache(
+            self.model_name,
+            self.dimension,
+            max_entries=settings.EMBEDDING_CACHE_SIZE,
+            path=settings.EMBEDDING_CACHE_PATH or None,
+            max_rows=settings.EMBEDDING_CACHE_MAX_ROWS
+        )
+    
+    @property
+    def model(self):
+        """The sentence transformer, loaded on first use (importing it pulls in torch)"""
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from sentence_transformers import SentenceTransformer
+                    self._model = SentenceTransformer(self.model_name)
+        return self._model
+    
+    def warm_up(self):
+        """Load the model and run one forward pass so the first request doesn't pay for it"""
+        self.model.encode("warm up", normalize_embeddings=True)
+    
+    @staticmethod
+    def combine_text(title: str, description: Optional[str] = None,
+                     tags: Optional[List[str]] = None,
+                     category: Optional[str] = None) -> str:
+        """Text that is embedded for a video's metadata"""
+        text_parts = [title or ""]
+        
+        if description:
+            text_parts.append(description)
+        
+        if tags:
+            text_parts.append(", ".join(tags))
+        
+        if category:
+            text_parts.append(category)
+        
+        return " ".join(text_parts)
+    
+    def encode_texts(self, texts: List[str], batch_size: int = 32) -> np.ndarray:
+        """
+        Embed texts, running the model only for texts not seen before
+        
+        Args:
+            texts: Combined video texts
+            batch_size: Number of texts per model forward pass
+            
+        Returns:
+            numpy array of embeddings (n_texts, embedding_dim)
+        """
+        if not texts:
+            return np.empty((0, self.dimension), dtype="float32")
+        
+        keys = [self.cache.key(text) for text in texts]
+        found = self.cache.get_many(keys)
+        
+        # Encode each distinct uncached text once
+        missing = {key: text for key, text in zip(keys, texts) if key not in found}
+        if missing:
+            encoded = self.model.encode(
+                list(missing.values()), batch_size=batch_size,
+                normalize_embeddings=True, show_progress_bar=False
+            )
+            new_embeddings = dict(zip(missing.keys(), encoded))
+            self.cache.put_many(new_embeddings)
+            found.update(new_embeddings)
+        
+        return np.vstack([found[key] for key in keys]).astype("float32")
     
     def generate_video_embedding(self, title: str, description: Optional[str] = None, 
                                  tags: Optional[List[str]] = None, 
@@ -29,48 +100,28 @@ class EmbeddingService:
             numpy array of embedding vector
         """
         # Combine all text metadata
-        text_parts = [title]
+        combined_text = self.combine_text(title, description, tags, category)
         
-        if description:
-            text_parts.append(description)
-        
-        if tags:
-            text_parts.append(", ".join(tags))
-        
-        if category:
-            text_parts.append(category)
-        
-        # Join all parts
-        combined_text = " ".join(text_parts)
-        
-        # Generate embedding
-        embedding = self.model.encode(combined_text, normalize_embeddings=True)
-        
-        return embedding
+        # Generate embedding (cached by text + model)
+        return self.encode_texts([combined_text])[0]
     
-    def generate_embeddings_batch(self, videos: List[dict]) -> np.ndarray:
+    def generate_embeddings_batch(self, videos: List[dict], batch_size: int = 32) -> np.ndarray:
         """
         Generate embeddings for multiple videos
         
         Args:
             videos: List of video dictionaries with title, description, tags, category
+            batch_size: Number of texts per model forward pass
             
         Returns:
             numpy array of embeddings (n_videos, embedding_dim)
         """
-        texts = []
-        for video in videos:
-            text_parts = [video.get("title", "")]
-            if video.get("description"):
-                text_parts.append(video["description"])
-            if video.get("tags"):
-                text_parts.append(", ".join(video["tags"]))
-            if video.get("category"):
-                text_parts.append(video["category"])
-            texts.append(" ".join(text_parts))
-        
-        embeddings = self.model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
-        return embeddings
+        texts = [
+            self.combine_text(video.get("title", ""), video.get("description"),
+                              video.get("tags"), video.get("category"))
+            for video in videos
+        ]
+        return self.encode_texts(texts, batch_size=batch_size)
 
 
 # Global instance
@@ -1,40 +1,477 @@
 import faiss
+import fcntl
+import json
 import numpy as np
 import pickle
 import os
-from typing import List, Tuple
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
 from app.core.config import settings
 
+INDEX_TYPES = ("FLAT", "IVF_FLAT", "HNSW", "IVF_PQ")
+SNAPSHOT_FILE = re.compile(r"^(\d{6})(?:\.bin|_ids\.npy)$")
+DELTA_FILE = re.compile(r"^(\d{6})_delta\.npz$")
+# Upper bound for the HNSW candidate list when a selective filter scales it up
+FILTERED_EF_SEARCH_MAX = 2048
+# k-means wants ~39 training points per IVF list
+TRAIN_POINTS_PER_LIST = 39
+
+
+class ReadWriteLock:
+    """Many concurrent readers or a single writer"""
+    
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+    
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if self._readers == 0:
+                    self._cond.notify_all()
+    
+    @contextmanager
+    def write(self):
+        with self._cond:
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
 
 class FAISSIndex:
-    """FAISS index for fast similarity search"""
+    """
+    FAISS index for fast similarity search, keyed directly by video ID
+    
+    HNSW graphs can't delete vectors, so a replaced or removed HNSW vector
+    stays in the graph as a tombstone: its ID becomes -(position + 1) and
+    searches skip negative IDs. save() compacts the graph in the background
+    once tombstones exceed FAISS_HNSW_COMPACT_RATIO of it.
+    
+    IVF types need a training set. build() trains on the vectors it is
+    given; an index filled incrementally instead stores them exactly (FLAT)
+    until it holds enough to train FAISS_NLIST lists, and the save that
+    crosses that size trains it in the background the same way.
+    """
     
-    def __init__(self, dimension: int = 384):
+    def __init__(self, dimension: int = 384, index_type: Optional[str] = None,
+                 index_path: Optional[str] = None, mmap: Optional[bool] = None):
         self.dimension = dimension
-        self.index = None
-        self.video_ids = []  # Map index position to video_id
-        self.index_path = settings.FAISS_INDEX_PATH
-        self.video_ids_path = self.index_path.replace(".bin", "_video_ids.pkl")
-        self._initialize_index()
+        self.index_type = (index_type or settings.FAISS_INDEX_TYPE).upper()
+        if self.index_type not in INDEX_TYPES:
+            raise ValueError(f"Unknown FAISS index type {self.index_type!r}, expected one of {INDEX_TYPES}")
+        self._index = None
+        self._load_lock = threading.Lock()
+        # Searches run concurrently from executor threads; mutations must be exclusive
+        self.lock = ReadWriteLock()
+        # True when the in-memory index has changes not yet written by save()
+        self.dirty = False
+        # Map the saved index read-only instead of reading it, so worker processes share page cache
+        self.mmap = settings.FAISS_MMAP if mmap is None else mmap
+        # True while self.index is backed by that mapping; the first mutation takes a private copy
+        self.read_only = False
+        # Position -> video_id for a mapped FLAT/HNSW index (IVF indexes store their own IDs)
+        self.id_map: Optional[np.ndarray] = None
+        # Dead HNSW vectors (negative IDs) still in the index, and a live-positions bitmap for a mapped one
+        self.tombstones = 0
+        self._live_bitmap: Optional[np.ndarray] = None
+        self.index_path = index_path or settings.FAISS_INDEX_PATH
+        # Saves publish immutable, numbered snapshots; the manifest names the current one
+        root = os.path.splitext(self.index_path)[0]
+        self.snapshot_dir = root + "_snapshots"
+        self.manifest_path = root + "_manifest.json"
+        # Snapshot version the in-memory index is based on (None: unversioned or not saved yet)
+        self.version: Optional[int] = None
+        # Changes since that snapshot, replayed onto a newer one (None marks a removal)
+        self._pending: Dict[int, Optional[np.ndarray]] = {}
+        # Set by build(): the next save replaces the published snapshot instead of merging with it,
+        # replaying the changes saved after snapshot _built_on (if known) onto the new index
+        self._replaces_snapshot = False
+        self._built_on: Optional[int] = None
+        self._watcher = None
+        self._watch_stop = threading.Event()
+        # Single-file index and ID map written before snapshots, and the pickled
+        # position -> video_id list written before that; only read for migration
+        self.ids_path = root + "_ids.npy"
+        self.legacy_video_ids_path = self.index_path.replace(".bin", "_video_ids.pkl")
+    
+    @property
+    def index(self) -> faiss.Index:
+        """The FAISS index, loaded from disk on first use"""
+        if self._index is None:
+            with self._load_lock:
+                if self._index is None:
+                    self._initialize_index()
+        return self._index
+    
+    @index.setter
+    def index(self, index: faiss.Index):
+        self._index = index
+    
+    def warm_up(self):
+        """Load the index now rather than on the first request"""
+        return self.index
+    
+    def _nlist_for(self, n_train: int) -> int:
+        """Number of IVF lists for a training set"""
+        return max(1, min(settings.FAISS_NLIST, n_train // TRAIN_POINTS_PER_LIST))
+    
+    def _min_train(self) -> int:
+        """Fewest vectors an IVF index of the configured type is trained on"""
+        if self.index_type == "IVF_PQ":
+            return max(TRAIN_POINTS_PER_LIST, 2 ** settings.FAISS_PQ_NBITS)
+        return TRAIN_POINTS_PER_LIST
+    
+    def _awaits_training(self) -> bool:
+        """Whether an IVF type is still stored as FLAT but holds enough vectors for all FAISS_NLIST lists"""
+        if self.index_type not in ("IVF_FLAT", "IVF_PQ") or isinstance(self.index, faiss.IndexIVF) or self._is_hnsw():
+            return False
+        return self.get_total_vectors() >= max(TRAIN_POINTS_PER_LIST * settings.FAISS_NLIST, self._min_train())
+    
+    def _new_index(self, n_train: int = 0) -> faiss.Index:
+        """
+        Create an empty index of the configured type
+        
+        All types use inner product on normalized vectors (= cosine). IVF
+        indexes carry their own IDs; FLAT and HNSW are wrapped in IndexIDMap2.
+        
+        Args:
+            n_train: number of vectors the index will be trained on. IVF types
+                size nlist from it, and are created as exact FLAT storage
+                with fewer than _min_train() (the default 0 included).
+        """
+        if self.index_type == "IVF_FLAT" and n_train >= self._min_train():
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            return faiss.IndexIVFFlat(quantizer, self.dimension, self._nlist_for(n_train),
+                                      faiss.METRIC_INNER_PRODUCT)
+        
+        if self.index_type == "IVF_PQ" and n_train >= self._min_train():
+            quantizer = faiss.IndexFlatIP(self.dimension)
+            return faiss.IndexIVFPQ(quantizer, self.dimension, self._nlist_for(n_train),
+                                    settings.FAISS_PQ_M, settings.FAISS_PQ_NBITS,
+                                    faiss.METRIC_INNER_PRODUCT)
+        
+        if self.index_type == "HNSW":
+            hnsw = faiss.IndexHNSWFlat(self.dimension, settings.FAISS_HNSW_M, faiss.METRIC_INNER_PRODUCT)
+            hnsw.hnsw.efConstruction = settings.FAISS_HNSW_EF_CONSTRUCTION
+            return faiss.IndexIDMap2(hnsw)
+        
+        return faiss.IndexIDMap2(faiss.IndexFlatIP(self.dimension))
+    
+    def _is_hnsw(self) -> bool:
+        index = self.index.index if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        return isinstance(faiss.downcast_index(index), faiss.IndexHNSW)
+    
+    @contextmanager
+    def _file_lock(self, operation: int):
+        """Hold a shared (load) or exclusive (save) lock across the index and ID map files"""
+        with open(self.index_path + ".lock", "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    @staticmethod
+    def _with_ids(index: faiss.Index, ids: np.ndarray) -> faiss.IndexIDMap2:
+        """Wrap a populated positional index in an IndexIDMap2 with the given ID map"""
+        # The IndexIDMap2 constructor only accepts an empty index, so swap the populated one in
+        wrapped = faiss.IndexIDMap2(faiss.IndexFlatIP(index.d))
+        wrapped.index = index
+        wrapped.ntotal = index.ntotal
+        wrapped.referenced_objects = [index]
+        faiss.copy_array_to_vector(np.ascontiguousarray(ids, dtype="int64"), wrapped.id_map)
+        wrapped.construct_rev_map()
+        return wrapped
+    
+    def _ensure_writable(self):
+        """Replace a memory-mapped index with a private in-memory copy (call under the write lock)"""
+        if not self.read_only:
+            return
+        # Mutating mapped storage aborts the process, and clone_index keeps the mapping
+        index = faiss.deserialize_index(faiss.serialize_index(self.index))
+        if self.id_map is not None:
+            index = self._with_ids(index, self.id_map)
+        self._assign(index, None, False)
+    
+    def _assign(self, index: faiss.Index, id_map: Optional[np.ndarray], read_only: bool):
+        """Make index current and count its tombstones (call under the write lock or the load lock)"""
+        ids = id_map
+        if ids is None and isinstance(index, faiss.IndexIDMap2) and index.ntotal:
+            ids = faiss.rev_swig_ptr(index.id_map.data(), index.id_map.size())
+        dead = np.flatnonzero(ids < 0) if ids is not None else np.empty(0, dtype="int64")
+        live_bitmap = None
+        if len(dead) and id_map is not None:
+            # A mapped positional index is searched by position, so skip dead positions
+            live = np.ones(index.ntotal, dtype=bool)
+            live[dead] = False
+            live_bitmap = np.packbits(live, bitorder="little")
+        self.id_map, self.read_only = id_map, read_only
+        self.tombstones, self._live_bitmap = len(dead), live_bitmap
+        # Assigned last: other threads only wait for the first load while it is None
+        self.index = index
+    
+    def read_manifest(self) -> Optional[dict]:
+        """The manifest of the published snapshot, or None if none has been saved"""
+        try:
+            with open(self.manifest_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+    
+    def _snapshot_paths(self, version: int) -> Tuple[str, str]:
+        """Index and ID map files of a snapshot version"""
+        name = os.path.join(self.snapshot_dir, f"{version:06d}")
+        return name + ".bin", name + "_ids.npy"
+    
+    def _delta_path(self, version: int) -> str:
+        """Changes a merging save published in a snapshot version, replayed by rebuilds started before it"""
+        return os.path.join(self.snapshot_dir, f"{version:06d}_delta.npz")
+    
+    def _write_delta(self, version: int, suffix: str):
+        """Write the unsaved changes as the delta of a snapshot version (call under the exclusive lock)"""
+        upserts = {video_id: vector for video_id, vector in self._pending.items() if vector is not None}
+        removed = [video_id for video_id, vector in self._pending.items() if vector is None]
+        path = self._delta_path(version)
+        with open(path + suffix, "wb") as f:
+            np.savez(
+                f,
+                upsert_ids=self._as_ids(list(upserts)),
+                upsert_vectors=np.vstack(list(upserts.values())) if upserts else np.empty((0, self.dimension), "float32"),
+                removed_ids=self._as_ids(removed)
+            )
+        os.replace(path + suffix, path)
+    
+    def _replay_deltas(self, after: int, published: int):
+        """
+        Apply the changes saved in snapshots after..published onto the index (call under the exclusive lock)
+        
+        Snapshots without a delta replaced the index (another build) or had
+        no changes; deltas pruned before the replay can't be recovered.
+        """
+        oldest_kept = published - max(settings.FAISS_DELTAS_KEEP, 1)
+        if after < oldest_kept:
+            print(f"FAISS index: deltas of snapshots {after + 1}-{oldest_kept} were pruned; "
+                  f"changes saved in them are missing until the next rebuild")
+        replayed = 0
+        for version in range(max(after, oldest_kept) + 1, published + 1):
+            path = self._delta_path(version)
+            if not os.path.exists(path):
+                continue
+            with np.load(path) as delta:
+                with self.lock.write():
+                    if len(delta["removed_ids"]):
+                        self._remove(delta["removed_ids"])
+                    if len(delta["upsert_ids"]):
+                        self._upsert(delta["upsert_vectors"], delta["upsert_ids"])
+                replayed += len(delta["removed_ids"]) + len(delta["upsert_ids"])
+        if replayed:
+            print(f"FAISS index: replayed {replayed} changes saved since snapshot {after}")
+    
+    def _read_files(self, index_path: str, ids_path: Optional[str]) -> Tuple[faiss.Index, Optional[np.ndarray]]:
+        """Read a saved index and its ID map, if it has one (call under the shared file lock)"""
+        # A saved index keeps its own type, whatever FAISS_INDEX_TYPE says
+        index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP_IFC if self.mmap else 0)
+        id_map = None
+        if not isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)) and ids_path and os.path.exists(ids_path):
+            id_map = np.load(ids_path, mmap_mode="r" if self.mmap else None)
+            if len(id_map) != index.ntotal:
+                raise ValueError(f"{ids_path} has {len(id_map)} IDs for {index.ntotal} vectors in {index_path}")
+        return index, id_map
+    
+    def _loaded(self, index: faiss.Index, id_map: Optional[np.ndarray]):
+        """(index, id_map, read_only) to assign for an index read by _read_files"""
+        if id_map is None:
+            # IVF indexes, and ID-mapped indexes saved by older versions
+            return index, None, self.mmap
+        if self.mmap:
+            return index, id_map, True
+        return self._with_ids(index, id_map), None, False
+    
+    def _read_snapshot(self, version: int):
+        """(index, id_map, read_only) of a published snapshot (call under the shared file lock)"""
+        return self._loaded(*self._read_files(*self._snapshot_paths(version)))
     
     def _initialize_index(self):
-        """Initialize or load FAISS index"""
+        """Initialize or load FAISS index (runs once, under the load lock)"""
         # Create directory if it doesn't exist
         os.makedirs(os.path.dirname(self.index_path) if os.path.dirname(self.index_path) else ".", exist_ok=True)
         
-        if os.path.exists(self.index_path) and os.path.exists(self.video_ids_path):
-            # Load existing index
-            self.index = faiss.read_index(self.index_path)
-            with open(self.video_ids_path, "rb") as f:
-                self.video_ids = pickle.load(f)
+        # self.index is assigned last: other threads only wait for the load while it is None
+        start = time.perf_counter()
+        with self._file_lock(fcntl.LOCK_SH):
+            manifest = self.read_manifest()
+            if manifest:
+                index, id_map = self._read_files(*self._snapshot_paths(manifest["version"]))
+            elif os.path.exists(self.index_path):
+                # Single-file index saved before snapshots; the next save publishes it as one
+                index, id_map = self._read_files(self.index_path, self.ids_path)
+            else:
+                self.index = self._new_index()
+                return
+        
+        if id_map is not None or isinstance(index, (faiss.IndexIDMap2, faiss.IndexIVF)):
+            self.version = manifest["version"] if manifest else None
+            self._assign(*self._loaded(index, id_map))
+        elif os.path.exists(self.legacy_video_ids_path):
+            # Migrate a positional index + pickled video_ids list to an ID-mapped index
+            with open(self.legacy_video_ids_path, "rb") as f:
+                video_ids = pickle.load(f)
+            n = min(index.ntotal, len(video_ids))
+            if n > 0:
+                vectors = self._prepare_vectors(index.reconstruct_n(0, n))
+                self._build(*self._dedupe(vectors, self._as_ids(video_ids[:n])))
+                self.dirty = True
+            else:
+                self.index = self._new_index()
         else:
-            # Create new index (L2 distance with inner product for cosine similarity)
-            # Using inner product since we normalize embeddings
-            self.index = faiss.IndexFlatIP(self.dimension)
+            self.index = self._new_index()
+        
+        version = f" (snapshot {self.version})" if self.version else ""
+        print(f"Loaded FAISS index with {self.index.ntotal} vectors{version} in "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms{' (memory-mapped)' if self.read_only else ''}")
     
-    def add_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+    @staticmethod
+    def _as_ids(video_ids: List[int]) -> np.ndarray:
+        return np.asarray(video_ids, dtype="int64").reshape(-1)
+    
+    def _prepare_vectors(self, vectors: np.ndarray) -> np.ndarray:
+        """Return a contiguous, L2-normalized float32 copy of vectors"""
+        vectors = np.array(vectors, dtype="float32", copy=True)
+        if vectors.ndim == 1:
+            vectors = vectors.reshape(1, -1)
+        faiss.normalize_L2(vectors)
+        return vectors
+    
+    @staticmethod
+    def _dedupe(vectors: np.ndarray, ids: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Keep only the last occurrence of any ID repeated within a batch"""
+        _, last_positions = np.unique(ids[::-1], return_index=True)
+        if len(last_positions) != len(ids):
+            keep = np.sort(len(ids) - 1 - last_positions)
+            vectors, ids = vectors[keep], ids[keep]
+        return vectors, ids
+    
+    def _build(self, vectors: np.ndarray, ids: np.ndarray):
+        """Replace the index with a fresh one trained on and containing vectors"""
+        self._assign(self._trained_index(vectors, ids), None, False)
+    
+    def _trained_index(self, vectors: np.ndarray, ids: np.ndarray) -> faiss.Index:
+        """A new index of the configured type, trained on and containing vectors"""
+        index = self._new_index(len(vectors))
+        if not index.is_trained:
+            sample = vectors
+            if len(vectors) > settings.FAISS_TRAIN_SAMPLE_SIZE:
+                rng = np.random.default_rng(0)
+                sample = vectors[rng.choice(len(vectors), settings.FAISS_TRAIN_SAMPLE_SIZE, replace=False)]
+            index.train(sample)
+        if len(vectors) > 0:
+            index.add_with_ids(vectors, ids)
+        return index
+    
+    def _tombstone(self, ids: np.ndarray) -> int:
+        """Mark the HNSW vectors of ids dead in place (call under the write lock); returns how many"""
+        stored_ids = faiss.rev_swig_ptr(self.index.id_map.data(), self.index.id_map.size()) if self.index.ntotal else None
+        if stored_ids is None:
+            return 0
+        positions = np.flatnonzero(np.isin(stored_ids, ids))
+        # Unique negative IDs; rev_map keeps stale entries, which only reconstruct(id) would read
+        stored_ids[positions] = -(positions + 1)
+        self.tombstones += len(positions)
+        return len(positions)
+    
+    def compact(self) -> bool:
+        """
+        Rebuild the index from its live vectors
+        
+        Drops HNSW tombstones, and trains an IVF type still stored as FLAT
+        once it has enough vectors (_awaits_training). The new index is built from a copy of the live vectors without holding
+        the write lock, so searches and writes continue meanwhile; writes
+        made during the build are replayed onto the new graph before it is
+        swapped in. Gives up if the index was replaced or saved meanwhile.
+        
+        Returns:
+            True if a compacted index was swapped in
         """
-        Add vectors to the index
+        with self.lock.read():
+            if not (self.tombstones and self._is_hnsw()) and not self._awaits_training():
+                return False
+            current, version, pending = self.index, self.version, dict(self._pending)
+            ids = np.array(self._stored_ids(), dtype="int64")
+            positions = np.flatnonzero(ids >= 0)
+            inner = current.index if isinstance(current, faiss.IndexIDMap2) else current
+            vectors = inner.reconstruct_batch(positions) if len(positions) else np.empty((0, self.dimension), "float32")
+        
+        start = time.perf_counter()
+        index = self._trained_index(vectors, ids[positions])
+        
+        with self.lock.write():
+            if self.index is not current or self.version != version:
+                return False
+            tombstones = self.tombstones
+            self._assign(index, None, False)
+            changed = {
+                video_id: vector for video_id, vector in self._pending.items()
+                if video_id not in pending or pending[video_id] is not vector
+            }
+            removed = self._as_ids([video_id for video_id, vector in changed.items() if vector is None])
+            upserts = {video_id: vector for video_id, vector in changed.items() if vector is not None}
+            if len(removed):
+                self._remove(removed)
+            if upserts:
+                self._upsert(np.vstack(list(upserts.values())), self._as_ids(list(upserts)))
+        print(f"Rebuilt FAISS index as {self.index_type}: {len(positions)} vectors, dropped {tombstones} "
+              f"dead ones in {(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+    
+    def build(self, vectors: np.ndarray, video_ids: List[int], built_on: Optional[int] = None):
+        """
+        Replace the whole index, training approximate index types on vectors
+        
+        Use this for bulk loads: IVF/PQ quality depends on being trained on
+        a representative sample of the catalog. With fewer than FAISS_NLIST
+        lists' worth of vectors, nlist is scaled down to fit them.
+        
+        Args:
+            vectors: numpy array of shape (n, dimension)
+            video_ids: list of video IDs corresponding to vectors
+            built_on: published snapshot version (read_manifest) taken before
+                vectors were read from their source. The next save replays
+                the changes other processes saved after it, which vectors may
+                not include; None publishes vectors as they are.
+        """
+        vectors = self._prepare_vectors(vectors).reshape(-1, self.dimension)
+        ids = self._as_ids(video_ids)
+        if len(ids) != len(vectors):
+            raise ValueError("vectors and video_ids must have the same length")
+        with self.lock.write():
+            self._build(*self._dedupe(vectors, ids))
+            self._pending = {}
+            self._replaces_snapshot = True
+            self._built_on = built_on
+            self.dirty = True
+    
+    def upsert_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+        """
+        Insert or replace vectors for a batch of videos
         
         Args:
             vectors: numpy array of shape (n, dimension)
@@ -43,82 +480,448 @@ class FAISSIndex:
         if len(vectors) == 0:
             return
         
-        # Ensure vectors are float32 and normalized
-        vectors = vectors.astype("float32")
-        faiss.normalize_L2(vectors)
+        vectors = self._prepare_vectors(vectors)
+        ids = self._as_ids(video_ids)
+        if len(ids) != len(vectors):
+            raise ValueError("vectors and video_ids must have the same length")
+        vectors, ids = self._dedupe(vectors, ids)
+        
+        with self.lock.write():
+            self._upsert(vectors, ids)
+            self._pending.update(zip(ids.tolist(), vectors))
+            self.dirty = True
+    
+    def _upsert(self, vectors: np.ndarray, ids: np.ndarray):
+        """Insert or replace prepared, deduplicated vectors (call under the write lock)"""
+        self._ensure_writable()
+        if not self.index.is_trained:
+            # Empty IVF index saved untrained by an older version: store exactly until it can be trained
+            self._assign(self._new_index(), None, False)
+        
+        if self._is_hnsw():
+            # Old vectors stay in the graph as tombstones; rebuilding it here would block every search
+            self._tombstone(ids)
+            self.index.add_with_ids(vectors, ids)
+            return
+        
+        # Drop any existing vectors for these IDs so stale embeddings can't be returned
+        self.index.remove_ids(faiss.IDSelectorBatch(ids))
+        self.index.add_with_ids(vectors, ids)
+    
+    def upsert_vector(self, video_id: int, vector: np.ndarray):
+        """Insert or replace the vector for a single video"""
+        self.upsert_vectors(np.asarray(vector).reshape(1, -1), [video_id])
+    
+    def add_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+        """
+        Add vectors to the index (existing video IDs are replaced)
+        
+        Args:
+            vectors: numpy array of shape (n, dimension)
+            video_ids: list of video IDs corresponding to vectors
+        """
+        self.upsert_vectors(vectors, video_ids)
+    
+    def remove_vectors(self, video_ids: List[int]) -> int:
+        """
+        Remove vectors for a batch of videos
+        
+        Args:
+            video_ids: list of video IDs to remove
+        
+        Returns:
+            Number of vectors removed
+        """
+        if len(video_ids) == 0:
+            return 0
+        ids = self._as_ids(video_ids)
+        
+        with self.lock.write():
+            removed = self._remove(ids)
+            # Recorded even if absent here: a newer snapshot may still have them
+            self._pending.update(dict.fromkeys(ids.tolist()))
+            self.dirty = self.dirty or removed > 0
+            return removed
+    
+    def _remove(self, ids: np.ndarray) -> int:
+        """Remove vectors by ID (call under the write lock); returns the number removed"""
+        self._ensure_writable()
+        if self._is_hnsw():
+            return self._tombstone(ids)
+        return int(self.index.remove_ids(faiss.IDSelectorBatch(ids)))
+    
+    def remove_vector(self, video_id: int) -> bool:
+        """Remove the vector for a single video. Returns True if it was present."""
+        return self.remove_vectors([video_id]) > 0
+    
+    def _search_params(self, k: int, nprobe: Optional[int], ef_search: Optional[int],
+                       selector: Optional[faiss.IDSelector] = None, selectivity: float = 1.0):
+        """
+        Query-time tuning for approximate index types, and an optional filter on stored IDs
+        
+        A selector rejects most candidates when it accepts only a small share
+        (selectivity) of the index, so IVF probes and the HNSW candidate list
+        grow by 1 / selectivity to still find k accepted neighbors.
+        """
+        if isinstance(self.index, faiss.IndexIVF):
+            nprobe = nprobe or settings.FAISS_NPROBE
+            nprobe = min(self.index.nlist, int(np.ceil(nprobe / selectivity)))
+            return faiss.SearchParametersIVF(nprobe=nprobe, sel=selector)
+        if self._is_hnsw():
+            ef_search = max(ef_search or settings.FAISS_EF_SEARCH, k)
+            if selectivity < 1.0:
+                ef_search = max(min(int(np.ceil(ef_search / selectivity)), FILTERED_EF_SEARCH_MAX), ef_search)
+            return faiss.SearchParametersHNSW(efSearch=ef_search, sel=selector)
+        if selector is not None:
+            return faiss.SearchParameters(sel=selector)
+        return None
+    
+    def _exclusion_selector(self, exclude_ids: List[int]) -> Tuple[faiss.IDSelector, faiss.IDSelector]:
+        """
+        Selector accepting every stored ID except exclude_ids (call under the read lock)
+        
+        Returns:
+            (selector, the batch it negates), both of which must stay referenced during the search
+        """
+        ids = self._as_ids(exclude_ids)
+        if self.id_map is not None:
+            # A mapped positional index stores positions, not video IDs
+            ids = np.flatnonzero(np.isin(self.id_map, ids)).astype("int64")
+        excluded = faiss.IDSelectorBatch(ids)
+        return faiss.IDSelectorNot(excluded), excluded
+    
+    def _live_selector(self, selector: Optional[faiss.IDSelector], referenced):
+        """
+        Restrict a selector (or None) to vectors that aren't tombstones (call under the read lock)
+        
+        Returns:
+            (selector, objects that must stay referenced during the search)
+        """
+        if self.id_map is not None:
+            live = faiss.IDSelectorBitmap(len(self._live_bitmap), faiss.swig_ptr(self._live_bitmap))
+        else:
+            live = faiss.IDSelectorRange(0, np.iinfo("int64").max)
+        if selector is None:
+            return live, (live, referenced)
+        return faiss.IDSelectorAnd(live, selector), (live, selector, referenced)
+    
+    def _stored_ids(self) -> Optional[np.ndarray]:
+        """Video ID of each stored vector by position, or None for IVF indexes (call under the read lock)"""
+        if self.id_map is not None:
+            return self.id_map
+        if isinstance(self.index, faiss.IndexIDMap2):
+            return faiss.rev_swig_ptr(self.index.id_map.data(), self.index.id_map.size())
+        return None
+    
+    @staticmethod
+    def _bits_set(bitmap: np.ndarray, ids: np.ndarray) -> np.ndarray:
+        """Whether each ID's bit is set in a packed little-endian bitmap (negative IDs and IDs past its end are not)"""
+        inside = (ids >= 0) & (ids < len(bitmap) * 8)
+        found = np.zeros(len(ids), dtype=bool)
+        inside_ids = ids[inside]
+        found[inside] = (bitmap[inside_ids >> 3] >> (inside_ids & 7)) & 1
+        return found
+    
+    def _filter_selector(self, id_filter: np.ndarray, exclude_ids: Optional[List[int]]):
+        """
+        Selector accepting the stored IDs whose bit is set in id_filter (call under the read lock)
+        
+        Excluded IDs are cleared from a copy of the bitmap, so one bitmap
+        lookup per candidate applies both restrictions.
+        
+        Returns:
+            (selector, bitmap it reads, positions of the accepted vectors or
+            None for IVF indexes, number of accepted vectors); the bitmap must
+            stay referenced during the search
+        """
+        bitmap = np.ascontiguousarray(id_filter, dtype="uint8")
+        if exclude_ids is not None and len(exclude_ids):
+            ids = self._as_ids(exclude_ids)
+            ids = ids[(ids >= 0) & (ids < len(bitmap) * 8)]
+            bitmap = bitmap.copy()
+            np.bitwise_and.at(bitmap, ids >> 3, ~(np.left_shift(1, ids & 7)).astype("uint8"))
         
-        # Add to index
-        self.index.add(vectors)
+        stored_ids = self._stored_ids()
+        if stored_ids is None:
+            # IVF lists hold video IDs; without a position map the accepted count is estimated from the bitmap
+            n_selected = min(int(np.unpackbits(bitmap).sum()), self.index.ntotal)
+            return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)), bitmap, None, n_selected
         
-        # Store video IDs
-        self.video_ids.extend(video_ids)
+        positions = np.flatnonzero(self._bits_set(bitmap, stored_ids))
+        if self.id_map is not None:
+            # A mapped positional index stores positions, not video IDs
+            bitmap = np.zeros((self.index.ntotal + 7) // 8, dtype="uint8")
+            np.bitwise_or.at(bitmap, positions >> 3, np.left_shift(1, positions & 7).astype("uint8"))
+        return faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)), bitmap, positions, len(positions)
     
-    def search(self, query_vector: np.ndarray, k: int = 10) -> List[Tuple[int, float]]:
+    def _search_exact(self, query_vectors: np.ndarray, k: int, positions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Score only the vectors at the given positions (call under the read lock); returns (distances, positions)"""
+        index = self.index.index if isinstance(self.index, faiss.IndexIDMap2) else self.index
+        scores = query_vectors @ index.reconstruct_batch(positions).T
+        k = min(k, len(positions))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        return np.take_along_axis(top_scores, order, axis=1), positions[np.take_along_axis(top, order, axis=1)]
+    
+    def search(self, query_vector: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, exclude_ids: Optional[List[int]] = None,
+               id_filter: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
         """
         Search for similar vectors
         
         Args:
             query_vector: query vector of shape (dimension,) or (1, dimension)
             k: number of results to return
+            nprobe: IVF lists to probe (defaults to FAISS_NPROBE)
+            ef_search: HNSW candidate list size (defaults to FAISS_EF_SEARCH)
+            exclude_ids: video IDs that must not be returned
+            id_filter: bitmap of the video IDs that may be returned (see search_batch)
             
         Returns:
             List of tuples (video_id, similarity_score)
         """
-        if self.index.ntotal == 0:
-            return []
+        return self.search_batch(query_vector, k=k, nprobe=nprobe, ef_search=ef_search,
+                                 exclude_ids=exclude_ids, id_filter=id_filter)[0]
+    
+    def search_batch(self, query_vectors: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, exclude_ids: Optional[List[int]] = None,
+                     id_filter: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Search for similar vectors for many queries in a single FAISS call
         
-        # Ensure query is float32 and normalized
-        if query_vector.ndim == 1:
-            query_vector = query_vector.reshape(1, -1)
+        Args:
+            query_vectors: query matrix of shape (n, dimension)
+            k: number of results to return per query
+            nprobe: IVF lists to probe (defaults to FAISS_NPROBE)
+            ef_search: HNSW candidate list size (defaults to FAISS_EF_SEARCH)
+            exclude_ids: video IDs that must not be returned for any query. They
+                are skipped inside the search (IDSelector), so each query still
+                gets up to k other results without over-fetching.
+            id_filter: packed little-endian bitmap of the video IDs that may be
+                returned (bit i set: video ID i passes), e.g. from
+                VideoMetadataStore.bitmap. Only those are searched, with
+                nprobe/efSearch scaled up for selective filters; an HNSW search
+                accepting at most FAISS_FILTER_BRUTE_FORCE_MAX vectors scores
+                them exactly instead of walking the graph.
+            
+        Returns:
+            One list of (video_id, similarity_score) tuples per query row
+        """
+        # Ensure queries are float32 and normalized
+        query_vectors = self._prepare_vectors(query_vectors)
         
-        query_vector = query_vector.astype("float32")
-        faiss.normalize_L2(query_vector)
+        with self.lock.read():
+            if self.index.ntotal == 0:
+                return [[] for _ in range(len(query_vectors))]
+            
+            # Search
+            k = min(k, self.index.ntotal)
+            selector = referenced = positions = None
+            selectivity = 1.0
+            if id_filter is not None:
+                selector, referenced, positions, n_selected = self._filter_selector(id_filter, exclude_ids)
+                if n_selected == 0:
+                    return [[] for _ in range(len(query_vectors))]
+                selectivity = n_selected / self.index.ntotal
+            elif exclude_ids is not None and len(exclude_ids):
+                selector, referenced = self._exclusion_selector(exclude_ids)
+            if self.tombstones and id_filter is None:
+                # Filter bitmaps never accept tombstones (negative IDs, dead positions); other searches skip them here
+                selector, referenced = self._live_selector(selector, referenced)
+            
+            if positions is not None and self._is_hnsw() and len(positions) <= settings.FAISS_FILTER_BRUTE_FORCE_MAX:
+                # Too few accepted vectors for the graph walk to reach; scoring them all is cheaper
+                distances, ids = self._search_exact(query_vectors, k, positions)
+                if self.id_map is None:
+                    ids = self._stored_ids()[ids]
+            else:
+                params = self._search_params(k, nprobe, ef_search, selector, selectivity)
+                distances, ids = self.index.search(query_vectors, k, params=params)
+            if self.id_map is not None:
+                ids = np.where(ids >= 0, self.id_map[np.maximum(ids, 0)], -1)
         
-        # Search
-        k = min(k, self.index.ntotal)
-        distances, indices = self.index.search(query_vector, k)
+        # Convert to lists of (video_id, similarity_score); -1 marks an empty slot.
+        # For inner product on normalized vectors, higher is more similar.
+        return [
+            [(int(video_id), float(dist)) for video_id, dist in zip(id_row, dist_row) if video_id != -1]
+            for id_row, dist_row in zip(ids, distances)
+        ]
+    
+    def _swap(self, loaded, version: int) -> bool:
+        """
+        Swap in a newer snapshot's index, replaying this process's unsaved changes onto it
         
-        # Convert to list of (video_id, similarity_score)
-        results = []
-        for idx, dist in zip(indices[0], distances[0]):
-            if idx < len(self.video_ids):
-                # Convert distance to similarity (for inner product, higher is better)
-                similarity = float(dist)
-                results.append((self.video_ids[idx], similarity))
+        Searches already running finish on the old index (the write lock
+        waits for them); searches after the swap see the new one.
         
-        return results
+        Returns:
+            False if the loaded index is not newer than the current one
+        """
+        with self.lock.write():
+            if self.version is not None and version <= self.version:
+                return False
+            self._assign(*loaded)
+            self.version = version
+            
+            removed = np.array([video_id for video_id, vector in self._pending.items() if vector is None], dtype="int64")
+            upserts = {video_id: vector for video_id, vector in self._pending.items() if vector is not None}
+            if len(removed):
+                self._remove(removed)
+            if upserts:
+                self._upsert(np.vstack(list(upserts.values())), self._as_ids(list(upserts)))
+            return True
     
-    def update_vector(self, video_id: int, new_vector: np.ndarray):
+    def reload(self) -> bool:
+        """
+        Swap in the published snapshot if another process saved a newer one
+        
+        The snapshot is read before taking the write lock, so searches keep
+        running on the current index while it loads.
+        
+        Returns:
+            True if a newer snapshot was swapped in
         """
-        Update a vector in the index (removes old and adds new)
+        if self._index is None:
+            # Not loaded yet: the first use loads the latest snapshot anyway
+            return False
+        manifest = self.read_manifest()
+        if not manifest or (self.version is not None and manifest["version"] <= self.version):
+            return False
+        
+        start = time.perf_counter()
+        with self._file_lock(fcntl.LOCK_SH):
+            # Re-read: the snapshot may have been replaced (and pruned) meanwhile
+            manifest = self.read_manifest()
+            loaded = self._read_snapshot(manifest["version"])
+        if not self._swap(loaded, manifest["version"]):
+            return False
+        print(f"Swapped in FAISS index snapshot {manifest['version']} with {self.index.ntotal} vectors in "
+              f"{(time.perf_counter() - start) * 1000:.0f} ms")
+        return True
+    
+    def start_watcher(self, interval: Optional[float] = None):
+        """
+        Poll for snapshots saved by other processes and swap them in
         
         Args:
-            video_id: ID of video to update
-            new_vector: new embedding vector
+            interval: seconds between checks (defaults to FAISS_RELOAD_INTERVAL; 0 disables)
         """
-        # Find index of video_id
-        try:
-            idx = self.video_ids.index(video_id)
-            # Remove old vector (FAISS doesn't support direct update, so we rebuild)
-            # For simplicity, we'll just add the new one and mark old as removed
-            # In production, you might want to implement a more efficient update strategy
-            pass
-        except ValueError:
-            # Video not found, add new
-            self.add_vectors(new_vector.reshape(1, -1), [video_id])
+        interval = settings.FAISS_RELOAD_INTERVAL if interval is None else interval
+        if interval <= 0 or (self._watcher and self._watcher.is_alive()):
+            return
+        self._watch_stop.clear()
+        self._watcher = threading.Thread(target=self._watch, args=(interval,), name="faiss-index-watcher",
+                                         daemon=True)
+        self._watcher.start()
+    
+    def stop_watcher(self):
+        """Stop the watcher thread"""
+        self._watch_stop.set()
+        if self._watcher:
+            self._watcher.join()
+            self._watcher = None
+    
+    def _watch(self, interval: float):
+        while not self._watch_stop.wait(interval):
+            try:
+                self.reload()
+            except Exception as e:
+                print(f"FAISS index reload error: {e}")
     
     def save(self):
-        """Save index to disk"""
-        os.makedirs(os.path.dirname(self.index_path) if os.path.dirname(self.index_path) else ".", exist_ok=True)
-        faiss.write_index(self.index, self.index_path)
-        with open(self.video_ids_path, "wb") as f:
-            pickle.dump(self.video_ids, f)
+        """
+        Save the index as a new snapshot version
+        
+        Snapshot files are never rewritten: each save writes the next version
+        (temp files + rename) and then atomically replaces the manifest, so a
+        concurrent writer can't leave a half-written index and processes that
+        mapped an older snapshot keep it. If another process published a
+        newer snapshot since this one loaded, it is swapped in first with
+        this process's unsaved changes replayed on top, so neither side's
+        writes are lost; after build() the save replaces it instead.
+        
+        FLAT/HNSW indexes are written without their ID wrapper, with the IDs
+        in a separate .npy file, so both can be memory-mapped on load.
+        """
+        os.makedirs(self.snapshot_dir, exist_ok=True)
+        suffix = f".{os.getpid()}.{threading.get_ident()}.tmp"
+        # Load before taking the exclusive lock, which the load's shared lock would wait for
+        self.warm_up()
+        if self.tombstones > settings.FAISS_HNSW_COMPACT_RATIO * self.index.ntotal or self._awaits_training():
+            self.compact()
+        with self._file_lock(fcntl.LOCK_EX):
+            manifest = self.read_manifest()
+            published = manifest["version"] if manifest else 0
+            if published and not self._replaces_snapshot and (self.version or 0) < published:
+                self._swap(self._read_snapshot(published), published)
+            if self._replaces_snapshot and self._built_on is not None:
+                self._replay_deltas(self._built_on, published)
+            
+            version = published + 1
+            index_file, ids_file = self._snapshot_paths(version)
+            if self._pending and not self._replaces_snapshot:
+                self._write_delta(version, suffix)
+            with self.lock.read():
+                if isinstance(self.index, faiss.IndexIDMap2):
+                    index, ids = self.index.index, faiss.vector_to_array(self.index.id_map)
+                else:
+                    index, ids = self.index, self.id_map
+                
+                if ids is not None:
+                    with open(ids_file + suffix, "wb") as f:
+                        np.save(f, np.asarray(ids, dtype="int64"))
+                    os.replace(ids_file + suffix, ids_file)
+                faiss.write_index(index, index_file + suffix)
+                os.replace(index_file + suffix, index_file)
+                
+                with open(self.manifest_path + suffix, "w") as f:
+                    json.dump({
+                        "version": version,
+                        "index_type": self.index_type,
+                        "vectors": int(index.ntotal),
+                        "created_at": datetime.now(timezone.utc).isoformat()
+                    }, f)
+                os.replace(self.manifest_path + suffix, self.manifest_path)
+                
+                self.version = version
+                self._pending = {}
+                self._replaces_snapshot = False
+                self._built_on = None
+                self.dirty = False
+            self._prune_snapshots(version)
+        
+        # Files from before snapshots are superseded by the first one
+        for path in (self.index_path, self.ids_path, self.legacy_video_ids_path):
+            if os.path.exists(path):
+                os.remove(path)
+    
+    def _prune_snapshots(self, version: int):
+        """
+        Delete snapshots older than the FAISS_SNAPSHOTS_KEEP most recent (call under the exclusive lock)
+        
+        Deltas are small and kept for FAISS_DELTAS_KEEP versions, so a
+        rebuild running through many checkpoints can still replay them.
+        """
+        # Processes still mapping a deleted snapshot keep reading it until they swap
+        for name in os.listdir(self.snapshot_dir):
+            for pattern, keep in ((SNAPSHOT_FILE, settings.FAISS_SNAPSHOTS_KEEP), (DELTA_FILE, settings.FAISS_DELTAS_KEEP)):
+                match = pattern.match(name)
+                if match and int(match.group(1)) <= version - max(keep, 1):
+                    os.remove(os.path.join(self.snapshot_dir, name))
     
     def get_total_vectors(self) -> int:
-        """Get total number of vectors in index"""
-        return self.index.ntotal
+        """Get total number of vectors in index (HNSW tombstones are not counted)"""
+        return self.index.ntotal - self.tombstones
 
 
-# Global instance
-faiss_index = FAISSIndex(dimension=settings.EMBEDDING_DIMENSION)
+def create_faiss_index():
+    """The process-wide index: in-process, or a client for FAISS_SHARDS shard processes"""
+    if settings.FAISS_SHARDS > 0:
+        from app.ml.faiss_shards import ShardedFAISSIndex
+        return ShardedFAISSIndex(settings.EMBEDDING_DIMENSION, settings.FAISS_SHARDS)
+    return FAISSIndex(dimension=settings.EMBEDDING_DIMENSION)
 
+
+# Global instance
+faiss_index = create_faiss_index()
@@ -0,0 +1,373 @@
+import heapq
+import os
+import queue
+import signal
+import socket
+import struct
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain
+from multiprocessing.connection import Connection, Listener, answer_challenge, deliver_challenge
+from operator import itemgetter
+from typing import Any, Dict, List, Optional, Tuple
+import numpy as np
+from app.core.config import settings
+
+# Methods of FAISSShard that clients may call
+RPC_METHODS = frozenset({
+    "warm_up", "search_batch", "upsert_vectors", "remove_vectors", "build", "save", "get_total_vectors"
+})
+# Methods that may legitimately take minutes (loading, training, writing the index)
+MAINTENANCE_METHODS = frozenset({"warm_up", "build", "save"})
+
+
+def shard_address(shard_id: int) -> str:
+    """Unix socket path of a shard process"""
+    return os.path.join(settings.FAISS_SHARD_SOCKET_DIR, f"shard{shard_id}.sock")
+
+
+def shard_index_path(shard_id: int) -> str:
+    """Index file of a shard, next to FAISS_INDEX_PATH"""
+    root, ext = os.path.splitext(settings.FAISS_INDEX_PATH)
+    return f"{root}_shard{shard_id}{ext}"
+
+
+def shard_of(video_ids: np.ndarray, n_shards: int) -> np.ndarray:
+    """Shard owning each video ID"""
+    return np.asarray(video_ids, dtype="int64") % n_shards
+
+
+def authkey() -> bytes:
+    """
+    Key authenticating shard connections, which carry pickled requests
+    
+    Raises:
+        ValueError: SECRET_KEY is still a published placeholder, which would
+            let anyone able to reach the sockets run code in the shards
+    """
+    if settings.secret_key_is_placeholder:
+        raise ValueError("FAISS shards need SECRET_KEY set to a private value, not the placeholder from the docs")
+    return settings.SECRET_KEY.encode("utf-8")
+
+
+class FAISSShard:
+    """
+    One partition of the catalog, served from its own FAISSIndex over a Unix socket
+    
+    Each client connection is handled on its own thread; the index's
+    read/write lock lets searches from different connections run in parallel.
+    """
+    
+    def __init__(self, shard_id: int, index_path: Optional[str] = None, address: Optional[str] = None):
+        from app.ml.faiss_index import FAISSIndex
+        
+        self.shard_id = shard_id
+        self.address = address or shard_address(shard_id)
+        self.index = FAISSIndex(
+            dimension=settings.EMBEDDING_DIMENSION,
+            index_path=index_path or shard_index_path(shard_id)
+        )
+    
+    def warm_up(self):
+        self.index.warm_up()
+    
+    def search_batch(self, *args, **kwargs) -> List[List[Tuple[int, float]]]:
+        return self.index.search_batch(*args, **kwargs)
+    
+    def upsert_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+        self.index.upsert_vectors(vectors, video_ids)
+    
+    def remove_vectors(self, video_ids: List[int]) -> int:
+        return self.index.remove_vectors(video_ids)
+    
+    def build(self, vectors: np.ndarray, video_ids: List[int]):
+        self.index.build(vectors, video_ids)
+    
+    def save(self):
+        """Save if there are unsaved changes (API workers ask every checkpoint interval)"""
+        if self.index.dirty:
+            self.index.save()
+    
+    def get_total_vectors(self) -> int:
+        return self.index.get_total_vectors()
+    
+    def serve_forever(self):
+        """Load the index and answer requests until SIGTERM/SIGINT, then save"""
+        key = authkey()
+        
+        def stop(signum, frame):
+            raise SystemExit(0)
+        signal.signal(signal.SIGTERM, stop)
+        
+        socket_dir = os.path.dirname(self.address) or "."
+        # Only this user may connect; the mode applies when the directory is created here
+        os.makedirs(socket_dir, mode=0o700, exist_ok=True)
+        if os.stat(socket_dir).st_mode & 0o077:
+            print(f"Warning: FAISS shard socket directory {socket_dir} is accessible to other users")
+        if os.path.exists(self.address):
+            os.remove(self.address)
+        
+        self.warm_up()
+        self.index.start_watcher()
+        listener = Listener(self.address, family="AF_UNIX", authkey=key)
+        os.chmod(self.address, 0o600)
+        print(f"FAISS shard {self.shard_id} serving {self.get_total_vectors()} vectors on {self.address}")
+        try:
+            while True:
+                try:
+                    conn = listener.accept()
+                except (OSError, EOFError) as e:
+                    # Failed handshake (e.g. wrong authkey); keep serving
+                    print(f"FAISS shard {self.shard_id} accept error: {e}")
+                    continue
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+        except (KeyboardInterrupt, SystemExit):
+            pass
+        finally:
+            # A second signal must not interrupt the save
+            signal.signal(signal.SIGTERM, signal.SIG_IGN)
+            signal.signal(signal.SIGINT, signal.SIG_IGN)
+            listener.close()
+            self.index.stop_watcher()
+            self.save()
+    
+    def _handle(self, conn: Connection):
+        with conn:
+            while True:
+                try:
+                    method, args, kwargs = conn.recv()
+                except (EOFError, OSError):
+                    return
+                try:
+                    if method not in RPC_METHODS:
+                        raise ValueError(f"Unknown shard method {method!r}")
+                    conn.send(("ok", getattr(self, method)(*args, **kwargs)))
+                except Exception as e:
+                    conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class ShardError(Exception):
+    """A shard process failed a request or could not be reached"""
+
+
+class ShardedFAISSIndex:
+    """
+    FAISSIndex interface over shard processes, each holding the videos with video_id % n_shards == shard
+    
+    Searches fan out to every shard in parallel and the per-shard top-k
+    lists are merged; writes go to the shards owning the IDs. A shard that
+    fails a search is skipped (its videos are missing from the results)
+    rather than failing the request.
+    """
+    
+    def __init__(self, dimension: int, n_shards: int, addresses: Optional[List[str]] = None):
+        self.dimension = dimension
+        self.n_shards = n_shards
+        self.addresses = addresses or [shard_address(shard_id) for shard_id in range(n_shards)]
+        if len(self.addresses) != n_shards:
+            raise ValueError("need one address per shard")
+        # Fail at startup rather than on every request
+        self._authkey = authkey()
+        # True when shards have changes from this process that save() has not persisted
+        self.dirty = False
+        self._idle: List["queue.SimpleQueue[Connection]"] = [queue.SimpleQueue() for _ in range(n_shards)]
+        self._pool = ThreadPoolExecutor(max_workers=n_shards * settings.CPU_EXECUTOR_WORKERS,
+                                        thread_name_prefix="faiss-shard")
+    
+    def _connect(self, shard_id: int) -> Connection:
+        """
+        Open an authenticated connection to a shard
+        
+        The socket's kernel send/receive timeouts bound the connect, the
+        handshake and every later blocking read or write on the connection,
+        so a shard that stopped accepting or reading fails the call with an
+        OSError instead of hanging it.
+        """
+        timeout = settings.FAISS_SHARD_TIMEOUT_SECONDS
+        seconds = int(timeout)
+        timeval = struct.pack("ll", seconds, int((timeout - seconds) * 1e6))
+        sock = socket.socket(socket.AF_UNIX)
+        try:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVTIMEO, timeval)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDTIMEO, timeval)
+            sock.connect(self.addresses[shard_id])
+            conn = Connection(sock.detach())
+        finally:
+            sock.close()
+        try:
+            answer_challenge(conn, self._authkey)
+            deliver_challenge(conn, self._authkey)
+        except BaseException:
+            conn.close()
+            raise
+        return conn
+    
+    def _call(self, shard_id: int, method: str, *args, **kwargs) -> Any:
+        """Call a method on one shard over a pooled connection, failing if it does not answer in time"""
+        timeout = (settings.FAISS_SHARD_MAINTENANCE_TIMEOUT_SECONDS if method in MAINTENANCE_METHODS
+                   else settings.FAISS_SHARD_TIMEOUT_SECONDS)
+        deadline = time.monotonic() + timeout
+        try:
+            conn = self._idle[shard_id].get_nowait()
+        except queue.Empty:
+            try:
+                conn = self._connect(shard_id)
+            except (OSError, EOFError) as e:
+                raise ShardError(f"shard {shard_id} unreachable at {self.addresses[shard_id]}: {e}")
+        
+        try:
+            conn.send((method, args, kwargs))
+            if not conn.poll(max(deadline - time.monotonic(), 0)):
+                # The late answer would be read by the next call, so the connection can't be reused
+                conn.close()
+                raise ShardError(f"shard {shard_id} did not answer {method} within {timeout:g}s")
+            status, result = conn.recv()
+        except (OSError, EOFError) as e:
+            conn.close()
+            raise ShardError(f"shard {shard_id} connection lost: {e}")
+        
+        self._idle[shard_id].put(conn)
+        if status != "ok":
+            raise ShardError(f"shard {shard_id}: {result}")
+        return result
+    
+    def _call_shards(self, calls: Dict[int, Tuple[str, tuple, dict]]) -> Dict[int, Any]:
+        """Run one call per shard in parallel; raises the first failure after all have finished"""
+        futures = {
+            shard_id: self._pool.submit(self._call, shard_id, method, *args, **kwargs)
+            for shard_id, (method, args, kwargs) in calls.items()
+        }
+        results, error = {}, None
+        for shard_id, future in futures.items():
+            try:
+                results[shard_id] = future.result()
+            except ShardError as e:
+                error = error or e
+        if error:
+            raise error
+        return results
+    
+    def _partition(self, ids: np.ndarray) -> Dict[int, np.ndarray]:
+        """Row positions of ids per owning shard"""
+        shards = shard_of(ids, self.n_shards)
+        return {shard_id: np.flatnonzero(shards == shard_id) for shard_id in range(self.n_shards)}
+    
+    def warm_up(self):
+        """Make every shard load its index, which also checks they are reachable"""
+        self._call_shards({shard_id: ("warm_up", (), {}) for shard_id in range(self.n_shards)})
+    
+    def search(self, query_vector: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+               ef_search: Optional[int] = None, exclude_ids: Optional[List[int]] = None,
+               id_filter: Optional[np.ndarray] = None) -> List[Tuple[int, float]]:
+        """Search for similar vectors (see FAISSIndex.search)"""
+        return self.search_batch(query_vector, k=k, nprobe=nprobe, ef_search=ef_search,
+                                 exclude_ids=exclude_ids, id_filter=id_filter)[0]
+    
+    def search_batch(self, query_vectors: np.ndarray, k: int = 10, nprobe: Optional[int] = None,
+                     ef_search: Optional[int] = None, exclude_ids: Optional[List[int]] = None,
+                     id_filter: Optional[np.ndarray] = None) -> List[List[Tuple[int, float]]]:
+        """
+        Search every shard in parallel and merge the results (see FAISSIndex.search_batch)
+        
+        Returns:
+            One list of (video_id, similarity_score) tuples per query row,
+            the k best across all shards that answered
+        """
+        query_vectors = np.asarray(query_vectors, dtype="float32").reshape(-1, self.dimension)
+        # The ID bitmap is indexed by video ID, so every shard reads the same one
+        kwargs = {"k": k, "nprobe": nprobe, "ef_search": ef_search, "id_filter": id_filter}
+        # Each shard only needs the excluded IDs it owns
+        exclude_by_shard = {}
+        if exclude_ids is not None and len(exclude_ids):
+            ids = np.asarray(exclude_ids, dtype="int64").reshape(-1)
+            exclude_by_shard = {shard_id: ids[positions].tolist() for shard_id, positions in self._partition(ids).items()}
+        futures = [
+            self._pool.submit(self._call, shard_id, "search_batch", query_vectors,
+                              exclude_ids=exclude_by_shard.get(shard_id), **kwargs)
+            for shard_id in range(self.n_shards)
+        ]
+        
+        per_shard, error = [], None
+        for shard_id, future in enumerate(futures):
+            try:
+                per_shard.append(future.result())
+            except ShardError as e:
+                print(f"FAISS shard search error: {e}")
+                error = e
+        if not per_shard:
+            raise error
+        
+        return [
+            heapq.nlargest(k, chain.from_iterable(results[row] for results in per_shard), key=itemgetter(1))
+            for row in range(len(query_vectors))
+        ]
+    
+    def build(self, vectors: np.ndarray, video_ids: List[int]):
+        """Replace every shard's index with its partition of vectors"""
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        ids = np.asarray(video_ids, dtype="int64").reshape(-1)
+        if len(ids) != len(vectors):
+            raise ValueError("vectors and video_ids must have the same length")
+        self._call_shards({
+            shard_id: ("build", (vectors[positions], ids[positions].tolist()), {})
+            for shard_id, positions in self._partition(ids).items()
+        })
+        self.dirty = True
+    
+    def upsert_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+        """Insert or replace vectors, each on the shard that owns its video ID"""
+        if len(vectors) == 0:
+            return
+        vectors = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        ids = np.asarray(video_ids, dtype="int64").reshape(-1)
+        if len(ids) != len(vectors):
+            raise ValueError("vectors and video_ids must have the same length")
+        self._call_shards({
+            shard_id: ("upsert_vectors", (vectors[positions], ids[positions].tolist()), {})
+            for shard_id, positions in self._partition(ids).items()
+            if len(positions)
+        })
+        self.dirty = True
+    
+    def upsert_vector(self, video_id: int, vector: np.ndarray):
+        """Insert or replace the vector for a single video"""
+        self.upsert_vectors(np.asarray(vector).reshape(1, -1), [video_id])
+    
+    def add_vectors(self, vectors: np.ndarray, video_ids: List[int]):
+        """Add vectors to the index (existing video IDs are replaced)"""
+        self.upsert_vectors(vectors, video_ids)
+    
+    def remove_vectors(self, video_ids: List[int]) -> int:
+        """Remove vectors for a batch of videos; returns the number removed"""
+        if len(video_ids) == 0:
+            return 0
+        ids = np.asarray(video_ids, dtype="int64").reshape(-1)
+        removed = sum(self._call_shards({
+            shard_id: ("remove_vectors", (ids[positions].tolist(),), {})
+            for shard_id, positions in self._partition(ids).items()
+            if len(positions)
+        }).values())
+        self.dirty = self.dirty or removed > 0
+        return removed
+    
+    def remove_vector(self, video_id: int) -> bool:
+        """Remove the vector for a single video. Returns True if it was present."""
+        return self.remove_vectors([video_id]) > 0
+    
+    def save(self):
+        """Ask every shard to save its index"""
+        self._call_shards({shard_id: ("save", (), {}) for shard_id in range(self.n_shards)})
+        self.dirty = False
+    
+    def start_watcher(self):
+        """No-op: each shard process watches for its own new snapshots"""
+    
+    def stop_watcher(self):
+        """No-op: see start_watcher"""
+    
+    def get_total_vectors(self) -> int:
+        """Total vectors across shards"""
+        return sum(self._call_shards(
+            {shard_id: ("get_total_vectors", (), {}) for shard_id in range(self.n_shards)}
+        ).values())
@@ -0,0 +1,186 @@
+import queue
+import threading
+import time
+from typing import List
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.video import Video
+from app.ml.faiss_index import faiss_index
+from app.ml.recommender import recommendation_service
+
+
+class EmbeddingIngestionWorker:
+    """
+    Background worker that embeds new and updated videos in micro-batches
+    
+    Request handlers only enqueue video IDs. The worker thread collects them
+    into batches, runs one model call per batch, writes the embeddings in one
+    commit, upserts them into the FAISS index in bulk and saves the index
+    periodically rather than on every write.
+    
+    Between batches it also backfills videos that still have no embedding.
+    Backfill batches are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    the workers of all API processes share the backlog instead of each
+    embedding all of it. Embeddings are only committed once the index has
+    them, so a failed index write (e.g. a FAISS shard that is down) leaves
+    the videos to the backfill, which retries them.
+    """
+    
+    def __init__(self):
+        self.queue: "queue.Queue[int]" = queue.Queue()
+        self.batch_size = settings.INGEST_BATCH_SIZE
+        self.max_wait = settings.INGEST_MAX_WAIT_SECONDS
+        self.checkpoint_interval = settings.INDEX_CHECKPOINT_INTERVAL
+        self._stop_event = threading.Event()
+        self._thread = None
+        self._backfilling = False
+        self._backfill_retry_at = None
+        self._last_checkpoint = time.monotonic()
+    
+    def enqueue(self, video_id: int):
+        """Schedule a video for (re-)embedding"""
+        self.queue.put(video_id)
+    
+    def start(self, backfill: bool = True):
+        """
+        Start the worker thread
+        
+        Args:
+            backfill: Embed videos that still have no embedding, e.g. because
+                a previous process stopped before its queue was drained
+        """
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._backfilling = backfill
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="embedding-ingestion", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 30.0):
+        """Stop the worker, process what is still queued and save the index"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        
+        remaining = self._drain(self.queue.qsize())
+        for start in range(0, len(remaining), self.batch_size):
+            self._process_safely(remaining[start:start + self.batch_size])
+        self.checkpoint(force=True)
+    
+    def process_batch(self, video_ids: List[int]):
+        """Embed a batch of videos, store the embeddings and upsert them into the index"""
+        db = SessionLocal()
+        try:
+            self._embed(db, db.query(Video).filter(Video.id.in_(set(video_ids))).all())
+        finally:
+            db.close()
+    
+    def backfill_batch(self) -> int:
+        """
+        Embed up to batch_size videos that have no embedding yet
+        
+        Rows another process is already embedding are skipped, and the ones
+        claimed here stay locked until their embeddings are committed.
+        
+        Returns:
+            Number of videos embedded, 0 once none are left
+        """
+        db = SessionLocal()
+        try:
+            videos = (
+                db.query(Video)
+                .filter(Video.embedding.is_(None))
+                .order_by(Video.id)
+                .limit(self.batch_size)
+                .with_for_update(skip_locked=True)
+                .all()
+            )
+            self._embed(db, videos)
+            return len(videos)
+        finally:
+            db.close()
+    
+    def _embed(self, db: Session, videos: List[Video]):
+        """Encode videos, upsert them into the index, then store their embeddings in one commit"""
+        if not videos:
+            return
+        
+        embeddings = recommendation_service.encode_videos(videos)
+        for video, embedding in zip(videos, embeddings):
+            video.embedding = embedding
+        # If the index write fails the rows are not committed and keep no embedding,
+        # which marks them for the backfill; upserting again after a failed commit is harmless
+        faiss_index.upsert_vectors(embeddings, [video.id for video in videos])
+        db.commit()
+    
+    def checkpoint(self, force: bool = False):
+        """Save the index if it has unsaved changes and the interval has elapsed"""
+        if not faiss_index.dirty:
+            return
+        if force or time.monotonic() - self._last_checkpoint >= self.checkpoint_interval:
+            faiss_index.save()
+            self._last_checkpoint = time.monotonic()
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            if self._backfill_retry_at is not None and time.monotonic() >= self._backfill_retry_at:
+                self._backfill_retry_at = None
+                self._backfilling = True
+            batch = self._next_batch()
+            if batch:
+                self._process_safely(batch)
+            if self._backfilling:
+                self._backfill_safely()
+            self.checkpoint()
+    
+    def _next_batch(self) -> List[int]:
+        """Wait for a first ID (not while backfilling), then collect more until the batch is full or max_wait passes"""
+        try:
+            batch = [self.queue.get(block=not self._backfilling, timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _drain(self, n: int) -> List[int]:
+        items = []
+        for _ in range(n):
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _process_safely(self, video_ids: List[int]):
+        try:
+            self.process_batch(video_ids)
+        except Exception as e:
+            # Videos stay without an embedding; backfill them once the failure clears
+            print(f"Embedding ingestion error: {e}")
+            if self._backfill_retry_at is None:
+                self._backfilling = True
+    
+    def _backfill_safely(self):
+        try:
+            self._backfilling = self.backfill_batch() > 0
+        except Exception as e:
+            # Pause rather than claim the same failing rows again right away
+            self._backfilling = False
+            self._backfill_retry_at = time.monotonic() + settings.INGEST_BACKFILL_RETRY_SECONDS
+            print(f"Embedding backfill error: {e}")
+
+
+# Global instance
+ingestion_worker = EmbeddingIngestionWorker()
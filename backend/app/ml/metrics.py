@@ -0,0 +1,50 @@
+import os
+import threading
+from collections import Counter
+from typing import Dict
+
+
+class RecommendationMetrics:
+    """
+    Counters of how personalized recommendations were served, per worker process
+
+    Counted per user in each recommendation request:
+        users: users served
+        cold_start: users without a profile, served popular videos only
+        backfilled: users with a profile whose personalized list was short of
+            the limit and was filled up with popular videos
+        excluded_in_search: users whose watched videos were excluded inside
+            the FAISS search (IDSelector) rather than by over-fetching
+        neighbors_fetched: FAISS results requested for these users (k per query row)
+    """
+
+    FIELDS = ("users", "cold_start", "backfilled", "excluded_in_search", "neighbors_fetched")
+
+    def __init__(self):
+        self._counts = Counter()
+        self._lock = threading.Lock()
+
+    def record(self, **counts: int):
+        """Add to one or more counters"""
+        with self._lock:
+            self._counts.update(counts)
+
+    def snapshot(self) -> Dict:
+        """Current counters and the derived rates"""
+        with self._lock:
+            counts = {field: self._counts[field] for field in self.FIELDS}
+        personalized = counts["users"] - counts["cold_start"]
+        return {
+            "pid": os.getpid(),
+            **counts,
+            "backfill_rate": counts["backfilled"] / personalized if personalized else 0.0,
+            "neighbors_per_user": counts["neighbors_fetched"] / personalized if personalized else 0.0
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counts.clear()
+
+
+# Global instance
+recommendation_metrics = RecommendationMetrics()
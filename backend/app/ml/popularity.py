@@ -0,0 +1,203 @@
+import asyncio
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+from sqlalchemy import func
+from sqlalchemy.orm import Session, load_only
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_client import get_cache, set_cache, popular_videos_key
+from app.models.video import Video, VIDEO_RESPONSE_COLUMNS
+from app.models.watch_history import WatchHistory
+from app.schemas.recommendation import Recommendation
+from app.schemas.video import VideoResponse
+
+# Watches older than this many half-lives weigh < 0.4% and are left out of the decayed score
+DECAY_WINDOW_HALF_LIVES = 8
+
+
+class PopularityService:
+    """
+    Precomputed top-K popular videos, overall and per category
+    
+    The ranking is computed from the whole videos table at most once per
+    refresh interval, shared between workers through Redis and kept in
+    process memory, so cold-start and backfill requests never touch the table.
+    
+    A stale ranking keeps being served while a background thread refreshes
+    it, so callers on the event loop (db.run_sync) never wait on Redis or
+    compute(). Only the very first load blocks, in a single caller; async
+    code awaits ensure_loaded() first so that load runs off the loop.
+    """
+    
+    def __init__(self):
+        self.top_k = settings.POPULARITY_TOP_K
+        self.refresh_interval = settings.POPULARITY_REFRESH_SECONDS
+        self.half_life_days = settings.POPULARITY_HALF_LIFE_DAYS
+        self._lists: Dict[Optional[str], List[Recommendation]] = {}
+        self._computed_at = 0.0
+        self._refresh_lock = threading.Lock()
+    
+    def warm_up(self):
+        """Load the ranking before the first request needs it"""
+        db = SessionLocal()
+        try:
+            self._current_lists(db)
+        finally:
+            db.close()
+    
+    async def ensure_loaded(self):
+        """Load the ranking in a worker thread if this process has none yet"""
+        if not self._lists:
+            await asyncio.to_thread(self.warm_up)
+    
+    def get_popular(
+        self,
+        db: Session,
+        limit: int,
+        category: Optional[str] = None
+    ) -> List[Recommendation]:
+        """
+        Get the most popular videos
+        
+        Args:
+            db: Database session, only used to load the ranking if there is none yet
+            limit: Number of videos to return (at most POPULARITY_TOP_K)
+            category: Restrict to one category; None ranks the whole catalog
+        
+        Returns:
+            Recommendations in popularity order
+        """
+        return self._current_lists(db).get(category, [])[:limit]
+    
+    def refresh(self, db: Session, force: bool = False):
+        """
+        Reload the ranking from Redis, or recompute and publish it
+        
+        Args:
+            db: Database session
+            force: Recompute even if another worker published a fresh ranking
+        """
+        payload = None if force else get_cache(popular_videos_key())
+        if not payload or time.time() - payload["computed_at"] >= self.refresh_interval:
+            payload = self.compute(db)
+            set_cache(popular_videos_key(), payload, ttl=self.refresh_interval * 2)
+        self._load(payload)
+    
+    def compute(self, db: Session) -> Dict[str, Any]:
+        """
+        Rank the catalog overall and within each category
+        
+        Returns:
+            JSON-serializable payload: video fields by ID and ranked ID lists
+        """
+        computed_at = time.time()
+        order, recent = self._ranking_order(db)
+        
+        overall = db.query(Video.id)
+        if recent is not None:
+            overall = overall.outerjoin(recent, recent.c.video_id == Video.id)
+        overall_ids = [row[0] for row in overall.order_by(*order).limit(self.top_k).all()]
+        
+        # One pass over the table ranks every category
+        ranked = db.query(
+            Video.id.label("id"),
+            Video.category.label("category"),
+            func.row_number().over(partition_by=Video.category, order_by=order).label("rank")
+        ).filter(Video.category.isnot(None))
+        if recent is not None:
+            ranked = ranked.outerjoin(recent, recent.c.video_id == Video.id)
+        ranked = ranked.subquery()
+        categories: Dict[str, List[int]] = {}
+        for video_id, category in db.query(ranked.c.id, ranked.c.category).filter(
+            ranked.c.rank <= self.top_k
+        ).order_by(ranked.c.category, ranked.c.rank).all():
+            categories.setdefault(category, []).append(video_id)
+        
+        video_ids = set(overall_ids).union(*categories.values())
+        videos = db.query(Video).options(
+            load_only(*VIDEO_RESPONSE_COLUMNS)
+        ).filter(Video.id.in_(video_ids)).all() if video_ids else []
+        
+        return {
+            "computed_at": computed_at,
+            "videos": {
+                str(video.id): VideoResponse.model_validate(video).model_dump(mode="json")
+                for video in videos
+            },
+            "overall": overall_ids,
+            "categories": categories,
+        }
+    
+    def _ranking_order(self, db: Session):
+        """ORDER BY clauses and, with time decay, the subquery of decayed watch counts to join"""
+        order = [Video.views.desc(), Video.likes.desc(), Video.id.desc()]
+        if self.half_life_days <= 0:
+            return order, None
+        
+        since = datetime.now(timezone.utc) - timedelta(days=self.half_life_days * DECAY_WINDOW_HALF_LIVES)
+        age_days = func.extract("epoch", func.now() - WatchHistory.watched_at) / 86400.0
+        recent = db.query(
+            WatchHistory.video_id.label("video_id"),
+            func.sum(func.power(0.5, age_days / self.half_life_days)).label("score")
+        ).filter(
+            WatchHistory.watched_at >= since
+        ).group_by(WatchHistory.video_id).subquery()
+        
+        # Recent watches rank first; videos without any fall back to lifetime views/likes
+        return [func.coalesce(recent.c.score, 0.0).desc()] + order, recent
+    
+    def _current_lists(self, db: Session) -> Dict[Optional[str], List[Recommendation]]:
+        if time.time() - self._computed_at < self.refresh_interval:
+            return self._lists
+        
+        if self._lists:
+            # Serve the stale lists; at most one refresh runs at a time
+            if self._refresh_lock.acquire(blocking=False):
+                threading.Thread(target=self._refresh_in_background, name="popularity-refresh", daemon=True).start()
+            return self._lists
+        
+        # Nothing to serve yet: one caller loads the ranking while the others wait for it
+        with self._refresh_lock:
+            if not self._lists:
+                try:
+                    self.refresh(db)
+                except Exception as e:
+                    print(f"Popularity refresh error: {e}")
+        return self._lists
+    
+    def _refresh_in_background(self):
+        """Refresh with its own session, then release the lock taken by _current_lists"""
+        db = SessionLocal()
+        try:
+            self.refresh(db)
+        except Exception as e:
+            print(f"Popularity refresh error: {e}")
+        finally:
+            db.close()
+            self._refresh_lock.release()
+    
+    def _load(self, payload: Dict[str, Any]):
+        videos = {
+            int(video_id): VideoResponse(**fields) for video_id, fields in payload["videos"].items()
+        }
+        
+        def recommendations(video_ids: List[int], reason: str) -> List[Recommendation]:
+            return [
+                Recommendation(video=videos[video_id], similarity_score=0.0, reason=reason)
+                for video_id in video_ids
+                if video_id in videos
+            ]
+        
+        lists = {None: recommendations(payload["overall"], "Popular video")}
+        for category, video_ids in payload["categories"].items():
+            lists[category] = recommendations(video_ids, f"Popular in {category}")
+        
+        # Readers see either the old or the new lists, never a partially built one
+        self._lists = lists
+        self._computed_at = payload["computed_at"]
+
+
+# Global instance
+popularity_service = PopularityService()
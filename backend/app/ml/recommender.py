@@ -1,10 +1,20 @@
-from typing import List, Dict, Optional
+from collections import defaultdict
+from operator import itemgetter
+from typing import List, Dict, Optional, Set, Tuple
 import numpy as np
-from sqlalchemy.orm import Session
-from app.models.video import Video
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, load_only
+from app.core.config import settings
+from app.core.executor import run_cpu_bound
+from app.models.video import Video, VIDEO_RESPONSE_COLUMNS
 from app.models.watch_history import WatchHistory
 from app.ml.embeddings import embedding_service
 from app.ml.faiss_index import faiss_index
+from app.ml.metrics import recommendation_metrics
+from app.ml.popularity import popularity_service
+from app.ml.tags import WatchedProfile, tag_vocabulary
+from app.ml.user_profile import user_profile_service
+from app.ml.video_metadata import VideoFilter, video_metadata
 from app.schemas.recommendation import Recommendation, RecommendationResponse
 from app.schemas.video import VideoResponse
 
@@ -15,13 +25,25 @@ class RecommendationService:
     def __init__(self):
         self.embedding_service = embedding_service
         self.faiss_index = faiss_index
+        self.profile_service = user_profile_service
+        self.popularity_service = popularity_service
+        self.tag_vocabulary = tag_vocabulary
+        self.video_metadata = video_metadata
+    
+    def warm_up(self):
+        """Load the embedding model, FAISS index, popularity ranking and filter metadata, which are otherwise loaded on first use"""
+        self.embedding_service.warm_up()
+        self.faiss_index.warm_up()
+        self.popularity_service.warm_up()
+        self.video_metadata.warm_up()
     
     def get_recommendations(
         self,
         db: Session,
         user_id: int,
         limit: int = 10,
-        exclude_watched: bool = True
+        exclude_watched: bool = True,
+        video_filter: Optional[VideoFilter] = None
     ) -> RecommendationResponse:
         """
         Get video recommendations for a user
@@ -31,158 +53,501 @@ class RecommendationService:
             user_id: User ID
             limit: Number of recommendations to return
             exclude_watched: Whether to exclude videos the user has already watched
+            video_filter: Only recommend videos of this category and/or duration range
             
         Returns:
             RecommendationResponse with recommended videos
         """
-        # Get user's watch history
-        watched_videos = db.query(WatchHistory.video_id).filter(
-            WatchHistory.user_id == user_id
-        ).all()
-        watched_video_ids = [w[0] for w in watched_videos]
+        return self.get_recommendations_batch(db, [user_id], limit, exclude_watched, video_filter)[0]
+    
+    def get_recommendations_batch(
+        self,
+        db: Session,
+        user_ids: List[int],
+        limit: int = 10,
+        exclude_watched: bool = True,
+        video_filter: Optional[VideoFilter] = None
+    ) -> List[RecommendationResponse]:
+        """
+        Get video recommendations for many users at once
+        
+        Watch history, profile vectors and candidate videos are loaded with
+        one query each, and all user vectors go through a single FAISS search.
+        
+        Args:
+            db: Database session
+            user_ids: User IDs (duplicates are ignored)
+            limit: Number of recommendations to return per user
+            exclude_watched: Whether to exclude videos each user has already watched
+            video_filter: Only recommend videos of this category and/or duration
+                range; the filter is applied inside the FAISS search, so the
+                results are the nearest matching videos rather than the
+                matching part of the global nearest
+            
+        Returns:
+            One RecommendationResponse per distinct user, in request order
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        
+        watched_by_user, user_embeddings, missing_user_ids = self._load_user_state(db, user_ids)
+        if missing_user_ids:
+            videos = self._videos_missing_embeddings(db, missing_user_ids, watched_by_user)
+            embeddings = self.encode_videos(videos)
+            self._rebuild_profiles(db, missing_user_ids, videos, embeddings, user_embeddings)
+        
+        search_user_ids = [user_id for user_id in user_ids if user_id in user_embeddings]
+        user_centroids = self._user_centroids(db, search_user_ids)
+        watched_labels = self.profile_service.get_watched_labels(db, search_user_ids)
+        id_filter = self.video_metadata.bitmap(db, video_filter)
+        similar_by_user = self._search_users(
+            search_user_ids, user_embeddings, limit, user_centroids,
+            self._excluded_videos(search_user_ids, watched_by_user, exclude_watched), id_filter
+        )
+        candidates = self.hydrate_videos(db, self._candidate_ids(similar_by_user))
+        
+        ranked = self._rank_users(
+            user_ids, similar_by_user, candidates, watched_by_user, watched_labels, limit, exclude_watched
+        )
+        self._record_metrics(user_ids, similar_by_user, ranked, limit)
+        popular = self._popular_backfill(db, ranked, limit, video_filter)
+        return self._assemble_responses(user_ids, ranked, popular, limit)
+    
+    async def get_recommendations_batch_async(
+        self,
+        db: AsyncSession,
+        user_ids: List[int],
+        limit: int = 10,
+        exclude_watched: bool = True,
+        video_filter: Optional[VideoFilter] = None
+    ) -> List[RecommendationResponse]:
+        """
+        Async variant of get_recommendations_batch for the request path
+        
+        Database steps run through the async session and CPU-bound steps
+        (embedding inference, FAISS search) run on the bounded executor, so
+        the event loop is never blocked.
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        
+        watched_by_user, user_embeddings, missing_user_ids = await db.run_sync(
+            self._load_user_state, user_ids
+        )
+        if missing_user_ids:
+            videos = await db.run_sync(self._videos_missing_embeddings, missing_user_ids, watched_by_user)
+            embeddings = await run_cpu_bound(self.encode_videos, videos)
+            await db.run_sync(
+                self._rebuild_profiles, missing_user_ids, videos, embeddings, user_embeddings
+            )
+        
+        search_user_ids = [user_id for user_id in user_ids if user_id in user_embeddings]
+        user_centroids, stale = await db.run_sync(self.profile_service.get_centroids, search_user_ids)
+        if stale:
+            histories = await db.run_sync(self.profile_service.load_histories, list(stale))
+            fitted = await run_cpu_bound(self.profile_service.fit_centroids_many, histories)
+            await db.run_sync(self._store_centroids, fitted, stale, user_centroids)
+        watched_labels = await db.run_sync(self.profile_service.get_watched_labels, search_user_ids)
+        id_filter = await db.run_sync(self.video_metadata.bitmap, video_filter)
+        similar_by_user = await run_cpu_bound(
+            self._search_users, search_user_ids, user_embeddings, limit, user_centroids,
+            self._excluded_videos(search_user_ids, watched_by_user, exclude_watched), id_filter
+        )
+        candidates = await db.run_sync(self.hydrate_videos, self._candidate_ids(similar_by_user))
+        
+        ranked = self._rank_users(
+            user_ids, similar_by_user, candidates, watched_by_user, watched_labels, limit, exclude_watched
+        )
+        self._record_metrics(user_ids, similar_by_user, ranked, limit)
+        await self.popularity_service.ensure_loaded()
+        popular = await db.run_sync(self._popular_backfill, ranked, limit, video_filter)
+        return self._assemble_responses(user_ids, ranked, popular, limit)
+    
+    def _load_user_state(
+        self,
+        db: Session,
+        user_ids: List[int]
+    ) -> Tuple[Dict[int, List[int]], Dict[int, np.ndarray], List[int]]:
+        """
+        Load watch history and stored profile vectors for a batch of users
         
-        if not watched_video_ids:
-            # New user - return popular videos
-            return self._get_popular_recommendations(db, user_id, limit)
+        Returns:
+            (watched video IDs per user, profile vector per user,
+             users with history but no stored profile)
+        """
+        watched_by_user: Dict[int, List[int]] = defaultdict(list)
+        for user_id, video_id in db.query(WatchHistory.user_id, WatchHistory.video_id).filter(
+            WatchHistory.user_id.in_(user_ids)
+        ).all():
+            watched_by_user[user_id].append(video_id)
         
-        # Get embeddings of watched videos
-        watched_videos_data = db.query(Video).filter(
-            Video.id.in_(watched_video_ids)
+        active_user_ids = [user_id for user_id in user_ids if watched_by_user[user_id]]
+        user_embeddings = self.profile_service.get_profile_vectors(db, active_user_ids)
+        missing_user_ids = [user_id for user_id in active_user_ids if user_id not in user_embeddings]
+        return watched_by_user, user_embeddings, missing_user_ids
+    
+    def _videos_missing_embeddings(
+        self,
+        db: Session,
+        user_ids: List[int],
+        watched_by_user: Dict[int, List[int]]
+    ) -> List[Video]:
+        """Watched videos of the given users that have no embedding yet"""
+        video_ids = {vid for user_id in user_ids for vid in watched_by_user[user_id]}
+        return db.query(Video).filter(
+            Video.id.in_(video_ids),
+            Video.embedding.is_(None)
         ).all()
+    
+    def encode_videos(self, videos: List[Video]) -> np.ndarray:
+        """Generate embeddings for Video rows in one model call"""
+        if not videos:
+            return np.empty((0, self.embedding_service.dimension), dtype="float32")
+        return self.embedding_service.generate_embeddings_batch([
+            {
+                "title": video.title,
+                "description": video.description,
+                "tags": video.tags,
+                "category": video.category
+            }
+            for video in videos
+        ])
+    
+    def _rebuild_profiles(
+        self,
+        db: Session,
+        user_ids: List[int],
+        videos: List[Video],
+        embeddings: np.ndarray,
+        user_embeddings: Dict[int, np.ndarray]
+    ):
+        """Store generated embeddings, then build stored profiles for users that lack one"""
+        for video, embedding in zip(videos, embeddings):
+            video.embedding = embedding
+        if videos:
+            db.flush()
         
-        if not watched_videos_data:
-            return self._get_popular_recommendations(db, user_id, limit)
-        
-        # Compute average embedding of watched videos (user profile)
-        embeddings = []
-        for video in watched_videos_data:
-            if video.embedding:
-                embeddings.append(np.array(video.embedding))
-        
-        if not embeddings:
-            # Generate embeddings for watched videos if not present
-            for video in watched_videos_data:
-                embedding = self.embedding_service.generate_video_embedding(
-                    title=video.title,
-                    description=video.description,
-                    tags=video.tags,
-                    category=video.category
-                )
-                # Update video embedding in database
-                video.embedding = embedding.tolist()
-                embeddings.append(embedding)
-            db.commit()
-        
-        # Average embedding (user preference vector)
-        user_embedding = np.mean(embeddings, axis=0)
-        
-        # Search for similar videos
-        search_limit = limit * 3  # Get more results to filter
-        similar_videos = self.faiss_index.search(user_embedding, k=search_limit)
-        
-        # Filter and format results
-        recommendations = []
-        seen_video_ids = set(watched_video_ids) if exclude_watched else set()
+        for user_id in user_ids:
+            user_embedding = self.profile_service.rebuild_profile(db, user_id)
+            if user_embedding is not None:
+                user_embeddings[user_id] = user_embedding
+        db.commit()
+    
+    def _user_centroids(self, db: Session, user_ids: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """Interest centroids of users with enough history, refitting stale ones (empty unless USER_PROFILE_CENTROIDS > 1)"""
+        user_centroids, stale = self.profile_service.get_centroids(db, user_ids)
+        if stale:
+            histories = self.profile_service.load_histories(db, list(stale))
+            fitted = self.profile_service.fit_centroids_many(histories)
+            self._store_centroids(db, fitted, stale, user_centroids)
+        return user_centroids
+    
+    def _store_centroids(
+        self,
+        db: Session,
+        fitted: Dict[int, Tuple[np.ndarray, np.ndarray]],
+        watch_counts: Dict[int, int],
+        user_centroids: Dict[int, Tuple[np.ndarray, np.ndarray]]
+    ):
+        """Persist refitted centroids and add those with more than one centroid to user_centroids"""
+        self.profile_service.store_centroids(db, fitted, watch_counts)
+        db.commit()
+        user_centroids.update(
+            (user_id, (centroids, weights)) for user_id, (centroids, weights) in fitted.items() if len(weights) > 1
+        )
+    
+    @staticmethod
+    def _excluded_videos(
+        user_ids: List[int],
+        watched_by_user: Dict[int, List[int]],
+        exclude_watched: bool
+    ) -> Dict[int, Set[int]]:
+        """Videos to leave out of each user's search results"""
+        if not exclude_watched:
+            return {}
+        return {user_id: set(watched_by_user[user_id]) for user_id in user_ids}
+    
+    def _search_users(
+        self,
+        user_ids: List[int],
+        user_embeddings: Dict[int, np.ndarray],
+        limit: int,
+        user_centroids: Optional[Dict[int, Tuple[np.ndarray, np.ndarray]]] = None,
+        excluded_by_user: Optional[Dict[int, Set[int]]] = None,
+        id_filter: Optional[np.ndarray] = None
+    ) -> Dict[int, List[Tuple[int, float]]]:
+        """
+        Search for up to `limit` similar, not excluded videos per user
+        
+        Users with few excluded (watched) videos share one FAISS call with
+        k = limit + the largest such exclusion count, which guarantees
+        `limit` fresh results without a fixed over-fetch factor. Users with
+        more than EXCLUDE_IN_SEARCH_MIN_WATCHED get their own call with the
+        exclusion applied inside the search, so k stays at `limit`.
+        
+        Users with interest centroids contribute one query row per centroid;
+        their per-centroid results are merged into a single list.
+        
+        id_filter (a VideoMetadataStore bitmap) restricts every call to the
+        videos passing a category/duration filter.
+        """
+        if not user_ids:
+            return {}
+        
+        user_centroids = user_centroids or {}
+        excluded_by_user = excluded_by_user or {}
+        queries = {
+            user_id: user_centroids[user_id][0] if user_id in user_centroids else user_embeddings[user_id].reshape(1, -1)
+            for user_id in user_ids
+        }
+        n_excluded = {user_id: len(excluded_by_user.get(user_id, ())) for user_id in user_ids}
+        in_search = [user_id for user_id in user_ids if n_excluded[user_id] > settings.EXCLUDE_IN_SEARCH_MIN_WATCHED]
+        batched = [user_id for user_id in user_ids if n_excluded[user_id] <= settings.EXCLUDE_IN_SEARCH_MIN_WATCHED]
+        
+        results_by_user = {}
+        neighbors_fetched = 0
+        if batched:
+            k = limit + max(n_excluded[user_id] for user_id in batched)
+            results = self.faiss_index.search_batch(
+                np.vstack([queries[user_id] for user_id in batched]), k=k, id_filter=id_filter
+            )
+            row = 0
+            for user_id in batched:
+                results_by_user[user_id] = results[row:row + len(queries[user_id])]
+                row += len(queries[user_id])
+            neighbors_fetched += k * row
+        for user_id in in_search:
+            results_by_user[user_id] = self.faiss_index.search_batch(
+                queries[user_id], k=limit, exclude_ids=list(excluded_by_user[user_id]), id_filter=id_filter
+            )
+            neighbors_fetched += limit * len(queries[user_id])
+        recommendation_metrics.record(excluded_in_search=len(in_search), neighbors_fetched=neighbors_fetched)
+        
+        similar_by_user = {}
+        for user_id in user_ids:
+            excluded = excluded_by_user.get(user_id, ())
+            fresh = [
+                [(video_id, score) for video_id, score in hits if video_id not in excluded][:limit]
+                for hits in results_by_user[user_id]
+            ]
+            if user_id in user_centroids:
+                similar_by_user[user_id] = self._merge_centroid_results(fresh, user_centroids[user_id][1], limit)
+            else:
+                similar_by_user[user_id] = fresh[0]
+        return similar_by_user
+    
+    @staticmethod
+    def _merge_centroid_results(
+        results: List[List[Tuple[int, float]]],
+        weights: np.ndarray,
+        limit: int
+    ) -> List[Tuple[int, float]]:
+        """
+        Interleave per-centroid hits in proportion to each centroid's weight
+        
+        The hit at rank r of a centroid with weight w is placed at (r + 1) / w,
+        so a centroid holding 60% of the history gets about 60% of the slots
+        while small interests still appear near the top. A video found by
+        several centroids keeps its earliest placement.
+        """
+        placed = sorted(
+            (
+                ((rank + 1) / weight, video_id, score)
+                for hits, weight in zip(results, weights)
+                for rank, (video_id, score) in enumerate(hits)
+            ),
+            key=itemgetter(0)
+        )
+        merged, seen = [], set()
+        for _, video_id, score in placed:
+            if video_id in seen:
+                continue
+            seen.add(video_id)
+            merged.append((video_id, score))
+            if len(merged) >= limit:
+                break
+        return merged
+    
+    @staticmethod
+    def _candidate_ids(similar_by_user: Dict[int, List[Tuple[int, float]]]) -> List[int]:
+        return [video_id for results in similar_by_user.values() for video_id, _ in results]
+    
+    def _rank_users(
+        self,
+        user_ids: List[int],
+        similar_by_user: Dict[int, List[Tuple[int, float]]],
+        candidates: Dict[int, Video],
+        watched_by_user: Dict[int, List[int]],
+        watched_labels: Dict[int, Tuple[List[str], List[str]]],
+        limit: int,
+        exclude_watched: bool
+    ) -> Dict[int, List[Recommendation]]:
+        """Personalized recommendations per user (users without a profile get an empty list)"""
+        ranked = {}
+        for user_id in user_ids:
+            ranked[user_id] = []
+            if user_id not in similar_by_user:
+                continue
+            
+            watched_video_ids = watched_by_user[user_id]
+            # Built once per user from the labels stored with the profile, not from the history
+            watched_profile = WatchedProfile.from_labels(*watched_labels.get(user_id, ((), ())), self.tag_vocabulary)
+            ranked[user_id] = self._rank_candidates(
+                similar_by_user[user_id],
+                candidates,
+                watched_profile,
+                set(watched_video_ids) if exclude_watched else set(),
+                limit
+            )
+        return ranked
+    
+    @staticmethod
+    def _record_metrics(
+        user_ids: List[int],
+        similar_by_user: Dict[int, List[Tuple[int, float]]],
+        ranked: Dict[int, List[Recommendation]],
+        limit: int
+    ):
+        """Count users served without a profile, and those whose personalized list needs a backfill"""
+        cold_start = sum(1 for user_id in user_ids if user_id not in similar_by_user)
+        backfilled = sum(
+            1 for user_id in user_ids if user_id in similar_by_user and len(ranked[user_id]) < limit
+        )
+        recommendation_metrics.record(users=len(user_ids), cold_start=cold_start, backfilled=backfilled)
+    
+    def _popular_backfill(
+        self,
+        db: Session,
+        ranked: Dict[int, List[Recommendation]],
+        limit: int,
+        video_filter: Optional[VideoFilter] = None
+    ) -> List[Recommendation]:
+        """Popular videos, taken from the precomputed ranking only if some user is short of `limit`"""
+        if all(len(recommendations) >= limit for recommendations in ranked.values()):
+            return []
+        if video_filter is None or not video_filter.active:
+            return self.popularity_service.get_popular(db, limit)
+        
+        # The rankings are kept per category; duration bounds are applied to the category's list
+        popular = self.popularity_service.get_popular(db, self.popularity_service.top_k, video_filter.category)
+        return [rec for rec in popular if video_filter.matches(rec.video.category, rec.video.duration)][:limit]
+    
+    def _assemble_responses(
+        self,
+        user_ids: List[int],
+        ranked: Dict[int, List[Recommendation]],
+        popular: List[Recommendation],
+        limit: int
+    ) -> List[RecommendationResponse]:
+        """Fill short lists with popular videos and build one response per user"""
+        responses = []
+        for user_id in user_ids:
+            recommendations = list(ranked[user_id])
+            
+            # New users get popular videos; others are filled up with them if short
+            if len(recommendations) < limit:
+                # Merge without duplicates
+                existing_ids = {r.video.id for r in recommendations}
+                for rec in popular:
+                    if rec.video.id not in existing_ids:
+                        recommendations.append(rec)
+                        if len(recommendations) >= limit:
+                            break
+            
+            responses.append(RecommendationResponse(
+                user_id=user_id,
+                recommendations=recommendations[:limit],
+                total=len(recommendations)
+            ))
+        
+        return responses
+    
+    def _rank_candidates(
+        self,
+        similar_videos: List[Tuple[int, float]],
+        candidates: Dict[int, Video],
+        watched_profile: WatchedProfile,
+        seen_video_ids: Set[int],
+        limit: int
+    ) -> List[Recommendation]:
+        """Turn ranked FAISS hits into recommendations, skipping seen videos"""
+        selected = []
+        seen_video_ids = set(seen_video_ids)
         
         for video_id, similarity_score in similar_videos:
             if video_id in seen_video_ids:
                 continue
             
-            video = db.query(Video).filter(Video.id == video_id).first()
+            video = candidates.get(video_id)
             if not video:
                 continue
             
-            # Generate recommendation reason
-            reason = self._generate_reason(video, watched_videos_data, similarity_score)
+            selected.append((video, similarity_score))
+            seen_video_ids.add(video_id)
             
-            recommendations.append(Recommendation(
+            if len(selected) >= limit:
+                break
+        
+        # Generate recommendation reasons for all selected videos at once
+        reasons = self._generate_reasons(selected, watched_profile)
+        return [
+            Recommendation(
                 video=VideoResponse.model_validate(video),
                 similarity_score=float(similarity_score),
                 reason=reason
-            ))
-            
-            seen_video_ids.add(video_id)
+            )
+            for (video, similarity_score), reason in zip(selected, reasons)
+        ]
+    
+    def hydrate_videos(self, db: Session, video_ids: List[int]) -> Dict[int, Video]:
+        """
+        Load candidate videos returned by a FAISS search in one query
+        
+        Args:
+            db: Database session
+            video_ids: Candidate video IDs (in ranking order)
             
-            if len(recommendations) >= limit:
-                break
+        Returns:
+            Dict mapping video ID to Video. Callers iterate their own ranked
+            ID list to preserve the FAISS ordering; missing IDs are absent.
+        """
+        if not video_ids:
+            return {}
         
-        # If we don't have enough recommendations, fill with popular videos
-        if len(recommendations) < limit:
-            popular = self._get_popular_recommendations(db, user_id, limit - len(recommendations))
-            # Merge without duplicates
-            existing_ids = {r.video.id for r in recommendations}
-            for rec in popular.recommendations:
-                if rec.video.id not in existing_ids:
-                    recommendations.append(rec)
-                    if len(recommendations) >= limit:
-                        break
-        
-        return RecommendationResponse(
-            user_id=user_id,
-            recommendations=recommendations[:limit],
-            total=len(recommendations)
-        )
+        videos = db.query(Video).options(
+            load_only(*VIDEO_RESPONSE_COLUMNS)
+        ).filter(Video.id.in_(set(video_ids))).all()
+        return {video.id: video for video in videos}
     
-    def _get_popular_recommendations(
+    def _generate_reasons(
         self,
-        db: Session,
-        user_id: int,
-        limit: int
-    ) -> RecommendationResponse:
-        """Get popular videos as recommendations"""
-        videos = db.query(Video).order_by(
-            Video.views.desc(),
-            Video.likes.desc()
-        ).limit(limit * 2).all()
-        
-        recommendations = []
-        for video in videos[:limit]:
-            recommendations.append(Recommendation(
-                video=VideoResponse.model_validate(video),
-                similarity_score=0.0,
-                reason="Popular video"
-            ))
-        
-        return RecommendationResponse(
-            user_id=user_id,
-            recommendations=recommendations,
-            total=len(recommendations)
+        selected: List[Tuple[Video, float]],
+        watched_profile: WatchedProfile
+    ) -> List[str]:
+        """Generate explanations for why each (video, similarity_score) is recommended"""
+        shared_tags = watched_profile.shared_tags(
+            [video.tags or [] for video, _ in selected], self.tag_vocabulary
         )
-    
-    def _generate_reason(
-        self,
-        video: Video,
-        watched_videos: List[Video],
-        similarity_score: float
-    ) -> str:
-        """Generate explanation for why video is recommended"""
-        reasons = []
-        
-        # Similarity score
-        similarity_pct = int(similarity_score * 100)
-        reasons.append(f"{similarity_pct}% similarity")
-        
-        # Category match
-        watched_categories = {v.category for v in watched_videos if v.category}
-        if video.category and video.category in watched_categories:
-            reasons.append(f"same category: {video.category}")
-        
-        # Tag overlap
-        watched_tags = set()
-        for v in watched_videos:
-            if v.tags:
-                watched_tags.update(v.tags)
-        
-        if video.tags:
-            video_tags = set(video.tags)
-            overlap = watched_tags.intersection(video_tags)
-            if overlap:
-                reasons.append(f"shared tags: {', '.join(list(overlap)[:3])}")
         
-        if reasons:
-            return "Recommended because: " + ", ".join(reasons)
-        else:
-            return "Recommended based on your viewing history"
+        explanations = []
+        for (video, similarity_score), overlap in zip(selected, shared_tags):
+            reasons = []
+            
+            # Similarity score
+            similarity_pct = int(similarity_score * 100)
+            reasons.append(f"{similarity_pct}% similarity")
+            
+            # Category match
+            if video.category and video.category in watched_profile.categories:
+                reasons.append(f"same category: {video.category}")
+            
+            # Tag overlap
+            if overlap:
+                reasons.append(f"shared tags: {', '.join(overlap[:3])}")
+            
+            if reasons:
+                explanations.append("Recommended because: " + ", ".join(reasons))
+            else:
+                explanations.append("Recommended based on your viewing history")
+        return explanations
     
     def update_video_embedding(self, db: Session, video_id: int):
         """Update embedding for a video in the FAISS index"""
@@ -198,13 +563,29 @@ class RecommendationService:
             category=video.category
         )
         
-        # Update in database
-        video.embedding = embedding.tolist()
+        # Update in FAISS index (persisted by the ingestion worker's checkpoint), then in
+        # the database, so a failed index write leaves the video to the embedding backfill
+        video.embedding = embedding
+        self.faiss_index.upsert_vector(video_id, embedding)
         db.commit()
+    
+    async def update_video_embedding_async(self, db: AsyncSession, video_id: int):
+        """Async variant of update_video_embedding; inference and index writes run on the executor"""
+        video = await db.get(Video, video_id)
+        if not video:
+            return
+        
+        embedding = await run_cpu_bound(
+            self.embedding_service.generate_video_embedding,
+            title=video.title,
+            description=video.description,
+            tags=video.tags,
+            category=video.category
+        )
         
-        # Update in FAISS index
-        self.faiss_index.update_vector(video_id, embedding)
-        self.faiss_index.save()
+        video.embedding = embedding
+        await run_cpu_bound(self.faiss_index.upsert_vector, video_id, embedding)
+        await db.commit()
 
 
 # Global instance
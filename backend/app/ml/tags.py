@@ -0,0 +1,91 @@
+import threading
+from itertools import chain
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple
+import numpy as np
+
+
+class TagVocabulary:
+    """
+    Interns tag strings to integer IDs, so tag sets compare as sorted ID arrays
+    
+    IDs are process-local and only grow; the vocabulary is bounded by the
+    distinct tags of watched videos.
+    """
+    
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+    
+    def intern(self, tags: Iterable[str]) -> np.ndarray:
+        """IDs of tags in order, assigning new IDs to unseen tags"""
+        tags = list(tags)
+        ids = [self._ids.get(tag) for tag in tags]
+        if None in ids:
+            with self._lock:
+                ids = [self._ids.setdefault(tag, len(self._ids)) for tag in tags]
+        return np.array(ids, dtype="int64")
+    
+    def lookup(self, tags: Iterable[str]) -> np.ndarray:
+        """IDs of tags in order, -1 for tags never interned"""
+        return np.array([self._ids.get(tag, -1) for tag in tags], dtype="int64")
+
+
+class WatchedProfile(NamedTuple):
+    """Categories and tags of a user's watched videos, built once per request for recommendation reasons"""
+    categories: FrozenSet[str]
+    tag_ids: np.ndarray  # sorted, unique
+    
+    @classmethod
+    def from_labels(
+        cls,
+        categories: Iterable[str],
+        tags: Iterable[str],
+        vocabulary: "TagVocabulary"
+    ) -> "WatchedProfile":
+        """
+        Args:
+            categories: watched categories, e.g. as stored with the user's profile
+            tags: watched tags (repeats allowed)
+            vocabulary: interns the watched tags
+        """
+        return cls(categories=frozenset(categories), tag_ids=np.unique(vocabulary.intern(tags)))
+    
+    @classmethod
+    def from_videos(cls, videos: Iterable, vocabulary: "TagVocabulary") -> "WatchedProfile":
+        """
+        Args:
+            videos: watched Video rows (only category and tags are read)
+            vocabulary: interns the watched tags
+        """
+        videos = list(videos)
+        return cls.from_labels(
+            (video.category for video in videos if video.category),
+            chain.from_iterable(video.tags or () for video in videos),
+            vocabulary
+        )
+    
+    def shared_tags(self, tag_lists: List[List[str]], vocabulary: "TagVocabulary") -> List[List[str]]:
+        """
+        Tags of each list that also appear in watched videos, for all lists in one lookup
+        
+        Returns:
+            One list per input list: its shared tags in their original order, without repeats
+        """
+        lengths = [len(tags) for tags in tag_lists]
+        ids = vocabulary.lookup(chain.from_iterable(tag_lists))
+        if len(self.tag_ids) and len(ids):
+            positions = np.minimum(np.searchsorted(self.tag_ids, ids), len(self.tag_ids) - 1)
+            hits = (self.tag_ids[positions] == ids).tolist()
+        else:
+            hits = [False] * len(ids)
+        
+        shared, start = [], 0
+        for tags, length in zip(tag_lists, lengths):
+            flags = hits[start:start + length]
+            shared.append(list(dict.fromkeys(tag for tag, hit in zip(tags, flags) if hit)))
+            start += length
+        return shared
+
+
+# Global instance
+tag_vocabulary = TagVocabulary()
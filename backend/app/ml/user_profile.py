@@ -0,0 +1,390 @@
+from datetime import datetime, timezone
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.models.user_profile import UserProfile
+from app.models.video import Video
+from app.models.watch_history import WatchHistory
+
+
+class UserProfileService:
+    """Service for maintaining stored user preference vectors"""
+    
+    def __init__(self):
+        self.half_life_days = settings.USER_PROFILE_HALF_LIFE_DAYS
+        self.n_centroids = settings.USER_PROFILE_CENTROIDS
+        self.min_watches_per_centroid = max(settings.USER_PROFILE_CENTROID_MIN_WATCHES, 1)
+        # Centroids are refitted once the watch count has grown by this fraction since the last fit
+        self.centroid_refit_growth = 0.1
+    
+    def _decay_factor(self, since: Optional[datetime], now: datetime) -> float:
+        """Weight multiplier for accumulated history between `since` and `now`"""
+        if self.half_life_days <= 0 or since is None:
+            return 1.0
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+        elapsed_days = max((now - since).total_seconds(), 0.0) / 86400.0
+        return 0.5 ** (elapsed_days / self.half_life_days)
+    
+    def get_profile_vector(self, db: Session, user_id: int) -> Optional[np.ndarray]:
+        """
+        Get the stored preference vector for a user
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            
+        Returns:
+            Weighted mean of watched embeddings, or None if no profile is stored
+        """
+        return self.get_profile_vectors(db, [user_id]).get(user_id)
+    
+    def get_profile_vectors(self, db: Session, user_ids: List[int]) -> Dict[int, np.ndarray]:
+        """
+        Get stored preference vectors for many users in one query
+        
+        Args:
+            db: Database session
+            user_ids: User IDs
+            
+        Returns:
+            Dict mapping user ID to preference vector; users without a profile are absent
+        """
+        if not user_ids:
+            return {}
+        
+        profiles = db.query(UserProfile).filter(UserProfile.user_id.in_(set(user_ids))).all()
+        return {
+            profile.user_id: np.array(profile.embedding_sum) / profile.weight
+            for profile in profiles
+            if profile.weight > 0
+        }
+    
+    def add_watch(
+        self,
+        db: Session,
+        user_id: int,
+        embedding,
+        watched_at: Optional[datetime] = None
+    ):
+        """
+        Fold a watched video's embedding into the user's profile
+        
+        The caller owns the transaction; nothing is committed here. Users
+        without a stored profile are rebuilt from their full watch history,
+        so the pending watch row must already be added to the session.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            embedding: Embedding of the watched video
+            watched_at: Time of the watch event (defaults to now)
+        """
+        self.add_watches(db, user_id, [(embedding, watched_at)])
+    
+    def add_watches(
+        self,
+        db: Session,
+        user_id: int,
+        watches: List[Tuple[Any, Optional[datetime]]]
+    ):
+        """
+        Fold several watched videos into the user's profile under one row lock
+        
+        Same contract as add_watch: the caller commits, and all pending
+        watch rows must already be added to the session, since users without
+        a stored profile are rebuilt from their full history (once, covering
+        every watch in the list).
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            watches: (embedding, watched_at) pairs in the order they happened
+        """
+        self.add_watches_many(db, {user_id: watches})
+    
+    def get_watched_labels(self, db: Session, user_ids: List[int]) -> Dict[int, Tuple[List[str], List[str]]]:
+        """
+        Get the stored watched categories and tags of many users in one query
+        
+        Args:
+            db: Database session
+            user_ids: User IDs
+            
+        Returns:
+            Dict mapping user ID to (categories, tags); users without a profile are absent
+        """
+        if not user_ids:
+            return {}
+        
+        rows = db.query(UserProfile.user_id, UserProfile.watched_categories, UserProfile.watched_tags).filter(
+            UserProfile.user_id.in_(set(user_ids))
+        ).all()
+        return {user_id: (categories or [], tags or []) for user_id, categories, tags in rows}
+    
+    @staticmethod
+    def _merge_labels(profile: UserProfile, labels: Iterable[Tuple[Optional[str], Optional[List[str]]]]):
+        """Add the (category, tags) of watched videos to a profile's watched categories and tags"""
+        categories = set(profile.watched_categories or ())
+        tags = set(profile.watched_tags or ())
+        for category, video_tags in labels:
+            if category:
+                categories.add(category)
+            tags.update(video_tags or ())
+        # Reassigned only when something was added, so repeat watches don't rewrite the arrays
+        if len(categories) > len(profile.watched_categories or ()):
+            profile.watched_categories = sorted(categories)
+        if len(tags) > len(profile.watched_tags or ()):
+            profile.watched_tags = sorted(tags)
+    
+    def add_watches_many(
+        self,
+        db: Session,
+        watches_by_user: Dict[int, List[Tuple[Any, Optional[datetime]]]],
+        labels_by_user: Optional[Dict[int, List[Tuple[Optional[str], Optional[List[str]]]]]] = None
+    ):
+        """
+        Fold watches into the profiles of many users, locking all profiles with one query
+        
+        Args:
+            db: Database session
+            watches_by_user: (embedding, watched_at) pairs per user, in the order they happened
+            labels_by_user: (category, tags) of the watched videos per user, merged into
+                the profiles' watched categories and tags (None leaves them unchanged)
+        """
+        watches_by_user = {
+            user_id: [
+                (embedding, watched_at) for embedding, watched_at in watches
+                if embedding is not None and len(embedding) > 0
+            ]
+            for user_id, watches in watches_by_user.items()
+        }
+        labels_by_user = labels_by_user or {}
+        user_ids = sorted(
+            user_id for user_id in set(watches_by_user) | set(labels_by_user)
+            if watches_by_user.get(user_id) or labels_by_user.get(user_id)
+        )
+        if not user_ids:
+            return
+        
+        # Locked in user ID order, so concurrent writers cannot deadlock on profiles
+        profiles = {
+            profile.user_id: profile
+            for profile in db.query(UserProfile).filter(
+                UserProfile.user_id.in_(user_ids)
+            ).order_by(UserProfile.user_id).with_for_update().all()
+        }
+        
+        # Rebuilt from the full history, which includes these watches and their labels
+        missing_user_ids = [
+            user_id for user_id in user_ids if user_id not in profiles and watches_by_user.get(user_id)
+        ]
+        if missing_user_ids:
+            db.flush()
+            for user_id in missing_user_ids:
+                self.rebuild_profile(db, user_id)
+        
+        for user_id, profile in profiles.items():
+            self._merge_labels(profile, labels_by_user.get(user_id, ()))
+            if not watches_by_user.get(user_id):
+                continue
+            embedding_sum = np.array(profile.embedding_sum)
+            weight = profile.weight
+            updated_at = profile.updated_at
+            for embedding, watched_at in watches_by_user[user_id]:
+                now = watched_at or datetime.now(timezone.utc)
+                decay = self._decay_factor(updated_at, now)
+                embedding_sum = embedding_sum * decay + np.asarray(embedding, dtype="float64")
+                weight = weight * decay + 1.0
+                updated_at = now
+            
+            profile.embedding_sum = embedding_sum.tolist()
+            profile.weight = weight
+            profile.watch_count += len(watches_by_user[user_id])
+            profile.updated_at = updated_at
+    
+    def rebuild_profile(self, db: Session, user_id: int) -> Optional[np.ndarray]:
+        """
+        Recompute a user's profile from their full watch history
+        
+        Used to backfill users who predate stored profiles. The caller
+        commits the session.
+        
+        Args:
+            db: Database session
+            user_id: User ID
+            
+        Returns:
+            The rebuilt preference vector, or None if no watched video has an embedding
+        """
+        rows = db.query(Video.embedding, Video.category, Video.tags, WatchHistory.watched_at).join(
+            WatchHistory, WatchHistory.video_id == Video.id
+        ).filter(
+            WatchHistory.user_id == user_id
+        ).order_by(WatchHistory.watched_at).all()
+        
+        now = datetime.now(timezone.utc)
+        embedding_sum = None
+        weight = 0.0
+        watch_count = 0
+        categories, tags = set(), set()
+        
+        for embedding, category, video_tags, watched_at in rows:
+            if category:
+                categories.add(category)
+            tags.update(video_tags or ())
+            if embedding is None:
+                continue
+            vector = np.asarray(embedding, dtype="float64")
+            decay = self._decay_factor(watched_at, now)
+            embedding_sum = vector * decay if embedding_sum is None else embedding_sum + vector * decay
+            weight += decay
+            watch_count += 1
+        
+        if embedding_sum is None or weight <= 0:
+            return None
+        
+        profile = db.query(UserProfile).filter(UserProfile.user_id == user_id).first()
+        if not profile:
+            profile = UserProfile(user_id=user_id)
+            db.add(profile)
+        
+        profile.embedding_sum = embedding_sum.tolist()
+        profile.weight = weight
+        profile.watch_count = watch_count
+        profile.updated_at = now
+        profile.watched_categories = sorted(categories)
+        profile.watched_tags = sorted(tags)
+        
+        return embedding_sum / weight
+
+    
+    def get_centroids(
+        self,
+        db: Session,
+        user_ids: List[int]
+    ) -> Tuple[Dict[int, Tuple[np.ndarray, np.ndarray]], Dict[int, int]]:
+        """
+        Get stored interest centroids for many users in one query
+        
+        Users with fewer than two centroids' worth of watches are skipped
+        (their single profile vector is used instead).
+        
+        Args:
+            db: Database session
+            user_ids: User IDs
+            
+        Returns:
+            ((centroids, weights) per user with fresh centroids,
+             current watch_count per user whose centroids need (re)fitting)
+        """
+        if self.n_centroids <= 1 or not user_ids:
+            return {}, {}
+        
+        centroids, stale = {}, {}
+        rows = db.query(
+            UserProfile.user_id, UserProfile.watch_count, UserProfile.centroids,
+            UserProfile.centroid_weights, UserProfile.centroids_watch_count
+        ).filter(
+            UserProfile.user_id.in_(set(user_ids)),
+            UserProfile.watch_count >= 2 * self.min_watches_per_centroid
+        ).all()
+        for user_id, watch_count, vectors, weights, fitted_watch_count in rows:
+            if vectors is None or watch_count > fitted_watch_count * (1 + self.centroid_refit_growth):
+                stale[user_id] = watch_count
+            elif len(weights) > 1:
+                centroids[user_id] = (vectors.reshape(len(weights), -1), np.asarray(weights))
+        return centroids, stale
+    
+    def load_histories(self, db: Session, user_ids: List[int]) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """
+        Load watched embeddings of many users in one query, for fitting centroids
+        
+        Returns:
+            (embeddings, decay weights) per user with at least one embedded watch
+        """
+        rows = db.query(WatchHistory.user_id, Video.embedding, WatchHistory.watched_at).join(
+            Video, WatchHistory.video_id == Video.id
+        ).filter(
+            WatchHistory.user_id.in_(set(user_ids)),
+            Video.embedding.isnot(None)
+        ).all()
+        
+        now = datetime.now(timezone.utc)
+        embeddings, weights = defaultdict(list), defaultdict(list)
+        for user_id, embedding, watched_at in rows:
+            embeddings[user_id].append(embedding)
+            weights[user_id].append(self._decay_factor(watched_at, now))
+        return {
+            user_id: (np.vstack(embeddings[user_id]), np.asarray(weights[user_id]))
+            for user_id in embeddings
+        }
+    
+    def fit_centroids(self, embeddings: np.ndarray, weights: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Cluster a watch history into up to n_centroids interest centroids (CPU-bound)
+        
+        Args:
+            embeddings: watched embeddings, shape (n, dimension)
+            weights: decay weight of each watch
+            
+        Returns:
+            (centroids of shape (k, dimension), each centroid's share of the total weight)
+        """
+        k = min(self.n_centroids, len(embeddings) // self.min_watches_per_centroid)
+        if k <= 1 or weights.sum() <= 0:
+            mean = np.average(embeddings, axis=0, weights=weights if weights.sum() > 0 else None)
+            return mean.reshape(1, -1).astype("float32"), np.ones(1)
+        
+        # Imported here: scikit-learn is only needed when multi-centroid profiles are enabled
+        from sklearn.cluster import MiniBatchKMeans
+        
+        normalized = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        kmeans = MiniBatchKMeans(n_clusters=k, batch_size=1024, n_init=3, random_state=0)
+        labels = kmeans.fit_predict(normalized, sample_weight=weights)
+        cluster_weights = np.bincount(labels, weights=weights, minlength=k)
+        keep = cluster_weights > 0
+        return kmeans.cluster_centers_[keep].astype("float32"), cluster_weights[keep] / cluster_weights.sum()
+    
+    def fit_centroids_many(
+        self,
+        histories: Dict[int, Tuple[np.ndarray, np.ndarray]]
+    ) -> Dict[int, Tuple[np.ndarray, np.ndarray]]:
+        """fit_centroids for every user returned by load_histories (CPU-bound)"""
+        return {user_id: self.fit_centroids(*history) for user_id, history in histories.items()}
+    
+    def store_centroids(
+        self,
+        db: Session,
+        fitted: Dict[int, Tuple[np.ndarray, np.ndarray]],
+        watch_counts: Dict[int, int]
+    ):
+        """
+        Store fitted centroids in one UPDATE per batch (the caller commits)
+        
+        Only the centroid columns are written, so concurrent watch updates
+        to the running embedding sum are not overwritten.
+        
+        Args:
+            db: Database session
+            fitted: (centroids, weights) per user from fit_centroids_many
+            watch_counts: watch_count of each user when their history was read
+        """
+        if not fitted:
+            return
+        db.execute(update(UserProfile), [
+            {
+                "user_id": user_id,
+                "centroids": centroids.reshape(-1),
+                "centroid_weights": weights.tolist(),
+                "centroids_watch_count": watch_counts[user_id]
+            }
+            for user_id, (centroids, weights) in fitted.items()
+        ])
+
+
+# Global instance
+user_profile_service = UserProfileService()
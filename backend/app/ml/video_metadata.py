@@ -0,0 +1,151 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, NamedTuple, Optional
+import numpy as np
+from sqlalchemy import or_
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.video import Video
+
+# Incremental refreshes re-read rows updated this long before the previous one started
+REFRESH_OVERLAP = timedelta(minutes=5)
+
+
+class VideoFilter(NamedTuple):
+    """Metadata restriction on the videos a search may return"""
+    category: Optional[str] = None
+    min_duration: Optional[int] = None  # seconds, inclusive
+    max_duration: Optional[int] = None  # seconds, inclusive
+    
+    @property
+    def active(self) -> bool:
+        return self.category is not None or self.min_duration is not None or self.max_duration is not None
+    
+    def matches(self, category: Optional[str], duration: Optional[int]) -> bool:
+        """Whether a single video passes the filter (videos of unknown duration fail any duration bound)"""
+        if self.category is not None and category != self.category:
+            return False
+        if self.min_duration is not None or self.max_duration is not None:
+            if duration is None:
+                return False
+            if self.min_duration is not None and duration < self.min_duration:
+                return False
+            if self.max_duration is not None and duration > self.max_duration:
+                return False
+        return True
+    
+    def cache_suffix(self) -> str:
+        """Part of a cache key identifying the filter"""
+        return f"category:{self.category}:duration:{self.min_duration}-{self.max_duration}"
+
+
+class VideoMetadataStore:
+    """
+    Columnar copy of the video fields search filters use, indexed by video ID
+    
+    Category codes and durations live in flat arrays, so a filter over the
+    whole catalog is a few vectorized comparisons producing the ID bitmap
+    FAISSIndex restricts its search to. The arrays are loaded once and then
+    refreshed incrementally (new IDs and recently updated rows) at most once
+    per refresh interval.
+    """
+    
+    def __init__(self):
+        self.refresh_interval = settings.VIDEO_METADATA_REFRESH_SECONDS
+        # (category codes, durations in seconds) by video ID, replaced together; -1: none, unknown or no such video
+        self._columns = (np.empty(0, dtype="int32"), np.empty(0, dtype="int32"))
+        self._codes: Dict[str, int] = {}
+        self._max_id = 0
+        self._loaded_at: Optional[datetime] = None
+        self._refreshed_at = 0.0
+        self._refresh_lock = threading.Lock()
+    
+    def warm_up(self):
+        """Load the metadata before the first filtered request needs it"""
+        db = SessionLocal()
+        try:
+            self._ensure_fresh(db)
+        finally:
+            db.close()
+    
+    def refresh(self, db: Session):
+        """Load all videos on first use, afterwards only new and recently updated ones"""
+        started = datetime.now(timezone.utc)
+        query = db.query(Video.id, Video.category, Video.duration)
+        if self._loaded_at is not None:
+            query = query.filter(or_(Video.id > self._max_id, Video.updated_at >= self._loaded_at - REFRESH_OVERLAP))
+        rows = query.all()
+        
+        category_codes, durations = self._columns
+        if rows:
+            ids = np.fromiter((row[0] for row in rows), dtype="int64", count=len(rows))
+            codes = np.fromiter(
+                (self._codes.setdefault(row[1], len(self._codes)) if row[1] is not None else -1 for row in rows),
+                dtype="int32", count=len(rows)
+            )
+            lengths = np.fromiter(
+                (row[2] if row[2] is not None else -1 for row in rows), dtype="int32", count=len(rows)
+            )
+            # Update copies and swap them in, so concurrent readers never see a partial refresh
+            size = max(len(category_codes), int(ids.max()) + 1)
+            category_codes = np.concatenate([category_codes, np.full(size - len(category_codes), -1, dtype="int32")])
+            durations = np.concatenate([durations, np.full(size - len(durations), -1, dtype="int32")])
+            category_codes[ids] = codes
+            durations[ids] = lengths
+            self._max_id = max(self._max_id, int(ids.max()))
+        
+        self._columns = (category_codes, durations)
+        self._loaded_at = started
+        self._refreshed_at = time.time()
+    
+    def _ensure_fresh(self, db: Session):
+        if time.time() - self._refreshed_at < self.refresh_interval:
+            return
+        
+        # Never wait on the lock: callers on the event loop (db.run_sync) would
+        # deadlock. Stale arrays are used while another caller refreshes.
+        acquired = self._refresh_lock.acquire(blocking=False)
+        if not acquired and self._loaded_at is not None:
+            return
+        try:
+            self.refresh(db)
+        except Exception as e:
+            print(f"Video metadata refresh error: {e}")
+        finally:
+            if acquired:
+                self._refresh_lock.release()
+    
+    def bitmap(self, db: Session, video_filter: Optional[VideoFilter]) -> Optional[np.ndarray]:
+        """
+        IDs of the videos passing a filter, as a bitmap for FAISSIndex.search_batch(id_filter=...)
+        
+        Args:
+            db: Database session, only used when the metadata is due for a refresh
+            video_filter: Restriction to apply; None or an inactive filter selects everything
+        
+        Returns:
+            Packed little-endian bitmap (bit i set: video ID i passes), or None without a filter
+        """
+        if video_filter is None or not video_filter.active:
+            return None
+        
+        self._ensure_fresh(db)
+        category_codes, durations = self._columns
+        selected = np.ones(len(category_codes), dtype=bool)
+        if video_filter.category is not None:
+            code = self._codes.get(video_filter.category)
+            if code is None:
+                selected[:] = False
+            else:
+                selected &= category_codes == code
+        if video_filter.min_duration is not None:
+            selected &= durations >= video_filter.min_duration
+        if video_filter.max_duration is not None:
+            selected &= (durations >= 0) & (durations <= video_filter.max_duration)
+        return np.packbits(selected, bitorder="little")
+
+
+# Global instance
+video_metadata = VideoMetadataStore()
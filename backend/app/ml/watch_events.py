@@ -0,0 +1,211 @@
+import csv
+import io
+import queue
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+from typing import List, NamedTuple, Optional
+from sqlalchemy import Integer, column, update, values
+from sqlalchemy.orm import Session
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_client import clear_user_caches
+from app.models.user import User
+from app.models.video import Video
+from app.models.watch_history import WatchHistory
+from app.ml.user_profile import user_profile_service
+
+
+class WatchEvent(NamedTuple):
+    user_id: int
+    video_id: int
+    watch_duration: Optional[float]
+    watch_percentage: Optional[float]
+    watched_at: datetime
+
+
+class WatchEventWriter:
+    """
+    Write-behind buffer for watch events
+    
+    Request handlers only enqueue events. The writer thread collects them
+    into micro-batches and writes each batch in one transaction: a COPY
+    into watch_history, one profile update per user, and a single
+    UPDATE that adds the per-video view counts, so popular videos are no
+    longer a hot row updated once per watch. Cache invalidations are sent
+    after the commit, once per user per batch.
+    
+    The queue is bounded: while the database can't keep up, record()
+    refuses events instead of growing without limit. A failing batch is
+    retried up to WATCH_WRITE_MAX_ATTEMPTS times and then dropped.
+    """
+    
+    def __init__(self):
+        self.queue: "queue.Queue[WatchEvent]" = queue.Queue(maxsize=settings.WATCH_QUEUE_MAX_EVENTS)
+        self.batch_size = settings.WATCH_FLUSH_BATCH_SIZE
+        self.max_wait = settings.WATCH_FLUSH_INTERVAL_SECONDS
+        self.max_attempts = max(1, settings.WATCH_WRITE_MAX_ATTEMPTS)
+        self._stop_event = threading.Event()
+        self._thread = None
+        # Events refused because the queue was full, and dropped after failed writes
+        self.refused = 0
+        self.dropped = 0
+    
+    def record(self, event: WatchEvent) -> bool:
+        """
+        Schedule a watch event to be written
+        
+        Returns:
+            False if the queue is full and the event was not recorded
+        """
+        try:
+            self.queue.put_nowait(event)
+        except queue.Full:
+            self.refused += 1
+            return False
+        return True
+    
+    def start(self):
+        """Start the writer thread"""
+        if self._thread and self._thread.is_alive():
+            return
+        
+        self._stop_event.clear()
+        self._thread = threading.Thread(target=self._run, name="watch-event-writer", daemon=True)
+        self._thread.start()
+    
+    def stop(self, timeout: float = 30.0):
+        """Stop the writer and write what is still queued"""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join(timeout)
+            self._thread = None
+        self.flush()
+    
+    def flush(self):
+        """Write every queued event now"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self._write_safely(batch)
+    
+    def write_batch(self, events: List[WatchEvent]):
+        """Write a batch of watch events in one transaction"""
+        db = SessionLocal()
+        try:
+            # Existence, embeddings and labels in one query; events for deleted
+            # videos or unknown users are dropped rather than failing the whole batch
+            videos = {
+                row.id: row for row in db.query(Video.id, Video.embedding, Video.category, Video.tags).filter(
+                    Video.id.in_({e.video_id for e in events})
+                ).all()
+            }
+            user_ids = {
+                row[0] for row in db.query(User.id).filter(User.id.in_({e.user_id for e in events})).all()
+            }
+            valid = [e for e in events if e.video_id in videos and e.user_id in user_ids]
+            if len(valid) < len(events):
+                print(f"Dropped {len(events) - len(valid)} watch events for unknown videos or users")
+            if not valid:
+                return
+            
+            self._copy_watch_history(db, valid)
+            
+            watches_by_user, labels_by_user = defaultdict(list), defaultdict(list)
+            for event in sorted(valid, key=lambda e: e.watched_at):
+                video = videos[event.video_id]
+                watches_by_user[event.user_id].append((video.embedding, event.watched_at))
+                labels_by_user[event.user_id].append((video.category, video.tags))
+            user_profile_service.add_watches_many(db, watches_by_user, labels_by_user)
+            
+            view_counts = values(
+                column("id", Integer), column("n", Integer), name="view_counts"
+            ).data(sorted(Counter(e.video_id for e in valid).items()))
+            # Keep updated_at for metadata edits (VideoMetadataStore refreshes by it)
+            db.execute(
+                update(Video).where(Video.id == view_counts.c.id).values(
+                    views=Video.views + view_counts.c.n, updated_at=Video.updated_at
+                ),
+                execution_options={"synchronize_session": False}
+            )
+            db.commit()
+        finally:
+            db.close()
+        
+        clear_user_caches(sorted(watches_by_user))
+    
+    @staticmethod
+    def _copy_watch_history(db: Session, events: List[WatchEvent]):
+        """Insert watch_history rows with COPY inside the session's transaction"""
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for event in events:
+            # None becomes an empty unquoted field, which COPY reads as NULL
+            writer.writerow([
+                event.user_id, event.video_id, event.watch_duration, event.watch_percentage,
+                event.watched_at.isoformat()
+            ])
+        buffer.seek(0)
+        
+        columns = ", ".join(WatchEvent._fields)
+        cursor = db.connection().connection.cursor()
+        try:
+            cursor.copy_expert(f"COPY {WatchHistory.__tablename__} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        finally:
+            cursor.close()
+    
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write_safely(batch)
+    
+    def _next_batch(self) -> List[WatchEvent]:
+        """Wait for a first event, then collect more until the batch is full or max_wait passes"""
+        try:
+            batch = [self.queue.get(timeout=self.max_wait)]
+        except queue.Empty:
+            return []
+        
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+    
+    def _drain(self, n: int) -> List[WatchEvent]:
+        items = []
+        for _ in range(n):
+            try:
+                items.append(self.queue.get_nowait())
+            except queue.Empty:
+                break
+        return items
+    
+    def _write_safely(self, events: List[WatchEvent]):
+        # Retried in place, so new events wait in the bounded queue meanwhile
+        for attempt in range(1, self.max_attempts + 1):
+            try:
+                self.write_batch(events)
+                return
+            except Exception as e:
+                print(f"Watch event write error (attempt {attempt}/{self.max_attempts}): {e}")
+                if attempt < self.max_attempts:
+                    # No pause when shutting down: the remaining attempts run right away
+                    self._stop_event.wait(self.max_wait * attempt)
+        
+        self.dropped += len(events)
+        print(f"Dropped {len(events)} watch events after {self.max_attempts} failed writes: "
+              f"{len({e.user_id for e in events})} users, {len({e.video_id for e in events})} videos, "
+              f"watched {min(e.watched_at for e in events).isoformat()} to {max(e.watched_at for e in events).isoformat()}")
+
+
+# Global instance
+watch_event_writer = WatchEventWriter()
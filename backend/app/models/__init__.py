@@ -0,0 +1,6 @@
+from app.models.user import User
+from app.models.video import Video
+from app.models.watch_history import WatchHistory
+from app.models.user_profile import UserProfile
+
+__all__ = ["User", "Video", "WatchHistory", "UserProfile"]
@@ -0,0 +1,32 @@
+import numpy as np
+from sqlalchemy.types import LargeBinary, TypeDecorator
+
+
+class Float32Vector(TypeDecorator):
+    """
+    Embedding vector stored as packed float32 bytes (BYTEA on Postgres)
+
+    Values are big-endian, the byte order of Postgres' float4send(), so the
+    migration from float8[] can pack them in SQL. Bound values may be numpy
+    arrays or lists; loaded values are native float32 numpy arrays.
+    """
+
+    impl = LargeBinary
+    cache_ok = True
+
+    DTYPE = np.dtype(">f4")
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        return np.asarray(value, dtype=self.DTYPE).tobytes()
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return np.frombuffer(value, dtype=self.DTYPE).astype(np.float32)
+
+    def compare_values(self, x, y):
+        if x is None or y is None:
+            return x is y
+        return np.array_equal(x, y)
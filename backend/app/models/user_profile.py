@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey, String
+from sqlalchemy.dialects.postgresql import ARRAY
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.types import Float32Vector
+
+
+class UserProfile(Base):
+    """Running (optionally time-decayed) sum of watched video embeddings"""
+    __tablename__ = "user_profiles"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    embedding_sum = Column(ARRAY(Float), nullable=False)
+    weight = Column(Float, nullable=False, default=0.0)
+    watch_count = Column(Integer, nullable=False, default=0)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Interest centroids (k x dimension, flattened) fitted on the watch history, with their weight shares
+    centroids = Column(Float32Vector)
+    centroid_weights = Column(ARRAY(Float))
+    centroids_watch_count = Column(Integer)  # watch_count when the centroids were fitted
+    # Distinct categories and tags of every watched video (sorted), for recommendation reasons
+    watched_categories = Column(ARRAY(String), nullable=False, server_default="{}")
+    watched_tags = Column(ARRAY(String), nullable=False, server_default="{}")
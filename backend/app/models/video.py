@@ -0,0 +1,48 @@
+from sqlalchemy import Column, Computed, Index, Integer, String, Text, DateTime
+from sqlalchemy.dialects.postgresql import ARRAY, TSVECTOR
+from sqlalchemy.orm import deferred
+from sqlalchemy.sql import func
+from app.core.database import Base
+from app.models.types import Float32Vector
+
+
+# Weighted full-text document for search: title ranks above description
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('english', coalesce(title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(description, '')), 'B')"
+)
+
+
+class Video(Base):
+    __tablename__ = "videos"
+    __table_args__ = (
+        # Keyset pagination on (created_at, id)
+        Index("ix_videos_created_at_id", "created_at", "id"),
+        Index("ix_videos_search_vector", "search_vector", postgresql_using="gin"),
+        # ix_videos_title_trgm / ix_videos_description_trgm (substring search) need the
+        # pg_trgm extension and are created by migration 006 only
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    video_id = Column(String, unique=True, index=True, nullable=False)
+    title = Column(String, index=True, nullable=False)
+    description = Column(Text)
+    tags = Column(ARRAY(String))
+    category = Column(String, index=True)
+    duration = Column(Integer)
+    thumbnail_url = Column(String)
+    views = Column(Integer, default=0)
+    likes = Column(Integer, default=0)
+    # Not loaded with the row; use undefer(Video.embedding) or select the column
+    embedding = deferred(Column(Float32Vector))
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    # Metadata edits only: view count updates keep it (see WatchEventWriter.write_batch)
+    updated_at = Column(DateTime(timezone=True), onupdate=func.now(), index=True)
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
+
+
+# Columns serialized by VideoResponse; list and hydration queries load only these
+VIDEO_RESPONSE_COLUMNS = (
+    Video.id, Video.video_id, Video.title, Video.description, Video.tags, Video.category,
+    Video.duration, Video.thumbnail_url, Video.views, Video.likes, Video.created_at
+)
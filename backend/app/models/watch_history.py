@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, Float, DateTime, ForeignKey
+from sqlalchemy.sql import func
+from app.core.database import Base
+
+
+class WatchHistory(Base):
+    __tablename__ = "watch_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True, nullable=False)
+    video_id = Column(Integer, ForeignKey("videos.id"), index=True, nullable=False)
+    watch_duration = Column(Float)
+    watch_percentage = Column(Float)
+    watched_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
@@ -1,12 +1,18 @@
 from app.schemas.user import User, UserCreate, UserResponse
-from app.schemas.video import Video, VideoCreate, VideoResponse
-from app.schemas.watch_history import WatchHistory, WatchHistoryCreate
-from app.schemas.recommendation import Recommendation, RecommendationResponse
+from app.schemas.video import Video, VideoCreate, VideoResponse, VideoPage
+from app.schemas.watch_history import (
+    WatchHistory, WatchHistoryCreate, WatchEventCreate, WatchEventBatchResponse
+)
+from app.schemas.recommendation import (
+    Recommendation, RecommendationResponse,
+    BatchRecommendationRequest, BatchRecommendationResponse
+)
 
 __all__ = [
     "User", "UserCreate", "UserResponse",
-    "Video", "VideoCreate", "VideoResponse",
-    "WatchHistory", "WatchHistoryCreate",
-    "Recommendation", "RecommendationResponse"
+    "Video", "VideoCreate", "VideoResponse", "VideoPage",
+    "WatchHistory", "WatchHistoryCreate", "WatchEventCreate", "WatchEventBatchResponse",
+    "Recommendation", "RecommendationResponse",
+    "BatchRecommendationRequest", "BatchRecommendationResponse"
 ]
 
@@ -1,4 +1,4 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from app.schemas.video import VideoResponse
 
@@ -14,3 +14,17 @@ class RecommendationResponse(BaseModel):
     recommendations: List[Recommendation]
     total: int
 
+
+
+class BatchRecommendationRequest(BaseModel):
+    user_ids: List[int] = Field(min_length=1, max_length=1000)
+    limit: int = Field(default=10, ge=1, le=50)
+    exclude_watched: bool = True
+    category: Optional[str] = None
+    min_duration: Optional[int] = Field(default=None, ge=0)
+    max_duration: Optional[int] = Field(default=None, ge=0)
+
+
+class BatchRecommendationResponse(BaseModel):
+    results: List[RecommendationResponse]
+    total: int
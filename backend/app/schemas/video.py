@@ -30,3 +30,8 @@ class VideoResponse(VideoBase):
 class Video(VideoResponse):
     pass
 
+
+class VideoPage(BaseModel):
+    videos: List[VideoResponse]
+    next_cursor: Optional[str] = None  # pass back as `cursor` for the next page; None on the last page
+
@@ -13,6 +13,16 @@ class WatchHistoryCreate(WatchHistoryBase):
     user_id: int
 
 
+class WatchEventCreate(WatchHistoryCreate):
+    watched_at: Optional[datetime] = None  # when the client saw the event; defaults to when it is received
+
+
+class WatchEventBatchResponse(BaseModel):
+    accepted: int
+    rejected: int  # malformed NDJSON lines
+    refused: int = 0  # valid events not queued because the write queue was full, the request's last ones
+
+
 class WatchHistory(WatchHistoryBase):
     id: int
     user_id: int
@@ -0,0 +1,157 @@
+"""
+Benchmark approximate FAISS index types against the exact FLAT index
+
+Reports recall@k (vs FLAT), queries/s, build time and serialized index size
+(the file FAISS writes, not process memory) for each index type and
+query-time setting on synthetic clustered catalogs.
+
+IVF_PQ is also measured with IndexRefineFlat re-ranking (IVF_PQ+R): the PQ
+index proposes k × --refine-k-factor candidates, which are re-scored exactly
+against the full vectors. The service's IVF_PQ index does not re-rank, so
+its recall is the plain IVF_PQ row.
+
+Usage:
+    python scripts/benchmark_ann.py --sizes 100000 1000000 5000000 --k 10
+    python scripts/benchmark_ann.py --types IVF_FLAT HNSW --nprobe 8 32 128 --ef-search 64 256
+    python scripts/benchmark_ann.py --types IVF_PQ --refine-k-factor 4 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import faiss
+import numpy as np
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex, INDEX_TYPES
+
+
+def synthetic_catalog(n: int, dimension: int, n_clusters: int = 1000, seed: int = 0) -> np.ndarray:
+    """Normalized vectors drawn around random topic centroids, generated in chunks"""
+    rng = np.random.default_rng(seed)
+    centroids = rng.standard_normal((n_clusters, dimension)).astype("float32")
+    vectors = np.empty((n, dimension), dtype="float32")
+    chunk = 100_000
+    for start in range(0, n, chunk):
+        end = min(start + chunk, n)
+        labels = rng.integers(0, n_clusters, end - start)
+        noise = rng.standard_normal((end - start, dimension)).astype("float32")
+        vectors[start:end] = centroids[labels] + 0.6 * noise
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+def index_file_mb(index: faiss.Index) -> float:
+    """Size of the serialized index in MB"""
+    with tempfile.NamedTemporaryFile(suffix=".bin") as f:
+        faiss.write_index(index, f.name)
+        return os.path.getsize(f.name) / 1e6
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    k = truth.shape[1]
+    hits = sum(len(set(found[i]) & set(truth[i])) for i in range(len(truth)))
+    return hits / (len(truth) * k)
+
+
+def refine_flat(ivf_pq: faiss.Index, vectors: np.ndarray) -> faiss.IndexRefineFlat:
+    """
+    IndexRefineFlat over a built IVF_PQ index and the vectors it holds
+
+    The refine index looks vectors up by the labels the PQ search returns, so
+    this relies on the benchmark's video IDs being the row positions.
+    """
+    return faiss.IndexRefineFlat(ivf_pq, faiss.swig_ptr(np.ascontiguousarray(vectors)))
+
+
+def run_faiss_queries(index: faiss.Index, queries: np.ndarray, k: int):
+    """run_queries for a bare FAISS index, one query at a time like FAISSIndex.search"""
+    ids = np.empty((len(queries), k), dtype="int64")
+    start = time.perf_counter()
+    for i in range(len(queries)):
+        _, ids[i:i + 1] = index.search(queries[i:i + 1], k)
+    return ids, len(queries) / (time.perf_counter() - start)
+
+
+def run_queries(index: FAISSIndex, queries: np.ndarray, k: int, **search_kwargs):
+    """Search every query; returns (ids matrix, queries/s)"""
+    start = time.perf_counter()
+    results = [index.search(q, k=k, **search_kwargs) for q in queries]
+    elapsed = time.perf_counter() - start
+    ids = np.full((len(queries), k), -1, dtype="int64")
+    for i, row in enumerate(results):
+        ids[i, :len(row)] = [video_id for video_id, _ in row]
+    return ids, len(queries) / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[100_000])
+    parser.add_argument("--types", nargs="+", default=list(INDEX_TYPES), choices=INDEX_TYPES)
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[8, 32, 128])
+    parser.add_argument("--ef-search", type=int, nargs="+", default=[64, 128, 256])
+    parser.add_argument("--refine-k-factor", type=int, nargs="*", default=[4],
+                        help="IVF_PQ+R candidates re-ranked per result (none skips IVF_PQ+R)")
+    args = parser.parse_args()
+    # Fail before generating data rather than when the IVF_PQ index is built
+    if "IVF_PQ" in args.types and args.dimension % settings.FAISS_PQ_M:
+        divisors = [m for m in range(1, args.dimension + 1) if args.dimension % m == 0 and m <= settings.FAISS_PQ_M]
+        parser.error(f"IVF_PQ needs FAISS_PQ_M ({settings.FAISS_PQ_M}) to divide --dimension ({args.dimension}); "
+                     f"set FAISS_PQ_M to e.g. {divisors[-1]} or pick another dimension")
+
+    tmp_dir = tempfile.mkdtemp()
+    for n in args.sizes:
+        print(f"\n=== {n:,} vectors, dim={args.dimension}, k={args.k} ===")
+        vectors = synthetic_catalog(n, args.dimension)
+        ids = np.arange(n, dtype="int64")
+        queries = synthetic_catalog(args.queries, args.dimension, seed=1)
+
+        # Exact ground truth
+        exact = faiss.IndexFlatIP(args.dimension)
+        exact.add(vectors)
+        _, truth = exact.search(queries, args.k)
+        del exact
+
+        print(f"{'type':<10} {'setting':<14} {'recall@k':>9} {'QPS':>10} {'build s':>9} {'file MB':>10}")
+        for index_type in args.types:
+            index = FAISSIndex(args.dimension, index_type, os.path.join(tmp_dir, f"{index_type}.bin"))
+            start = time.perf_counter()
+            index.build(vectors, ids)
+            build_s = time.perf_counter() - start
+            file_mb = index_file_mb(index.index)
+
+            if index_type in ("IVF_FLAT", "IVF_PQ"):
+                settings_to_try = [("nprobe", value) for value in args.nprobe]
+            elif index_type == "HNSW":
+                settings_to_try = [("ef_search", value) for value in args.ef_search]
+            else:
+                settings_to_try = [(None, None)]
+
+            for name, value in settings_to_try:
+                kwargs = {name: value} if name else {}
+                found, qps = run_queries(index, queries, args.k, **kwargs)
+                label = f"{name}={value}" if name else "-"
+                print(f"{index_type:<10} {label:<14} {recall_at_k(found, truth):>9.3f} {qps:>10.0f} "
+                      f"{build_s:>9.1f} {file_mb:>10.1f}")
+
+            if index_type == "IVF_PQ" and args.refine_k_factor and isinstance(index.index, faiss.IndexIVF):
+                refined = refine_flat(index.index, vectors)
+                refined_mb = index_file_mb(refined)
+                for k_factor in args.refine_k_factor:
+                    refined.k_factor = k_factor
+                    for nprobe in args.nprobe:
+                        index.index.nprobe = nprobe
+                        found, qps = run_faiss_queries(refined, queries, args.k)
+                        print(f"{'IVF_PQ+R':<10} {f'nprobe={nprobe} x{k_factor}':<14} "
+                              f"{recall_at_k(found, truth):>9.3f} {qps:>10.0f} {build_s:>9.1f} {refined_mb:>10.1f}")
+                del refined
+            del index
+
+
+if __name__ == "__main__":
+    main()
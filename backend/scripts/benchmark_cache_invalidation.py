@@ -0,0 +1,103 @@
+"""
+Load test for user cache invalidation: KEYS scan vs version counter
+
+Fills Redis with synthetic recommendation keys (1M by default), then
+invalidates user caches with the old KEYS+DEL approach and with the
+version-counter INCR used by clear_user_cache. A probe thread issues GETs
+throughout, to show how each approach affects latency for other clients.
+
+Run against a disposable Redis instance; the keys are removed afterwards.
+
+Usage:
+    python scripts/benchmark_cache_invalidation.py --keys 1000000 --invalidations 200
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import redis
+from app.core.config import settings
+from app.core.redis_client import clear_user_cache
+from scripts.benchmark_utils import print_latency_row
+
+KEY_PREFIX = "recommendations:user:"
+
+
+def legacy_clear_user_cache(client, user_id: int):
+    """Previous behaviour: scan the whole keyspace with KEYS"""
+    keys = client.keys(f"{KEY_PREFIX}{user_id}:*")
+    if keys:
+        client.delete(*keys)
+
+
+def populate(client, n_keys: int, keys_per_user: int):
+    pipe = client.pipeline(transaction=False)
+    for i in range(n_keys):
+        user_id, variant = divmod(i, keys_per_user)
+        pipe.setex(f"{KEY_PREFIX}{user_id}:v0:limit:{variant}:exclude:True", 3600, "{}")
+        if i % 10_000 == 0:
+            pipe.execute()
+    pipe.execute()
+
+
+def cleanup(client):
+    for key in client.scan_iter(f"{KEY_PREFIX}*", count=10_000):
+        client.unlink(key)
+
+
+class Probe(threading.Thread):
+    """Background client measuring GET latency"""
+
+    def __init__(self):
+        super().__init__(daemon=True)
+        self.client = redis.from_url(settings.REDIS_URL)
+        self.latencies = []
+        self.running = True
+
+    def run(self):
+        while self.running:
+            start = time.perf_counter()
+            self.client.get(f"{KEY_PREFIX}0:v0:limit:0:exclude:True")
+            self.latencies.append((time.perf_counter() - start) * 1000)
+            time.sleep(0.001)
+
+
+def measure(label, invalidate, n_users: int, invalidations: int):
+    probe = Probe()
+    probe.start()
+    latencies = []
+    for i in range(invalidations):
+        start = time.perf_counter()
+        invalidate(i % n_users)
+        latencies.append((time.perf_counter() - start) * 1000)
+    probe.running = False
+    probe.join()
+    print_latency_row(f"{label} invalidate", latencies)
+    print_latency_row(f"{label} probe GET", probe.latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--keys", type=int, default=1_000_000)
+    parser.add_argument("--keys-per-user", type=int, default=4)
+    parser.add_argument("--invalidations", type=int, default=200)
+    args = parser.parse_args()
+
+    client = redis.from_url(settings.REDIS_URL)
+    print(f"Populating {args.keys:,} keys...")
+    populate(client, args.keys, args.keys_per_user)
+    print(f"Redis dbsize: {client.dbsize():,}\n")
+
+    n_users = args.keys // args.keys_per_user
+    try:
+        measure("KEYS scan", lambda user_id: legacy_clear_user_cache(client, user_id), n_users, args.invalidations)
+        measure("version INCR", clear_user_cache, n_users, args.invalidations)
+    finally:
+        cleanup(client)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,122 @@
+"""
+Benchmark multi-centroid user profiles against the single mean vector
+
+Builds a synthetic catalog of topic clusters and users whose histories mix
+a few topics with uneven shares. For each user the single-centroid path
+searches with the mean of the history; the multi-centroid path fits up to
+--centroids k-means centroids (stored per user in production, so timed
+separately) and searches all of them in the same batched FAISS call, then
+merges the lists. Reports search latency per request batch, fit time per
+user, and how well the top `limit` results cover each user's interests:
+interest coverage (share of the user's topics present) and on-interest
+precision (share of results from one of the user's topics).
+
+Usage:
+    python scripts/benchmark_centroids.py --size 200000 --users 64 --centroids 2 4 8
+    python scripts/benchmark_centroids.py --interests 2 --history 500 --limit 20
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import faiss
+import numpy as np
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex
+from app.ml.recommender import RecommendationService
+from app.ml.user_profile import UserProfileService
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+
+def labelled_catalog(n, dimension, n_topics, rng):
+    """Normalized vectors around random topic centroids, with each vector's topic"""
+    topics = rng.standard_normal((n_topics, dimension)).astype("float32")
+    labels = rng.integers(0, n_topics, n)
+    vectors = topics[labels] + 0.6 * rng.standard_normal((n, dimension)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors, labels
+
+
+def synthetic_users(n_users, history, interests, vectors, labels, rng):
+    """(interest topics, watched vectors) per user, with Dirichlet-distributed shares of the history"""
+    by_topic = {}
+    users = []
+    for _ in range(n_users):
+        topics = rng.choice(labels.max() + 1, interests, replace=False)
+        counts = rng.multinomial(history, rng.dirichlet(np.ones(interests)))
+        watched = []
+        for topic, count in zip(topics, counts):
+            if topic not in by_topic:
+                by_topic[topic] = np.flatnonzero(labels == topic)
+            watched.append(vectors[rng.choice(by_topic[topic], count)])
+        users.append((set(topics.tolist()), np.vstack(watched)))
+    return users
+
+
+def coverage(similar_by_user, users, labels, limit):
+    """(mean interest coverage, mean on-interest precision) of the top `limit` results"""
+    covered, precise = [], []
+    for user_id, (topics, _) in enumerate(users):
+        found = [labels[video_id] for video_id, _ in similar_by_user[user_id][:limit]]
+        covered.append(len(topics & set(found)) / len(topics))
+        precise.append(sum(topic in topics for topic in found) / max(len(found), 1))
+    return float(np.mean(covered)), float(np.mean(precise))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--topics", type=int, default=500)
+    parser.add_argument("--users", type=int, default=32, help="Users per recommendation batch")
+    parser.add_argument("--history", type=int, default=200, help="Watches per user")
+    parser.add_argument("--interests", type=int, default=4, help="Topics per user")
+    parser.add_argument("--centroids", type=int, nargs="+", default=[2, 4, 8])
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--type", default="FLAT")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors, labels = labelled_catalog(args.size, args.dimension, args.topics, rng)
+    users = synthetic_users(args.users, args.history, args.interests, vectors, labels, rng)
+    user_ids = list(range(len(users)))
+    profiles = {user_id: watched.mean(axis=0) for user_id, (_, watched) in enumerate(users)}
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = FAISSIndex(args.dimension, args.type, os.path.join(tmp_dir, "index.bin"), mmap=False)
+        index.build(vectors, list(range(args.size)))
+        service = RecommendationService()
+        service.faiss_index = index
+        print(f"{args.size} vectors ({args.type}), {args.users} users x {args.history} watches over "
+              f"{args.interests} topics, limit={args.limit}\n")
+
+        similar = service._search_users(user_ids, profiles, args.limit)
+        covered, precise = coverage(similar, users, labels, args.limit)
+        print_latency_row("single centroid", time_calls(
+            lambda: service._search_users(user_ids, profiles, args.limit), args.iterations
+        ), f"coverage={covered:.2f} precision={precise:.2f}")
+
+        profile_service = UserProfileService()
+        for n_centroids in args.centroids:
+            profile_service.n_centroids = n_centroids
+            profile_service.min_watches_per_centroid = 1
+            start = time.perf_counter()
+            centroids = {
+                user_id: profile_service.fit_centroids(watched, np.ones(len(watched)))
+                for user_id, (_, watched) in enumerate(users)
+            }
+            fit_ms = (time.perf_counter() - start) * 1000 / len(users)
+
+            similar = service._search_users(user_ids, profiles, args.limit, centroids)
+            covered, precise = coverage(similar, users, labels, args.limit)
+            print_latency_row(f"{n_centroids} centroids", time_calls(
+                lambda: service._search_users(user_ids, profiles, args.limit, centroids), args.iterations
+            ), f"coverage={covered:.2f} precision={precise:.2f} fit={fit_ms:.1f}ms/user")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Concurrency benchmark for the recommendation endpoints
+
+Fires concurrent requests at a running API and reports throughput and
+latency percentiles. A parallel probe hits /api/health, which does almost
+no work, so its latency shows whether recommendation requests stall the
+event loop. Run it against a server started from the old and the new
+code to compare.
+
+Usage:
+    uvicorn app.main:app --workers 1 &
+    python scripts/benchmark_concurrency.py --base-url http://localhost:8000 --concurrency 32 --requests 2000
+"""
+import argparse
+import asyncio
+import os
+import random
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import httpx
+from scripts.benchmark_utils import print_latency_row
+
+
+async def worker(client, queue, latencies, errors, args):
+    while True:
+        try:
+            queue.get_nowait()
+        except asyncio.QueueEmpty:
+            return
+        user_id = random.randint(1, args.max_user_id)
+        if args.endpoint == "similar":
+            url = f"/api/recommendations/similar/{random.randint(1, args.max_video_id)}"
+        else:
+            url = f"/api/recommendations/user/{user_id}"
+        start = time.perf_counter()
+        try:
+            response = await client.get(url, params={"limit": args.limit})
+            if response.status_code >= 500:
+                errors.append(response.status_code)
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+
+async def health_probe(client, latencies, stop):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await client.get("/api/health")
+        latencies.append((time.perf_counter() - start) * 1000)
+        await asyncio.sleep(0.01)
+
+
+async def run(args):
+    queue = asyncio.Queue()
+    for i in range(args.requests):
+        queue.put_nowait(i)
+
+    limits = httpx.Limits(max_connections=args.concurrency + 1)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60, limits=limits) as client:
+        latencies, errors, probe_latencies = [], [], []
+        stop = asyncio.Event()
+        probe = asyncio.create_task(health_probe(client, probe_latencies, stop))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(
+            worker(client, queue, latencies, errors, args) for _ in range(args.concurrency)
+        ))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe
+
+    print(f"{args.requests} requests, concurrency={args.concurrency}, endpoint={args.endpoint}")
+    print(f"throughput: {args.requests / elapsed:.1f} req/s, errors: {len(errors)}")
+    print_latency_row("recommendations", latencies)
+    print_latency_row("health probe", probe_latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--endpoint", choices=["user", "similar"], default="user")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--max-user-id", type=int, default=2)
+    parser.add_argument("--max-video-id", type=int, default=20)
+    args = parser.parse_args()
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
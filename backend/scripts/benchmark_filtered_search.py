@@ -0,0 +1,93 @@
+"""
+Benchmark category/duration filtered vector search
+
+A filter is a random subset of the catalog (uncorrelated with the vectors,
+the hard case for both approaches) selecting a share of the videos from 50%
+down to 0.1%. Post-filtering searches the global top `limit * over_fetch`
+and keeps the videos that pass, which is all a client could do before; the
+filtered search passes the filter's ID bitmap to FAISSIndex.search_batch,
+which only considers passing videos. Reports latency per query batch,
+recall against the exact filtered top `limit`, and how full the result
+lists are.
+
+Usage:
+    python scripts/benchmark_filtered_search.py --size 200000 --selectivity 0.5 0.1 0.01 0.001
+    python scripts/benchmark_filtered_search.py --type HNSW --over-fetch 3 10
+"""
+import argparse
+import os
+import sys
+import tempfile
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex
+from scripts.benchmark_ann import synthetic_catalog
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+
+def exact_filtered(vectors, queries, selected, limit):
+    """True top `limit` passing video IDs per query"""
+    ids = np.flatnonzero(selected)
+    scores = queries @ vectors[ids].T
+    return [set(ids[np.argsort(-row)[:limit]].tolist()) for row in scores]
+
+
+def quality(results, truth, limit):
+    """(mean recall against the exact filtered results, mean share of `limit` returned)"""
+    recall = np.mean([len({video_id for video_id, _ in hits} & expected) / max(len(expected), 1)
+                      for hits, expected in zip(results, truth)])
+    fill = np.mean([len(hits) / limit for hits in results])
+    return recall, fill
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=200000)
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--type", default="FLAT")
+    parser.add_argument("--selectivity", type=float, nargs="+", default=[0.5, 0.1, 0.01, 0.001],
+                        help="Share of the catalog passing the filter")
+    parser.add_argument("--over-fetch", type=int, nargs="+", default=[3, 10],
+                        help="Post-filtering searches limit * this many neighbors")
+    parser.add_argument("--queries", type=int, default=16, help="Query rows per batch")
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--iterations", type=int, default=10)
+    args = parser.parse_args()
+
+    vectors = synthetic_catalog(args.size, args.dimension)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(args.size, size=args.queries)]
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        index = FAISSIndex(args.dimension, args.type, os.path.join(tmp_dir, "index.bin"), mmap=False)
+        index.build(vectors, list(range(args.size)))
+        print(f"{args.size} vectors ({args.type}), {args.queries} queries per batch, limit={args.limit}\n")
+
+        for selectivity in args.selectivity:
+            selected = rng.random(args.size) < selectivity
+            bitmap = np.packbits(selected, bitorder="little")
+            truth = exact_filtered(vectors, queries, selected, args.limit)
+            print(f"selectivity={selectivity:g} ({int(selected.sum())} videos)")
+
+            for over_fetch in args.over_fetch:
+                def post_filter():
+                    return [
+                        [(video_id, score) for video_id, score in hits if selected[video_id]][:args.limit]
+                        for hits in index.search_batch(queries, k=args.limit * over_fetch)
+                    ]
+
+                recall, fill = quality(post_filter(), truth, args.limit)
+                print_latency_row(f"  post-filter top {args.limit * over_fetch}", time_calls(post_filter, args.iterations),
+                                  f"recall={recall:.2f} filled={fill:.0%}")
+
+            def filtered():
+                return index.search_batch(queries, k=args.limit, id_filter=bitmap)
+
+            recall, fill = quality(filtered(), truth, args.limit)
+            print_latency_row("  filtered search", time_calls(filtered, args.iterations),
+                              f"recall={recall:.2f} filled={fill:.0%}")
+
+
+if __name__ == "__main__":
+    main()
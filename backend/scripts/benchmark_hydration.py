@@ -0,0 +1,66 @@
+"""
+Benchmark candidate hydration: one SELECT per FAISS hit vs a single IN (...) query
+
+Usage:
+    python scripts/benchmark_hydration.py --limit 50 --iterations 200
+"""
+import argparse
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.database import SessionLocal, engine
+from app.models.video import Video
+from app.ml.recommender import recommendation_service
+from scripts.benchmark_utils import count_queries, print_latency_row, time_calls
+
+
+def hydrate_per_row(db, video_ids):
+    """Previous behaviour: one query per candidate"""
+    results = {}
+    for video_id in video_ids:
+        video = db.query(Video).filter(Video.id == video_id).first()
+        if video:
+            results[video_id] = video
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--limit", type=int, default=50, help="Recommendation limit (candidates = limit * 3)")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        all_ids = [row[0] for row in db.query(Video.id).all()]
+        if not all_ids:
+            print("No videos in database; run scripts/seed_data.py first.")
+            return
+
+        n_candidates = min(args.limit * 3, len(all_ids))
+        candidate_sets = [random.sample(all_ids, n_candidates) for _ in range(args.iterations)]
+        print(f"{len(all_ids)} videos, {n_candidates} candidates per request\n")
+
+        for label, hydrate in (
+            ("per-row SELECT", hydrate_per_row),
+            ("batched IN (...)", recommendation_service.hydrate_videos),
+        ):
+            candidates = iter(candidate_sets * 2)
+
+            def run():
+                db.expire_all()
+                hydrate(db, next(candidates))
+
+            with count_queries(engine) as counter:
+                run()
+            queries_per_request = counter["count"]
+            latencies = time_calls(run, iterations=args.iterations - 1, warmup=0)
+            print_latency_row(label, latencies, f"queries/request={queries_per_request}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+Benchmark FAISS index startup with and without memory mapping
+
+Saves a synthetic catalog (or uses an existing index), then starts several
+worker processes that each load it, as uvicorn workers do, and run a few
+searches. Reports per-worker load time and memory: RssAnon is private to
+the worker, RssFile is page cache it maps (shared between workers) and Pss
+splits shared pages between the processes using them, so the Pss column
+sums to the real memory cost of all workers.
+
+Usage:
+    python scripts/benchmark_index_load.py --size 1000000 --workers 4
+    python scripts/benchmark_index_load.py --types FLAT IVF_FLAT --size 500000
+    python scripts/benchmark_index_load.py --index-path data/faiss_index.bin --workers 8
+"""
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex
+from scripts.benchmark_ann import synthetic_catalog
+
+
+def memory_kb() -> dict:
+    """RssAnon/RssFile from /proc/self/status and Pss from smaps_rollup (Linux)"""
+    usage = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("RssAnon:", "RssFile:")):
+                usage[line.split(":")[0]] = int(line.split()[1])
+    with open("/proc/self/smaps_rollup") as f:
+        for line in f:
+            if line.startswith("Pss:"):
+                usage["Pss"] = int(line.split()[1])
+    return usage
+
+
+def worker(index_path: str, dimension: int, mmap: bool, queries: np.ndarray, barrier, results):
+    baseline = memory_kb()
+    start = time.perf_counter()
+    index = FAISSIndex(dimension, index_path=index_path, mmap=mmap)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+    index.search_batch(queries, k=10)
+    search_ms = (time.perf_counter() - start) * 1000
+
+    # Measure while every worker holds its index, so shared pages are split between them
+    barrier.wait()
+    usage = memory_kb()
+    barrier.wait()
+    results.put({
+        "pid": os.getpid(),
+        "load_ms": load_ms,
+        "search_ms": search_ms,
+        "anon_mb": (usage["RssAnon"] - baseline["RssAnon"]) / 1024,
+        "file_mb": (usage["RssFile"] - baseline["RssFile"]) / 1024,
+        "pss_mb": (usage["Pss"] - baseline["Pss"]) / 1024,
+    })
+
+
+def run_workers(index_path: str, dimension: int, mmap: bool, n_workers: int, queries: np.ndarray):
+    context = multiprocessing.get_context("spawn")
+    barrier = context.Barrier(n_workers)
+    results = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(index_path, dimension, mmap, queries, barrier, results))
+        for _ in range(n_workers)
+    ]
+    for process in processes:
+        process.start()
+    rows = [results.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    label = "mmap" if mmap else "read"
+    for row in sorted(rows, key=lambda r: r["pid"]):
+        print(f"  {label:<5} pid={row['pid']:<8} load={row['load_ms']:8.1f}ms first_search={row['search_ms']:7.1f}ms "
+              f"anon={row['anon_mb']:8.1f}MB file={row['file_mb']:8.1f}MB pss={row['pss_mb']:8.1f}MB")
+    print(f"  {label:<5} total pss={sum(r['pss_mb'] for r in rows):.1f}MB "
+          f"max load={max(r['load_ms'] for r in rows):.1f}ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500000, help="Synthetic catalog size")
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--types", nargs="+", default=["FLAT", "HNSW", "IVF_FLAT"])
+    parser.add_argument("--workers", type=int, default=4, help="Worker processes loading the index")
+    parser.add_argument("--index-path", help="Benchmark an existing index instead of a synthetic one")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        if args.index_path:
+            targets = [("existing", args.index_path)]
+            dimension = FAISSIndex(args.dimension, index_path=args.index_path, mmap=True).index.d
+        else:
+            vectors = synthetic_catalog(args.size, args.dimension)
+            targets = []
+            for index_type in args.types:
+                path = os.path.join(tmp_dir, f"{index_type}.bin")
+                index = FAISSIndex(args.dimension, index_type, path, mmap=False)
+                index.build(vectors, list(range(args.size)))
+                index.save()
+                del index
+                targets.append((index_type, path))
+            del vectors
+            dimension = args.dimension
+
+        queries = np.random.default_rng(1).standard_normal((16, dimension)).astype("float32")
+        for label, path in targets:
+            print(f"{label}: {os.path.getsize(path) / 1e6:.1f}MB on disk, {args.workers} workers")
+            for mmap in (False, True):
+                run_workers(path, dimension, mmap, args.workers, queries)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Benchmark video list pages: full rows vs deferred embedding vs VideoResponse columns only
+
+For each loading strategy, fetches pages the way GET /api/videos/ does,
+serializes them through VideoResponse and reports latency per page and the
+bytes per page as Postgres measures them (sum of pg_column_size of the
+selected rows).
+
+Usage:
+    python scripts/benchmark_list_queries.py --seed 100000 --page-size 50
+    python scripts/benchmark_list_queries.py --page-size 100 --iterations 300 --cleanup
+"""
+import argparse
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import delete, event, func, insert
+from sqlalchemy.orm import load_only, undefer
+from app.core.database import SessionLocal, engine
+from app.core.config import settings
+from app.models.video import Video, VIDEO_RESPONSE_COLUMNS
+from app.schemas.video import VideoResponse
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+BENCH_PREFIX = "bench_list_"
+CATEGORIES = ["Education", "Technology", "Entertainment", "Music", "Gaming", "Sports", "News", "Travel"]
+WORDS = "learn build deploy scale python data video music travel guide review tutorial advanced basics".split()
+
+STRATEGIES = {
+    "full row (embedding loaded)": lambda db: db.query(Video).options(undefer(Video.embedding)),
+    "default (embedding deferred)": lambda db: db.query(Video),
+    "load_only(VideoResponse)": lambda db: db.query(Video).options(load_only(*VIDEO_RESPONSE_COLUMNS)),
+}
+
+
+def seed(db, n: int, batch_size: int = 5000):
+    """Insert synthetic videos (with random embeddings) until the table has n of them"""
+    existing = db.query(func.count(Video.id)).filter(Video.video_id.like(f"{BENCH_PREFIX}%")).scalar()
+    rng = np.random.default_rng(0)
+    for start in range(existing, n, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, n)):
+            words = rng.choice(WORDS, 40)
+            rows.append({
+                "video_id": f"{BENCH_PREFIX}{i}",
+                "title": " ".join(words[:6]).title(),
+                "description": " ".join(words),
+                "tags": list(words[:4]),
+                "category": CATEGORIES[i % len(CATEGORIES)],
+                "duration": int(rng.integers(60, 3600)),
+                "views": int(rng.integers(0, 100000)),
+                "likes": int(rng.integers(0, 5000)),
+                "embedding": rng.standard_normal(settings.EMBEDDING_DIMENSION).astype("float32"),
+            })
+        db.execute(insert(Video), rows)
+        db.commit()
+        print(f"Seeded {start + len(rows)}/{n} videos")
+
+
+def page_bytes(db, query) -> int:
+    """Bytes Postgres returns for a page: sum of pg_column_size over the rows of the emitted SQL"""
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        captured.append((statement, parameters))
+
+    event.listen(engine, "before_cursor_execute", capture)
+    try:
+        query.all()
+    finally:
+        event.remove(engine, "before_cursor_execute", capture)
+
+    statement, parameters = captured[0]
+    return db.connection().exec_driver_sql(
+        f"SELECT sum(pg_column_size(page.*)) FROM ({statement}) AS page", parameters
+    ).scalar() or 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="Ensure this many synthetic videos exist")
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--iterations", type=int, default=200)
+    parser.add_argument("--order-by", choices=["created_at", "id"], default="created_at",
+                        help="created_at as the endpoint sorts, or id to leave out the sort")
+    parser.add_argument("--cleanup", action="store_true", help="Delete the synthetic videos afterwards")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.seed:
+            seed(db, args.seed)
+
+        total = db.query(func.count(Video.id)).scalar()
+        if not total:
+            print("No videos in database; run with --seed 100000 or scripts/seed_data.py first.")
+            return
+        print(f"{total} videos, {args.page_size} per page\n")
+
+        rng = random.Random(0)
+        offsets = [rng.randrange(0, max(1, total - args.page_size)) for _ in range(args.iterations)]
+
+        order = Video.created_at.desc() if args.order_by == "created_at" else Video.id
+        for label, base_query in STRATEGIES.items():
+            def page_query(offset):
+                return base_query(db).order_by(order).offset(offset).limit(args.page_size)
+
+            pages = iter(offsets * 2)
+
+            def run():
+                db.expunge_all()
+                videos = page_query(next(pages)).all()
+                return [VideoResponse.model_validate(video) for video in videos]
+
+            latencies = time_calls(run, iterations=args.iterations, warmup=3)
+            bytes_per_page = np.mean([page_bytes(db, page_query(offset)) for offset in offsets[:20]])
+            print_latency_row(label, latencies, f"bytes/page={bytes_per_page:,.0f}")
+
+        if args.cleanup:
+            db.execute(delete(Video).where(Video.video_id.like(f"{BENCH_PREFIX}%")))
+            db.commit()
+            print("\nRemoved synthetic videos")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
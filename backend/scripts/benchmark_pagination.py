@@ -0,0 +1,75 @@
+"""
+Benchmark video listing: OFFSET vs keyset pagination, ILIKE vs full-text search
+
+Pages are fetched the way GET /api/videos/ (offset) and GET /api/videos/page
+(cursor) query them, at increasing depths. Search compares the substring
+ILIKE of `search` (pg_trgm indexes) with the tsvector match of `q`.
+
+Usage:
+    python scripts/benchmark_pagination.py --depths 0 1000 10000 100000
+    python scripts/benchmark_pagination.py --search python "machine learning" --iterations 50
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func, tuple_
+from app.core.database import SessionLocal
+from app.api.videos import filter_videos
+from app.models.video import Video
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--depths", type=int, nargs="+", default=[0, 1000, 10000, 50000, 100000],
+                        help="Rows before the page")
+    parser.add_argument("--page-size", type=int, default=20)
+    parser.add_argument("--search", nargs="+", default=["python", "machine learning", "travel guide"])
+    parser.add_argument("--iterations", type=int, default=30)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = db.query(func.count(Video.id)).scalar()
+        print(f"{total} videos, {args.page_size} per page\n")
+        newest_first = (Video.created_at.desc(), Video.id.desc())
+
+        for depth in args.depths:
+            if depth >= total:
+                continue
+
+            def offset_page():
+                return filter_videos(db, None, None).order_by(*newest_first).offset(depth).limit(args.page_size).all()
+
+            # The cursor a client holds after reading `depth` rows
+            last = db.query(Video.created_at, Video.id).order_by(*newest_first).offset(max(depth - 1, 0)).first()
+
+            def keyset_page():
+                query = filter_videos(db, None, None)
+                if depth:
+                    query = query.filter(tuple_(Video.created_at, Video.id) < tuple_(*last))
+                return query.order_by(*newest_first).limit(args.page_size).all()
+
+            print_latency_row(f"OFFSET {depth}", time_calls(offset_page, args.iterations))
+            print_latency_row(f"keyset at {depth}", time_calls(keyset_page, args.iterations))
+
+        print()
+        for term in args.search:
+            def ilike_search():
+                return filter_videos(db, None, term).order_by(*newest_first).limit(args.page_size).all()
+
+            def fulltext_search():
+                return filter_videos(db, None, None, term).order_by(*newest_first).limit(args.page_size).all()
+
+            print_latency_row(f"ILIKE '{term}'", time_calls(ilike_search, args.iterations),
+                              f"matches={filter_videos(db, None, term).count()}")
+            print_latency_row(f"tsvector '{term}'", time_calls(fulltext_search, args.iterations),
+                              f"matches={filter_videos(db, None, None, term).count()}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+"""
+Benchmark cold-start popular videos: ORDER BY over the videos table vs the precomputed ranking
+
+Compares the per-request query the recommender used to run with the
+popularity service served from process memory, and reports what one refresh
+costs (recomputing from Postgres, or loading another worker's ranking from
+Redis).
+
+Usage:
+    python scripts/benchmark_popularity.py --limit 10 --iterations 200
+    python scripts/benchmark_popularity.py --category Education
+"""
+import argparse
+import os
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+from app.core.database import SessionLocal, engine
+from app.core.redis_client import get_cache, popular_videos_key
+from app.ml.popularity import popularity_service
+from app.models.video import Video, VIDEO_RESPONSE_COLUMNS
+from scripts.benchmark_utils import count_queries, print_latency_row, time_calls
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--category", help="Benchmark the ranking of one category")
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        total = db.query(func.count(Video.id)).scalar()
+        print(f"{total} videos, top {popularity_service.top_k} kept per list\n")
+
+        def order_by_query():
+            query = db.query(Video).options(load_only(*VIDEO_RESPONSE_COLUMNS))
+            if args.category:
+                query = query.filter(Video.category == args.category)
+            db.expunge_all()
+            return query.order_by(Video.views.desc(), Video.likes.desc()).limit(args.limit).all()
+
+        print_latency_row("ORDER BY views, likes", time_calls(order_by_query, args.iterations))
+
+        refresh_latencies = time_calls(lambda: popularity_service.refresh(db, force=True), 5, warmup=1)
+        print_latency_row("refresh (recompute)", refresh_latencies)
+        print_latency_row("refresh (from Redis)",
+                          time_calls(lambda: popularity_service._load(get_cache(popular_videos_key())), 20),
+                          f"videos={len(get_cache(popular_videos_key())['videos'])}")
+
+        with count_queries(engine) as counter:
+            latencies = time_calls(lambda: popularity_service.get_popular(db, args.limit, args.category),
+                                   args.iterations)
+        print_latency_row("precomputed (memory)", latencies, f"queries={counter['count']}")
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,108 @@
+"""
+Benchmark recommendation reasons for users with long watch histories
+
+The previous implementation rebuilt the watched categories and the full
+watched tag set from every watched video once per recommended candidate.
+Building the user's WatchedProfile (categories plus interned tag IDs) once
+per request from the watched videos checks all candidates' tags against it
+in one sorted-array lookup. The current one builds it from the distinct
+categories and tags stored with the user's profile, so neither the watch
+history nor its videos are read per request. All run on synthetic in-memory
+videos, so no database is needed; timings cover one user's request (without
+the query that loaded the watched videos, which the stored labels also save).
+
+Usage:
+    python scripts/benchmark_reasons.py --history 5000 --limit 10 50
+    python scripts/benchmark_reasons.py --history 500 5000 20000 --tags-per-video 8
+"""
+import argparse
+import os
+import random
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.models.video import Video
+from app.ml.recommender import recommendation_service
+from app.ml.tags import WatchedProfile
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+
+def generate_reason_per_candidate(video, watched_videos, similarity_score):
+    """Previous behaviour: the watched categories and tags are rebuilt for every candidate"""
+    reasons = [f"{int(similarity_score * 100)}% similarity"]
+
+    watched_categories = {v.category for v in watched_videos if v.category}
+    if video.category and video.category in watched_categories:
+        reasons.append(f"same category: {video.category}")
+
+    watched_tags = set()
+    for v in watched_videos:
+        if v.tags:
+            watched_tags.update(v.tags)
+
+    if video.tags:
+        overlap = watched_tags.intersection(set(video.tags))
+        if overlap:
+            reasons.append(f"shared tags: {', '.join(list(overlap)[:3])}")
+
+    return "Recommended because: " + ", ".join(reasons)
+
+
+def synthetic_videos(n, vocabulary_size, tags_per_video, categories, rng, start_id=1):
+    """Videos with tags drawn from a skewed vocabulary, as real tag usage is"""
+    tags = [f"tag-{i}" for i in range(vocabulary_size)]
+    weights = [1 / (rank + 1) for rank in range(vocabulary_size)]
+    return [
+        Video(
+            id=start_id + i,
+            category=rng.choice(categories),
+            tags=rng.choices(tags, weights=weights, k=tags_per_video)
+        )
+        for i in range(n)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--history", type=int, nargs="+", default=[5000], help="Watched videos per user")
+    parser.add_argument("--limit", type=int, nargs="+", default=[10, 50], help="Recommendations per request")
+    parser.add_argument("--tags-per-video", type=int, default=5)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="Distinct tags in the catalog")
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    categories = [f"category-{i}" for i in range(30)]
+    for history_size in args.history:
+        watched = synthetic_videos(history_size, args.vocabulary, args.tags_per_video, categories, rng)
+        # What UserProfile.watched_categories / watched_tags hold for this history
+        stored_labels = (
+            sorted({video.category for video in watched}),
+            sorted({tag for video in watched for tag in video.tags})
+        )
+        for limit in args.limit:
+            selected = [
+                (video, rng.uniform(0.3, 0.9))
+                for video in synthetic_videos(limit, args.vocabulary, args.tags_per_video, categories, rng,
+                                              start_id=history_size + 1)
+            ]
+
+            def previous():
+                return [generate_reason_per_candidate(video, watched, score) for video, score in selected]
+
+            def from_history():
+                profile = WatchedProfile.from_videos(watched, recommendation_service.tag_vocabulary)
+                return recommendation_service._generate_reasons(selected, profile)
+
+            def current():
+                profile = WatchedProfile.from_labels(*stored_labels, recommendation_service.tag_vocabulary)
+                return recommendation_service._generate_reasons(selected, profile)
+
+            print(f"history={history_size} limit={limit}")
+            print_latency_row("  per-candidate rebuild", time_calls(previous, args.iterations))
+            print_latency_row("  profile once + lookup", time_calls(from_history, args.iterations))
+            print_latency_row("  stored labels + lookup", time_calls(current, args.iterations))
+
+
+if __name__ == "__main__":
+    main()
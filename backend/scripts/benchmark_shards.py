@@ -0,0 +1,118 @@
+"""
+Benchmark sharded FAISS search against a single in-process index
+
+Splits a synthetic catalog by video_id % shards, starts one shard process
+per partition on this machine (as scripts/run_faiss_shards.py does) and
+queries them through ShardedFAISSIndex. Reports recall@k against the exact
+single index (1.0 for FLAT: the merged per-shard top-k is the global
+top-k), single-query latency, and queries/s with concurrent callers
+sending batches, as recommendation requests do.
+
+Usage:
+    python scripts/benchmark_shards.py --size 1000000 --shards 1 2 4
+    python scripts/benchmark_shards.py --type HNSW --size 500000 --threads 8
+"""
+import argparse
+import multiprocessing
+import os
+import secrets
+import sys
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex
+from app.ml.faiss_shards import FAISSShard, ShardedFAISSIndex, shard_of
+from scripts.benchmark_ann import recall_at_k, run_queries, synthetic_catalog
+from scripts.benchmark_utils import print_latency_row, time_calls
+
+
+def serve_shard(shard_id: int, index_path: str, address: str):
+    FAISSShard(shard_id, index_path=index_path, address=address).serve_forever()
+
+
+def start_shards(vectors, ids, n_shards, index_type, tmp_dir):
+    """Build and save each partition, then start its shard process; returns (processes, addresses)"""
+    shards = shard_of(ids, n_shards)
+    context = multiprocessing.get_context("spawn")
+    processes, addresses = [], []
+    for shard_id in range(n_shards):
+        index_path = os.path.join(tmp_dir, f"{n_shards}_shard{shard_id}.bin")
+        address = os.path.join(tmp_dir, f"{n_shards}_shard{shard_id}.sock")
+        index = FAISSIndex(vectors.shape[1], index_type, index_path, mmap=False)
+        index.build(vectors[shards == shard_id], ids[shards == shard_id].tolist())
+        index.save()
+        del index
+
+        process = context.Process(target=serve_shard, args=(shard_id, index_path, address))
+        process.start()
+        processes.append(process)
+        addresses.append(address)
+
+    while not all(os.path.exists(address) for address in addresses):
+        time.sleep(0.05)
+    return processes, addresses
+
+
+def throughput(index, queries, k, threads, batch_size):
+    """Queries/s with `threads` callers each sending batches of batch_size queries"""
+    batches = [queries[start:start + batch_size] for start in range(0, len(queries), batch_size)]
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(lambda batch: index.search_batch(batch, k=k), batches))
+    return len(queries) / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size", type=int, default=500000)
+    parser.add_argument("--dimension", type=int, default=settings.EMBEDDING_DIMENSION)
+    parser.add_argument("--type", default="FLAT")
+    parser.add_argument("--shards", type=int, nargs="+", default=[2, 4])
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=30, help="Neighbours per query (recommendations fetch limit * 3)")
+    parser.add_argument("--threads", type=int, default=4, help="Concurrent callers in the throughput test")
+    parser.add_argument("--batch-size", type=int, default=16, help="Queries per search_batch call")
+    args = parser.parse_args()
+    # Shard connections are authenticated with SECRET_KEY; spawned shards read it from the environment
+    settings.SECRET_KEY = os.environ["SECRET_KEY"] = secrets.token_hex(32)
+
+    vectors = synthetic_catalog(args.size, args.dimension)
+    ids = np.arange(1, args.size + 1, dtype="int64")
+    queries = synthetic_catalog(args.queries, args.dimension, seed=1)
+    print(f"{args.size} vectors, {args.type}, k={args.k}, {args.threads} threads x {args.batch_size} queries/batch\n")
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        single = FAISSIndex(args.dimension, args.type, os.path.join(tmp_dir, "single.bin"), mmap=False)
+        single.build(vectors, ids.tolist())
+        exact = FAISSIndex(args.dimension, "FLAT", os.path.join(tmp_dir, "exact.bin"), mmap=False)
+        exact.build(vectors, ids.tolist())
+        truth, _ = run_queries(exact, queries, args.k)
+        del exact
+
+        found, _ = run_queries(single, queries, args.k)
+        print_latency_row("in-process", time_calls(lambda: single.search(queries[0], k=args.k), 200),
+                          f"recall={recall_at_k(found, truth):.3f} "
+                          f"qps={throughput(single, queries, args.k, args.threads, args.batch_size):,.0f}")
+        del single
+
+        for n_shards in args.shards:
+            processes, addresses = start_shards(vectors, ids, n_shards, args.type, tmp_dir)
+            try:
+                sharded = ShardedFAISSIndex(args.dimension, n_shards, addresses)
+                found, _ = run_queries(sharded, queries, args.k)
+                print_latency_row(f"{n_shards} shards", time_calls(lambda: sharded.search(queries[0], k=args.k), 200),
+                                  f"recall={recall_at_k(found, truth):.3f} "
+                                  f"qps={throughput(sharded, queries, args.k, args.threads, args.batch_size):,.0f} "
+                                  f"vectors={sharded.get_total_vectors()}")
+            finally:
+                for process in processes:
+                    process.terminate()
+                    process.join()
+
+
+if __name__ == "__main__":
+    main()
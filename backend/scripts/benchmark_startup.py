@@ -0,0 +1,80 @@
+"""
+Benchmark API process startup: importing app.main, and warming up the ML stack
+
+Each measurement runs in a fresh interpreter, as a new uvicorn worker would.
+Importing app.main should not load torch, the embedding model or the FAISS
+index; those are loaded by the warm-up in the lifespan (or on first use).
+
+Usage:
+    python scripts/benchmark_startup.py --runs 5
+    python scripts/benchmark_startup.py --runs 3 --top-imports 15
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from scripts.benchmark_utils import print_latency_row
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+STAGES = {
+    "import app.main": "import app.main",
+    "import + warm-up": (
+        "import app.main; "
+        "from app.ml.recommender import recommendation_service; "
+        "recommendation_service.warm_up()"
+    ),
+}
+
+
+def run_python(code: str, *flags: str) -> subprocess.CompletedProcess:
+    return subprocess.run(
+        [sys.executable, *flags, "-c", code],
+        cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+    )
+
+
+def time_stage(code: str, runs: int):
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        run_python(code)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def heavy_modules(code: str, top: int):
+    """Top-level packages by cumulative import time, from python -X importtime"""
+    totals = {}
+    for line in run_python(code, "-X", "importtime").stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        package = name.strip().split(".")[0]
+        if name.strip() == package:
+            totals[package] = max(totals.get(package, 0), int(cumulative))
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters per stage")
+    parser.add_argument("--top-imports", type=int, default=10, help="Slowest packages to list for import app.main")
+    args = parser.parse_args()
+
+    baseline = time_stage("pass", args.runs)
+    print_latency_row("interpreter only", baseline)
+    for label, code in STAGES.items():
+        print_latency_row(label, time_stage(code, args.runs))
+
+    if args.top_imports:
+        print("\nSlowest packages imported by app.main (cumulative):")
+        for package, micros in heavy_modules("import app.main", args.top_imports):
+            print(f"  {package:<28} {micros / 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
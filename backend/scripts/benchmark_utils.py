@@ -0,0 +1,57 @@
+"""
+Shared helpers for the benchmark scripts
+"""
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+def summarize_latencies(latencies_ms: List[float]) -> Dict[str, float]:
+    """Return mean/p50/p95/p99 for a list of latencies in milliseconds"""
+    values = np.asarray(latencies_ms, dtype="float64")
+    return {
+        "mean": float(values.mean()),
+        "p50": float(np.percentile(values, 50)),
+        "p95": float(np.percentile(values, 95)),
+        "p99": float(np.percentile(values, 99)),
+    }
+
+
+def time_calls(fn: Callable[[], object], iterations: int, warmup: int = 3) -> List[float]:
+    """Call fn repeatedly and return per-call latencies in milliseconds"""
+    for _ in range(warmup):
+        fn()
+    latencies = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        fn()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def print_latency_row(label: str, latencies_ms: List[float], extra: str = ""):
+    """Print a one-line latency summary"""
+    stats = summarize_latencies(latencies_ms)
+    print(
+        f"{label:<28} mean={stats['mean']:8.2f}ms p50={stats['p50']:8.2f}ms "
+        f"p95={stats['p95']:8.2f}ms p99={stats['p99']:8.2f}ms {extra}"
+    )
+
+
+@contextmanager
+def count_queries(engine):
+    """Count SQL statements executed on engine inside the block"""
+    from sqlalchemy import event
+
+    counter = {"count": 0}
+
+    def _before_cursor_execute(*args, **kwargs):
+        counter["count"] += 1
+
+    event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+    try:
+        yield counter
+    finally:
+        event.remove(engine, "before_cursor_execute", _before_cursor_execute)
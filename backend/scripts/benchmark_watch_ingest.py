@@ -0,0 +1,113 @@
+"""
+Benchmark watch-event ingestion throughput
+
+Part 1 inserts watch_history rows the two ways a writer can batch them,
+executemany (multi-row INSERT) and COPY, inside a transaction that is rolled
+back. Part 2 sends the same events through the API, one POST per event vs
+POST /api/videos/watch-events as a JSON array or an NDJSON stream, and
+counts events/s until the watch event writer has written them all. Watch
+rows, view counts and profiles are restored afterwards.
+
+Usage:
+    python scripts/benchmark_watch_ingest.py --events 20000 --request-size 1000
+    python scripts/benchmark_watch_ingest.py --rows 10000 50000 --skip-api
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from datetime import datetime, timezone
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from fastapi.testclient import TestClient
+from sqlalchemy import insert
+from app.core.database import SessionLocal
+from app.main import app
+from app.models.watch_history import WatchHistory
+from app.ml.watch_events import WatchEvent, WatchEventWriter
+from scripts.benchmark_watch_writes import restore, sample_events, snapshot
+
+
+def insert_rows_per_second(events, copy: bool) -> float:
+    db = SessionLocal()
+    try:
+        start = time.perf_counter()
+        if copy:
+            WatchEventWriter._copy_watch_history(db, events)
+        else:
+            db.execute(insert(WatchHistory), [event._asdict() for event in events])
+        elapsed = time.perf_counter() - start
+        db.rollback()
+        return len(events) / elapsed
+    finally:
+        db.close()
+
+
+def send_single(client, events, request_size):
+    for user_id, video_id in events:
+        client.post(f"/api/videos/{video_id}/watch", params={"user_id": user_id})
+
+
+def send_json(client, events, request_size):
+    for start in range(0, len(events), request_size):
+        client.post("/api/videos/watch-events", json=[
+            {"user_id": user_id, "video_id": video_id} for user_id, video_id in events[start:start + request_size]
+        ])
+
+
+def send_ndjson(client, events, request_size):
+    for start in range(0, len(events), request_size):
+        lines = (
+            json.dumps({"user_id": user_id, "video_id": video_id}).encode() + b"\n"
+            for user_id, video_id in events[start:start + request_size]
+        )
+        client.post("/api/videos/watch-events", content=lines, headers={"content-type": "application/x-ndjson"})
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000], help="Rows per insert in part 1")
+    parser.add_argument("--events", type=int, default=10000, help="Events sent through the API in part 2")
+    parser.add_argument("--single-events", type=int, default=1000, help="Events sent one POST at a time")
+    parser.add_argument("--request-size", type=int, default=500, help="Events per bulk request")
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--skip-api", action="store_true")
+    args = parser.parse_args()
+
+    events = sample_events(max(args.rows + [args.events]), args.users, hot_videos=3, hot_share=0.5)
+    if not events:
+        print("Not enough users or embedded videos; run scripts/seed_data.py first.")
+        return
+
+    now = datetime.now(timezone.utc)
+    for n in args.rows:
+        rows = [WatchEvent(user_id, video_id, 30.0, None, now) for user_id, video_id in events[:n]]
+        print(f"{n:>7} rows  executemany={insert_rows_per_second(rows, copy=False):>10,.0f} rows/s  "
+              f"COPY={insert_rows_per_second(rows, copy=True):>10,.0f} rows/s")
+
+    if args.skip_api:
+        return
+
+    print()
+    for label, send, n in (
+        ("POST per event", send_single, args.single_events),
+        ("JSON array", send_json, args.events),
+        ("NDJSON stream", send_ndjson, args.events),
+    ):
+        sent = events[:n]
+        state = snapshot(sent)
+        try:
+            # Leaving the client runs the app's shutdown, which waits for the writer to drain
+            with TestClient(app) as client:
+                start = time.perf_counter()
+                send(client, sent, args.request_size)
+                accepted = time.perf_counter() - start
+            written = time.perf_counter() - start
+        finally:
+            restore(state, sent)
+        print(f"{label:<16} {n:>7} events  accepted={n / accepted:>9,.0f}/s  written={n / written:>9,.0f}/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,152 @@
+"""
+Benchmark recording watch events: per-watch transactions vs write-behind batches
+
+Concurrent threads record watches the way POST /api/videos/{video_id}/watch
+does, with most events on a few "viral" videos so the view counter is a hot
+row. The per-watch path is the previous handler (views += 1 and a commit,
+then the history row and profile update in a second commit); the
+write-behind path is the current handler plus the time the writer needs to
+drain its queue. Watch rows, view counts and profiles are restored afterwards.
+
+Usage:
+    python scripts/benchmark_watch_writes.py --events 2000 --threads 16
+    python scripts/benchmark_watch_writes.py --hot-videos 1 --hot-share 0.9
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import func
+from sqlalchemy.orm import undefer
+from app.core.database import SessionLocal
+from app.core.redis_client import clear_user_cache
+from app.models.user import User
+from app.models.video import Video
+from app.models.watch_history import WatchHistory
+from app.ml.user_profile import user_profile_service
+from app.ml.watch_events import WatchEvent, watch_event_writer
+from scripts.benchmark_utils import print_latency_row
+
+
+def record_per_watch(user_id: int, video_id: int):
+    """Previous handler: two transactions and a row lock on the video per watch"""
+    db = SessionLocal()
+    try:
+        video = db.query(Video).options(undefer(Video.embedding)).filter(Video.id == video_id).first()
+        video.views += 1
+        db.commit()
+        db.add(WatchHistory(user_id=user_id, video_id=video_id))
+        user_profile_service.add_watch(db, user_id, video.embedding)
+        db.commit()
+    finally:
+        db.close()
+    clear_user_cache(user_id)
+
+
+def record_write_behind(user_id: int, video_id: int):
+    """Current handler: one existence check, then enqueue"""
+    db = SessionLocal()
+    try:
+        db.query(Video.id).filter(Video.id == video_id).first()
+    finally:
+        db.close()
+    watch_event_writer.record(WatchEvent(user_id, video_id, None, None, datetime.now(timezone.utc)))
+
+
+def sample_events(n: int, users: int, hot_videos: int, hot_share: float, seed: int = 0):
+    """(user_id, video_id) pairs with hot_share of them on the first hot_videos embedded videos"""
+    db = SessionLocal()
+    try:
+        user_ids = [row[0] for row in db.query(User.id).order_by(User.id).limit(users).all()]
+        video_ids = [row[0] for row in db.query(Video.id).filter(Video.embedding.isnot(None)).limit(5000).all()]
+    finally:
+        db.close()
+    if not user_ids or len(video_ids) <= hot_videos:
+        return []
+
+    rng = random.Random(seed)
+    hot, cold = video_ids[:hot_videos], video_ids[hot_videos:]
+    return [
+        (rng.choice(user_ids), rng.choice(hot if rng.random() < hot_share else cold))
+        for _ in range(n)
+    ]
+
+
+def snapshot(events):
+    """State touched by recording events: view counts of their videos and the last watch_history ID"""
+    db = SessionLocal()
+    try:
+        touched_videos = {video_id for _, video_id in events}
+        views = dict(db.query(Video.id, Video.views).filter(Video.id.in_(touched_videos)).all())
+        return views, db.query(func.max(WatchHistory.id)).scalar() or 0
+    finally:
+        db.close()
+
+
+def restore(state, events):
+    """Delete the benchmark's watch rows, reset view counts and rebuild the affected profiles"""
+    views_before, last_watch_id = state
+    db = SessionLocal()
+    try:
+        db.query(WatchHistory).filter(WatchHistory.id > last_watch_id).delete(synchronize_session=False)
+        for video_id, views in views_before.items():
+            db.query(Video).filter(Video.id == video_id).update(
+                {Video.views: views, Video.updated_at: Video.updated_at}, synchronize_session=False
+            )
+        db.flush()
+        for user_id in {user_id for user_id, _ in events}:
+            user_profile_service.rebuild_profile(db, user_id)
+        db.commit()
+    finally:
+        db.close()
+
+
+def run(label, record, events, threads, drain=None):
+    latencies = []
+
+    def timed(event):
+        start = time.perf_counter()
+        record(*event)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(threads) as pool:
+        list(pool.map(timed, events))
+    if drain:
+        drain()
+    elapsed = time.perf_counter() - start
+    print_latency_row(label, latencies, f"events/s={len(events) / elapsed:,.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--users", type=int, default=200)
+    parser.add_argument("--hot-videos", type=int, default=3, help="Videos that receive --hot-share of the events")
+    parser.add_argument("--hot-share", type=float, default=0.8)
+    args = parser.parse_args()
+
+    events = sample_events(args.events, args.users, args.hot_videos, args.hot_share)
+    if not events:
+        print("Not enough users or embedded videos; run scripts/seed_data.py first.")
+        return
+
+    print(f"{args.events} watches from {len({u for u, _ in events})} users, {args.hot_share:.0%} on "
+          f"{args.hot_videos} videos, {args.threads} threads\n")
+    state = snapshot(events)
+    try:
+        run("per-watch transactions", record_per_watch, events, args.threads)
+        watch_event_writer.start()
+        run("write-behind", record_write_behind, events, args.threads, drain=watch_event_writer.stop)
+    finally:
+        restore(state, events)
+
+
+if __name__ == "__main__":
+    main()
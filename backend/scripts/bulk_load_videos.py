@@ -0,0 +1,223 @@
+"""
+Stream a video catalog from JSONL or CSV into the database and FAISS index
+
+Records are read in chunks. Each chunk is deduplicated against existing
+video_ids with one query, encoded with generate_embeddings_batch, inserted
+with a single multi-row INSERT and its vectors are added to the index in
+large blocks.
+
+Progress is checkpointed next to the input file, so an interrupted run
+can be restarted with --resume. Records whose videos already exist are
+re-added to the index from their stored embeddings, so rows an interrupted
+run committed but never saved in the index (even after its last
+checkpoint) are not lost.
+
+Input fields: video_id, title, description, tags, category, duration,
+thumbnail_url, views, likes. In CSV, tags are a JSON list or "|"-separated.
+
+Usage:
+    python scripts/bulk_load_videos.py catalog.jsonl --chunk-size 5000 --batch-size 128
+    python scripts/bulk_load_videos.py catalog.csv --resume
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+from itertools import islice
+from typing import Dict, Iterator, List, Tuple
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from sqlalchemy import insert
+from sqlalchemy.orm import Session
+from app.core.database import SessionLocal
+from app.models.video import Video
+from app.ml.embeddings import embedding_service
+from app.ml.faiss_index import faiss_index
+
+VIDEO_FIELDS = ("video_id", "title", "description", "tags", "category",
+                "duration", "thumbnail_url", "views", "likes")
+INT_FIELDS = ("duration", "views", "likes")
+
+
+def _parse_csv_row(row: Dict[str, str]) -> dict:
+    record = {key: value for key, value in row.items() if value not in (None, "")}
+    tags = record.get("tags")
+    if tags:
+        record["tags"] = json.loads(tags) if tags.startswith("[") else [t.strip() for t in tags.split("|") if t.strip()]
+    for field in INT_FIELDS:
+        if field in record:
+            record[field] = int(float(record[field]))
+    return record
+
+
+def iter_records(path: str) -> Iterator[dict]:
+    """Stream records from a .jsonl or .csv file"""
+    if path.endswith(".csv"):
+        with open(path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                yield _parse_csv_row(row)
+    else:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+
+def insert_new_videos(db: Session, records: List[dict],
+                      batch_size: int = 32) -> Tuple[List[int], np.ndarray, List[str]]:
+    """
+    Insert the videos of a chunk that don't exist yet, with their embeddings
+
+    Args:
+        db: Database session (committed by this function)
+        records: Video dicts; duplicates of existing or earlier video_ids are skipped
+        batch_size: Texts per model forward pass
+
+    Returns:
+        (database IDs of inserted videos, their embeddings, video_ids of the
+        records skipped because they already exist)
+    """
+    existing = {
+        row[0] for row in db.query(Video.video_id).filter(
+            Video.video_id.in_({record["video_id"] for record in records})
+        ).all()
+    }
+
+    rows, seen = [], set(existing)
+    for record in records:
+        if record["video_id"] in seen:
+            continue
+        seen.add(record["video_id"])
+        rows.append({field: record[field] for field in VIDEO_FIELDS if record.get(field) is not None})
+
+    if not rows:
+        return [], np.empty((0, embedding_service.dimension), dtype="float32"), sorted(existing)
+
+    embeddings = embedding_service.generate_embeddings_batch(rows, batch_size=batch_size)
+    for row, embedding in zip(rows, embeddings):
+        row["embedding"] = embedding
+
+    result = db.execute(insert(Video).returning(Video.id, sort_by_parameter_order=True), rows)
+    ids = [row[0] for row in result]
+    db.commit()
+    return ids, embeddings, sorted(existing)
+
+
+def stored_embeddings(db: Session, video_ids: List[str]) -> Tuple[List[int], np.ndarray]:
+    """IDs and stored embeddings of existing videos, for re-adding them to the index"""
+    rows = db.query(Video.id, Video.embedding).filter(
+        Video.video_id.in_(video_ids),
+        Video.embedding.isnot(None)
+    ).all()
+    if not rows:
+        return [], np.empty((0, embedding_service.dimension), dtype="float32")
+    return [row[0] for row in rows], np.vstack([row[1] for row in rows])
+
+
+class Checkpoint:
+    """Record counts that are committed to the database / saved in the index"""
+
+    def __init__(self, source: str):
+        self.path = source + ".checkpoint.json"
+        self.committed_through = 0
+        self.indexed_through = 0
+
+    def load(self):
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                state = json.load(f)
+            self.committed_through = state["committed_through"]
+            self.indexed_through = state["indexed_through"]
+
+    def save(self):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"committed_through": self.committed_through, "indexed_through": self.indexed_through}, f)
+        os.replace(tmp_path, self.path)
+
+    def remove(self):
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="Catalog file (.jsonl or .csv)")
+    parser.add_argument("--chunk-size", type=int, default=5000, help="Records per database round-trip")
+    parser.add_argument("--batch-size", type=int, default=128, help="Texts per model forward pass")
+    parser.add_argument("--index-block-size", type=int, default=50000,
+                        help="Vectors buffered before adding them to the index and saving it")
+    parser.add_argument("--resume", action="store_true", help="Continue from the last checkpoint")
+    args = parser.parse_args()
+
+    checkpoint = Checkpoint(args.path)
+    if args.resume:
+        checkpoint.load()
+        print(f"Resuming after {checkpoint.indexed_through} records "
+              f"({checkpoint.committed_through - checkpoint.indexed_through} to re-index)")
+    else:
+        checkpoint.remove()
+
+    records = iter_records(args.path)
+    position = checkpoint.indexed_through
+    for _ in islice(records, position):
+        pass
+
+    db = SessionLocal()
+    pending_ids, pending_vectors = [], []
+    inserted = skipped = 0
+    start = time.perf_counter()
+
+    def flush_index():
+        if pending_ids:
+            faiss_index.upsert_vectors(np.vstack(pending_vectors), pending_ids)
+            pending_ids.clear()
+            pending_vectors.clear()
+        faiss_index.save()
+        checkpoint.indexed_through = position
+        checkpoint.save()
+
+    try:
+        while True:
+            chunk = list(islice(records, args.chunk_size))
+            if not chunk:
+                break
+
+            ids, vectors, existing = insert_new_videos(db, chunk, batch_size=args.batch_size)
+            pending_ids.extend(ids)
+            pending_vectors.append(vectors)
+            if existing:
+                # Possibly committed by an interrupted run after its last index save (or checkpoint)
+                stored_ids, stored_vectors = stored_embeddings(db, existing)
+                pending_ids.extend(stored_ids)
+                pending_vectors.append(stored_vectors)
+            inserted += len(ids)
+            skipped += len(chunk) - len(ids)
+            db.expunge_all()
+
+            position += len(chunk)
+            checkpoint.committed_through = max(checkpoint.committed_through, position)
+            checkpoint.save()
+
+            if len(pending_ids) >= args.index_block_size:
+                flush_index()
+
+            elapsed = time.perf_counter() - start
+            print(f"{position} records read, {inserted} inserted, {skipped} skipped "
+                  f"({(inserted + skipped) / elapsed:.0f} rows/s)")
+
+        flush_index()
+    finally:
+        db.close()
+
+    checkpoint.remove()
+    elapsed = time.perf_counter() - start
+    print(f"Done: {inserted} inserted, {skipped} skipped in {elapsed:.1f}s "
+          f"({(inserted + skipped) / max(elapsed, 1e-9):.0f} rows/s), index has {faiss_index.get_total_vectors()} vectors")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Materialize recommendations for every user into Redis
+
+Walks the users table in chunks, scores each chunk with one batched FAISS
+search and writes the lists with pipelined SETEX. The API serves these
+precomputed lists and only computes online for users that are missing or
+whose cache version was bumped by a new watch.
+
+Usage:
+    python scripts/precompute_recommendations.py --chunk-size 500
+    python scripts/precompute_recommendations.py --only-missing
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.core.redis_client import (
+    redis_client, set_cache_many, get_user_cache_versions, precomputed_recommendations_key
+)
+from app.models.user import User
+from app.ml.recommender import recommendation_service
+
+
+def iter_user_id_chunks(db, chunk_size: int):
+    """Yield lists of active user IDs using keyset pagination on users.id"""
+    last_id = 0
+    while True:
+        rows = db.query(User.id).filter(
+            User.id > last_id,
+            User.is_active.isnot(False)
+        ).order_by(User.id).limit(chunk_size).all()
+        if not rows:
+            return
+        user_ids = [row[0] for row in rows]
+        last_id = user_ids[-1]
+        yield user_ids
+
+
+def filter_missing(user_ids, versions):
+    """Drop users that already have a precomputed entry for their current version"""
+    pipe = redis_client.pipeline(transaction=False)
+    for user_id in user_ids:
+        pipe.exists(precomputed_recommendations_key(user_id, versions[user_id]))
+    return [user_id for user_id, exists in zip(user_ids, pipe.execute()) if not exists]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunk-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=settings.PRECOMPUTED_RECOMMENDATION_LIMIT)
+    parser.add_argument("--ttl", type=int, default=settings.PRECOMPUTED_CACHE_TTL)
+    parser.add_argument("--include-watched", action="store_true",
+                        help="Precompute lists that keep already-watched videos")
+    parser.add_argument("--only-missing", action="store_true",
+                        help="Skip users that already have a precomputed entry")
+    args = parser.parse_args()
+
+    exclude_watched = not args.include_watched
+    db = SessionLocal()
+    start = time.perf_counter()
+    processed = 0
+
+    try:
+        for user_ids in iter_user_id_chunks(db, args.chunk_size):
+            # Read versions before computing: a watch during the run bumps the
+            # version, so the stale list is written under a key nobody reads
+            versions = get_user_cache_versions(user_ids)
+            if args.only_missing:
+                user_ids = filter_missing(user_ids, versions)
+                if not user_ids:
+                    continue
+
+            responses = recommendation_service.get_recommendations_batch(
+                db, user_ids, limit=args.limit, exclude_watched=exclude_watched
+            )
+            set_cache_many({
+                precomputed_recommendations_key(response.user_id, versions[response.user_id]): {
+                    **response.model_dump(),
+                    "limit": args.limit,
+                    "exclude_watched": exclude_watched,
+                }
+                for response in responses
+            }, ttl=args.ttl)
+
+            # Keep the identity map from growing across chunks
+            db.expunge_all()
+
+            processed += len(user_ids)
+            elapsed = time.perf_counter() - start
+            print(f"Precomputed {processed} users ({processed / elapsed:.0f} users/s)")
+    finally:
+        db.close()
+
+    print(f"Done: {processed} users in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
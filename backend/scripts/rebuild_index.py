@@ -0,0 +1,88 @@
+"""
+Rebuild the FAISS index from the embeddings stored in the videos table
+
+Builds a fresh index in this process while the API workers keep serving
+theirs, then publishes it as a new snapshot. Changes workers saved while it
+was building are replayed onto it first, and each worker's watcher swaps it
+in within FAISS_RELOAD_INTERVAL seconds, replaying any vectors it ingested
+but had not saved yet; nothing needs restarting. Run it after changing
+FAISS_INDEX_TYPE or the IVF/PQ settings, or to retrain an IVF index on the
+current catalog. With FAISS_SHARDS > 0 it rebuilds every shard index, and
+the running shard processes swap theirs in the same way.
+
+Usage:
+    python scripts/rebuild_index.py
+    python scripts/rebuild_index.py --type HNSW
+    python scripts/rebuild_index.py --shards 4
+"""
+import argparse
+import os
+import sys
+import time
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import numpy as np
+from app.core.config import settings
+from app.core.database import SessionLocal
+from app.models.video import Video
+from app.ml.faiss_index import FAISSIndex
+from app.ml.faiss_shards import shard_index_path
+
+
+def stored_embeddings(db, chunk_size: int, n_shards: int = 1, shard_id: int = 0):
+    """(video_ids, vectors) of every embedded video with id % n_shards == shard_id, read in id order"""
+    ids, vectors, last_id = [], [], 0
+    while True:
+        query = db.query(Video.id, Video.embedding).filter(Video.id > last_id, Video.embedding.isnot(None))
+        if n_shards > 1:
+            query = query.filter(Video.id % n_shards == shard_id)
+        rows = query.order_by(Video.id).limit(chunk_size).all()
+        if not rows:
+            break
+        ids.extend(row[0] for row in rows)
+        vectors.extend(row[1] for row in rows)
+        last_id = rows[-1][0]
+    return ids, np.vstack(vectors) if vectors else np.empty((0, settings.EMBEDDING_DIMENSION), dtype="float32")
+
+
+def rebuild(index_path: str, index_type: str, chunk_size: int, n_shards: int = 1, shard_id: int = 0) -> FAISSIndex:
+    """Build an index from the stored embeddings and publish it as the next snapshot at index_path"""
+    start = time.perf_counter()
+    index = FAISSIndex(settings.EMBEDDING_DIMENSION, index_type, index_path, mmap=False)
+    # Workers keep saving while this runs; what they save after this version is replayed on publish
+    manifest = index.read_manifest()
+    db = SessionLocal()
+    try:
+        ids, vectors = stored_embeddings(db, chunk_size, n_shards, shard_id)
+    finally:
+        db.close()
+
+    index.build(vectors, ids, built_on=manifest["version"] if manifest else 0)
+    index.save()
+    print(f"Published {index_path} snapshot {index.version}: {len(ids)} vectors ({index.index_type}) "
+          f"in {time.perf_counter() - start:.1f}s")
+    return index
+
+
+def rebuild_shards(n_shards: int, index_type: str, chunk_size: int):
+    """Rebuild each shard's index from its partition of the stored embeddings"""
+    for shard_id in range(n_shards):
+        rebuild(shard_index_path(shard_id), index_type, chunk_size, n_shards, shard_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--type", default=settings.FAISS_INDEX_TYPE, help="Index type to build")
+    parser.add_argument("--shards", type=int, default=settings.FAISS_SHARDS,
+                        help="Rebuild this many shard indexes instead of the single index")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    if args.shards > 0:
+        rebuild_shards(args.shards, args.type, args.chunk_size)
+    else:
+        rebuild(settings.FAISS_INDEX_PATH, args.type, args.chunk_size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""
+Run the FAISS shard processes used when FAISS_SHARDS > 0
+
+Starts one process per shard, each serving the videos with
+video_id % shards == shard from its own index file (FAISS_INDEX_PATH with a
+_shard<N> suffix) on a Unix socket in FAISS_SHARD_SOCKET_DIR. The API
+workers connect to them through ShardedFAISSIndex. Stop with Ctrl+C or
+SIGTERM; each shard saves its index on the way out. Running shards pick up
+indexes republished by scripts/rebuild_index.py without a restart.
+
+--rebuild first builds every shard index from the embeddings stored in the
+videos table; run it when sharding an existing catalog or after changing
+the number of shards, since that moves videos between shards.
+
+Usage:
+    python scripts/run_faiss_shards.py --shards 4 --rebuild
+    FAISS_SHARDS=4 uvicorn app.main:app --workers 4
+"""
+import argparse
+import multiprocessing
+import os
+import signal
+import sys
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.core.config import settings
+from app.ml.faiss_shards import FAISSShard
+from scripts.rebuild_index import rebuild_shards
+
+
+def serve(shard_id: int):
+    FAISSShard(shard_id).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--shards", type=int, default=settings.FAISS_SHARDS or 2)
+    parser.add_argument("--rebuild", action="store_true", help="Build the shard indexes from the videos table first")
+    parser.add_argument("--chunk-size", type=int, default=10000)
+    args = parser.parse_args()
+
+    if settings.secret_key_is_placeholder:
+        parser.error("set SECRET_KEY to a private value first: shard connections are authenticated with it")
+    if args.shards != settings.FAISS_SHARDS:
+        print(f"Note: FAISS_SHARDS is {settings.FAISS_SHARDS}; API workers must use {args.shards} to reach these shards")
+    if args.rebuild:
+        rebuild_shards(args.shards, settings.FAISS_INDEX_TYPE, args.chunk_size)
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(shard_id,), name=f"faiss-shard-{shard_id}")
+        for shard_id in range(args.shards)
+    ]
+    for process in processes:
+        process.start()
+
+    def stop(signum, frame):
+        for process in processes:
+            if process.is_alive():
+                process.terminate()
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
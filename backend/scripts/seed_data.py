@@ -8,8 +8,8 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 from sqlalchemy.orm import Session
 from app.core.database import SessionLocal, engine, Base
 from app.models.user import User
-from app.models.video import Video
-from app.ml.recommender import recommendation_service
+from app.ml.faiss_index import faiss_index
+from scripts.bulk_load_videos import insert_new_videos
 from passlib.context import CryptContext
 import random
 import bcrypt
@@ -249,46 +249,22 @@ def seed_users(db: Session):
 def seed_videos(db: Session):
     """Seed videos into the database and generate embeddings"""
     print("Seeding videos...")
-    videos_created = 0
     
+    records = []
     for video_data in SAMPLE_VIDEOS:
-        existing_video = db.query(Video).filter(Video.video_id == video_data["video_id"]).first()
-        if existing_video:
-            print(f"Video {video_data['video_id']} already exists, skipping...")
-            continue
-        
         # Add random views and likes
-        video_data["views"] = random.randint(100, 10000)
-        video_data["likes"] = random.randint(10, video_data["views"] // 10)
-        
-        video = Video(**video_data)
-        db.add(video)
-        db.flush()  # Flush to get the video ID
-        
-        # Generate embedding
-        from app.ml.embeddings import embedding_service
-        embedding = embedding_service.generate_video_embedding(
-            title=video.title,
-            description=video.description,
-            tags=video.tags,
-            category=video.category
-        )
-        video.embedding = embedding.tolist()
-        
-        # Add to FAISS index
-        from app.ml.faiss_index import faiss_index
-        faiss_index.add_vectors(embedding.reshape(1, -1), [video.id])
-        
-        videos_created += 1
-        print(f"Created video: {video_data['title']}")
+        views = random.randint(100, 10000)
+        records.append({**video_data, "views": views, "likes": random.randint(10, views // 10)})
     
-    db.commit()
+    # Dedup, batch-encode and insert in one pass
+    video_ids, embeddings, existing = insert_new_videos(db, records)
+    print(f"Skipped {len(existing)} existing videos")
     
-    # Save FAISS index
-    from app.ml.faiss_index import faiss_index
+    # Add to FAISS index and save
+    faiss_index.add_vectors(embeddings, video_ids)
     faiss_index.save()
     
-    print(f"Videos seeded successfully! Created {videos_created} videos.")
+    print(f"Videos seeded successfully! Created {len(video_ids)} videos.")
 
 
 def main():
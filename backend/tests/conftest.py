@@ -0,0 +1,33 @@
+import uuid
+
+import pytest
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+from sqlalchemy.orm import sessionmaker
+
+import app.models  # noqa: F401  (registers every table on Base.metadata)
+from app.core.config import settings
+from app.core.database import Base
+
+
+@pytest.fixture
+def db_session_factory():
+    """Session factory bound to a throwaway schema in DATABASE_URL holding the app's tables"""
+    schema = f"test_{uuid.uuid4().hex[:12]}"
+    admin = create_engine(settings.DATABASE_URL)
+    try:
+        with admin.begin() as conn:
+            conn.execute(text(f"CREATE SCHEMA {schema}"))
+    except OperationalError as e:
+        admin.dispose()
+        pytest.skip(f"no database at DATABASE_URL: {e}")
+
+    engine = create_engine(settings.DATABASE_URL, connect_args={"options": f"-csearch_path={schema}"})
+    try:
+        Base.metadata.create_all(engine)
+        yield sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    finally:
+        engine.dispose()
+        with admin.begin() as conn:
+            conn.execute(text(f"DROP SCHEMA {schema} CASCADE"))
+        admin.dispose()
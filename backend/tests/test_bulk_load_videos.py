@@ -0,0 +1,75 @@
+import json
+import sys
+
+import faiss
+import numpy as np
+import pytest
+
+from app.ml.embeddings import embedding_service
+from app.ml.faiss_index import FAISSIndex
+from app.models.video import Video
+from scripts import bulk_load_videos
+
+N_RECORDS = 25
+CHUNK_SIZE = 10
+
+
+def fake_embeddings(videos, batch_size=32):
+    vectors = np.stack([
+        np.random.default_rng(int(video["video_id"].split("-")[1])).standard_normal(embedding_service.dimension)
+        for video in videos
+    ]).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+@pytest.fixture
+def loader(db_session_factory, tmp_path, monkeypatch):
+    """(catalog path, FAISS index the loader writes to, run(*flags))"""
+    catalog = tmp_path / "catalog.jsonl"
+    catalog.write_text("".join(
+        json.dumps({"video_id": f"vid-{i}", "title": f"Video {i}", "category": "Test"}) + "\n"
+        for i in range(N_RECORDS)
+    ))
+    index = FAISSIndex(embedding_service.dimension, "FLAT", str(tmp_path / "faiss_index.bin"), mmap=False)
+    monkeypatch.setattr(bulk_load_videos, "SessionLocal", db_session_factory)
+    monkeypatch.setattr(bulk_load_videos, "faiss_index", index)
+    monkeypatch.setattr(embedding_service, "generate_embeddings_batch", fake_embeddings)
+
+    def run(*flags):
+        monkeypatch.setattr(sys, "argv", ["bulk_load_videos.py", str(catalog), "--chunk-size", str(CHUNK_SIZE), *flags])
+        bulk_load_videos.main()
+
+    return catalog, index, run
+
+
+def test_resume_indexes_rows_committed_just_before_a_crash(loader, db_session_factory, monkeypatch):
+    catalog, index, run = loader
+    save = bulk_load_videos.Checkpoint.save
+
+    def crash(checkpoint):
+        raise RuntimeError("killed between the chunk's commit and its checkpoint")
+    # The first chunk is committed, then the process dies before recording it
+    monkeypatch.setattr(bulk_load_videos.Checkpoint, "save", crash)
+    with pytest.raises(RuntimeError):
+        run()
+    monkeypatch.setattr(bulk_load_videos.Checkpoint, "save", save)
+
+    db = db_session_factory()
+    try:
+        assert db.query(Video).count() == CHUNK_SIZE
+    finally:
+        db.close()
+
+    run("--resume")
+
+    db = db_session_factory()
+    try:
+        video_ids = {row[0] for row in db.query(Video.id).all()}
+    finally:
+        db.close()
+    assert len(video_ids) == N_RECORDS
+    assert index.get_total_vectors() == N_RECORDS
+    stored = {video_id for hits in index.search_batch(fake_embeddings(
+        [{"video_id": f"vid-{i}"} for i in range(N_RECORDS)]), k=1) for video_id, _ in hits}
+    assert stored == video_ids
@@ -0,0 +1,71 @@
+import sqlite3
+
+import numpy as np
+
+from app.ml.embedding_cache import EmbeddingCache
+
+DIMENSION = 8
+
+
+def vectors(n, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype("float32")
+
+
+def stored_rows(path):
+    conn = sqlite3.connect(path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_disk_tier_keeps_the_newest_rows_up_to_the_cap(tmp_path):
+    path = str(tmp_path / "cache.db")
+    cache = EmbeddingCache("model-a", DIMENSION, max_entries=1, path=path, max_rows=10)
+    keys = [cache.key(f"text {i}") for i in range(25)]
+    for start in range(0, 25, 5):
+        cache.put_many(dict(zip(keys[start:start + 5], vectors(5, seed=start))))
+
+    assert stored_rows(path) == 10
+    reopened = EmbeddingCache("model-a", DIMENSION, max_entries=100, path=path, max_rows=10)
+    assert set(reopened.get_many(keys)) == set(keys[15:])
+
+
+def test_file_is_opened_on_first_use(tmp_path):
+    path = tmp_path / "cache.db"
+    cache = EmbeddingCache("model-a", DIMENSION, path=str(path))
+
+    assert not path.exists()
+    cache.get_many([cache.key("text")])
+    assert path.exists()
+
+
+def test_prune_drops_other_models_rows_once(tmp_path):
+    path = str(tmp_path / "cache.db")
+    old = EmbeddingCache("model-a", DIMENSION, path=path)
+    old.put_many({old.key(f"text {i}"): vector for i, vector in enumerate(vectors(5))})
+
+    new = EmbeddingCache("model-b", DIMENSION, path=path)
+    new.put_many({new.key("text 0"): vectors(1)[0]})
+    assert stored_rows(path) == 6
+
+    assert new.prune_other_models() == 5
+    assert stored_rows(path) == 1
+    assert set(new.get_many([new.key("text 0")])) == {new.key("text 0")}
+    # Later processes with the same model skip the scan
+    assert EmbeddingCache("model-b", DIMENSION, path=path).prune_other_models() == 0
+
+
+def test_prune_drops_rows_from_before_the_model_column(tmp_path):
+    path = str(tmp_path / "cache.db")
+    conn = sqlite3.connect(path)
+    conn.execute("CREATE TABLE embeddings (key TEXT PRIMARY KEY, vector BLOB NOT NULL)")
+    conn.execute("INSERT INTO embeddings VALUES (?, ?)", ("legacy", vectors(1)[0].tobytes()))
+    conn.commit()
+    conn.close()
+
+    cache = EmbeddingCache("model-a", DIMENSION, path=path)
+    cache.put_many({cache.key("text"): vectors(1)[0]})
+
+    assert cache.prune_other_models() == 1
+    assert stored_rows(path) == 1
@@ -0,0 +1,265 @@
+import os
+import pickle
+
+import faiss
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.ml.faiss_index import INDEX_TYPES, FAISSIndex
+
+DIMENSION = 32
+N_VECTORS = 2000
+
+
+def random_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+@pytest.fixture(autouse=True)
+def small_pq(monkeypatch):
+    # FAISS_PQ_M must divide the dimension
+    monkeypatch.setattr(settings, "FAISS_PQ_M", 8)
+
+
+@pytest.fixture(params=[(index_type, mmap) for index_type in INDEX_TYPES for mmap in (False, True)],
+                ids=lambda param: f"{param[0]}-{'mmap' if param[1] else 'memory'}")
+def built_index(request, tmp_path):
+    """(index over N_VECTORS vectors with IDs 0..N-1, those vectors), optionally reopened memory-mapped"""
+    index_type, mmap = request.param
+    index_path = str(tmp_path / "faiss_index.bin")
+    vectors = random_vectors(N_VECTORS)
+    index = FAISSIndex(DIMENSION, index_type, index_path, mmap=False)
+    index.build(vectors, list(range(N_VECTORS)))
+    if mmap:
+        index.save()
+        index = FAISSIndex(DIMENSION, index_type, index_path, mmap=True)
+        index.warm_up()
+        assert index.read_only
+    return index, vectors
+
+
+def returned_ids(index, queries, k=20):
+    return [[video_id for video_id, _ in hits] for hits in index.search_batch(queries, k=k)]
+
+
+def test_upserted_id_is_returned_once_with_its_new_vector(built_index):
+    index, vectors = built_index
+    new_vector = random_vectors(1, seed=1)[0]
+
+    index.upsert_vector(5, new_vector)
+
+    assert index.get_total_vectors() == N_VECTORS
+    by_new, by_old = returned_ids(index, np.vstack([new_vector, vectors[5]]))
+    assert by_new[0] == 5
+    assert by_new.count(5) == 1
+    assert 5 not in by_old
+
+
+def test_upserting_many_replaces_each_vector(built_index):
+    index, vectors = built_index
+    new_vectors = random_vectors(10, seed=2)
+
+    index.upsert_vectors(new_vectors, list(range(10)))
+
+    assert index.get_total_vectors() == N_VECTORS
+    for video_id, hits in enumerate(returned_ids(index, new_vectors)):
+        assert hits[0] == video_id
+        assert hits.count(video_id) == 1
+    for video_id, hits in enumerate(returned_ids(index, vectors[:10])):
+        assert video_id not in hits
+
+
+def test_removed_id_is_never_returned(built_index):
+    index, vectors = built_index
+
+    assert index.remove_vectors([3, 4, 99999]) == 2
+
+    assert index.get_total_vectors() == N_VECTORS - 2
+    for hits in returned_ids(index, vectors[:10], k=N_VECTORS):
+        assert 3 not in hits and 4 not in hits
+    assert index.remove_vector(3) is False
+
+
+def test_removed_then_upserted_id_is_returned_again(built_index):
+    index, vectors = built_index
+
+    index.remove_vector(8)
+    index.upsert_vector(8, vectors[8])
+
+    hits = returned_ids(index, vectors[8:9])[0]
+    assert hits[0] == 8 and hits.count(8) == 1
+
+
+def test_duplicate_id_in_one_batch_keeps_the_last_vector(built_index):
+    index, vectors = built_index
+    first, last = random_vectors(2, seed=3)
+
+    index.upsert_vectors(np.vstack([first, last]), [7, 7])
+
+    assert index.get_total_vectors() == N_VECTORS
+    by_last, by_first = returned_ids(index, np.vstack([last, first]))
+    assert by_last[0] == 7 and by_last.count(7) == 1
+    assert 7 not in by_first
+
+
+def test_changes_survive_save_and_reload(built_index, tmp_path):
+    index, vectors = built_index
+    new_vector = random_vectors(1, seed=4)[0]
+    index.upsert_vector(1, new_vector)
+    index.remove_vector(2)
+    index.save()
+
+    reloaded = FAISSIndex(DIMENSION, index.index_type, index.index_path, mmap=index.mmap)
+
+    by_new, by_old_1, by_old_2 = returned_ids(reloaded, np.vstack([new_vector, vectors[1], vectors[2]]))
+    assert by_new[0] == 1
+    assert 1 not in by_old_1
+    assert 2 not in by_old_2
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_migrates_legacy_pickled_video_ids(tmp_path, mmap):
+    index_path = str(tmp_path / "faiss_index.bin")
+    vectors = random_vectors(50)
+    video_ids = list(range(1000, 1050))
+    # Layout written before ID-mapped indexes: a positional index and a pickled position -> video_id list
+    legacy = faiss.IndexFlatIP(DIMENSION)
+    legacy.add(vectors)
+    faiss.write_index(legacy, index_path)
+    with open(index_path.replace(".bin", "_video_ids.pkl"), "wb") as f:
+        pickle.dump(video_ids, f)
+
+    index = FAISSIndex(DIMENSION, "FLAT", index_path, mmap=mmap)
+
+    assert index.get_total_vectors() == 50
+    assert index.search(vectors[7], k=1)[0][0] == 1007
+    assert index.dirty
+    index.save()
+    reloaded = FAISSIndex(DIMENSION, "FLAT", index_path, mmap=mmap)
+    assert reloaded.search(vectors[7], k=1)[0][0] == 1007
+    assert not os.path.exists(index_path.replace(".bin", "_video_ids.pkl"))
+
+
+@pytest.mark.parametrize("index_type", ["FLAT", "HNSW", "IVF_FLAT"])
+def test_rebuild_keeps_changes_saved_while_it_was_building(tmp_path, index_type):
+    index_path = str(tmp_path / "faiss_index.bin")
+    vectors = random_vectors(N_VECTORS)
+    worker = FAISSIndex(DIMENSION, index_type, index_path, mmap=False)
+    worker.build(vectors, list(range(N_VECTORS)))
+    worker.save()
+
+    # The rebuild notes the published version, then reads the catalog as it was
+    rebuilder = FAISSIndex(DIMENSION, index_type, index_path, mmap=False)
+    built_on = rebuilder.read_manifest()["version"]
+    catalog = vectors.copy()
+
+    # Meanwhile the worker ingests a video, re-embeds one, removes one and checkpoints
+    new_vector, reembedded = random_vectors(2, seed=5)
+    worker.upsert_vector(N_VECTORS + 1, new_vector)
+    worker.upsert_vector(6, reembedded)
+    worker.remove_vector(9)
+    worker.save()
+    unsaved = random_vectors(1, seed=6)[0]
+    worker.upsert_vector(N_VECTORS + 2, unsaved)
+
+    rebuilder.build(catalog, list(range(N_VECTORS)), built_on=built_on)
+    rebuilder.save()
+    assert worker.reload()
+
+    for index in (rebuilder, FAISSIndex(DIMENSION, index_type, index_path, mmap=False), worker):
+        by_new, by_reembedded, by_old_6, by_removed = returned_ids(
+            index, np.vstack([new_vector, reembedded, vectors[6], vectors[9]])
+        )
+        assert by_new[0] == N_VECTORS + 1
+        assert by_reembedded[0] == 6
+        assert 6 not in by_old_6
+        assert 9 not in by_removed
+    assert returned_ids(worker, unsaved.reshape(1, -1))[0][0] == N_VECTORS + 2
+
+
+@pytest.mark.parametrize("mmap", [False, True])
+def test_hnsw_updates_leave_tombstones_until_compaction(tmp_path, mmap):
+    index_path = str(tmp_path / "faiss_index.bin")
+    vectors = random_vectors(N_VECTORS)
+    index = FAISSIndex(DIMENSION, "HNSW", index_path, mmap=False)
+    index.build(vectors, list(range(N_VECTORS)))
+    graph = index.index
+    new_vector = random_vectors(1, seed=7)[0]
+
+    index.upsert_vector(5, new_vector)
+    index.remove_vector(6)
+
+    # Updated in place rather than rebuilt
+    assert index.index is graph
+    assert index.tombstones == 2
+    assert index.get_total_vectors() == N_VECTORS - 1
+    index.save()
+    reloaded = FAISSIndex(DIMENSION, "HNSW", index_path, mmap=mmap)
+    for searched in (index, reloaded):
+        by_new, by_old_5, by_old_6 = returned_ids(searched, np.vstack([new_vector, vectors[5], vectors[6]]))
+        assert by_new[0] == 5 and by_new.count(5) == 1
+        assert 5 not in by_old_5 and 6 not in by_old_6
+        assert all(video_id >= 0 for hits in returned_ids(searched, vectors[:20], k=50) for video_id in hits)
+        excluded = searched.search_batch(vectors[5:7], k=10, exclude_ids=[7])
+        assert all(video_id >= 0 and video_id not in (6, 7) for hits in excluded for video_id, _ in hits)
+    assert reloaded.tombstones == 2
+    assert reloaded.get_total_vectors() == N_VECTORS - 1
+
+    assert reloaded.compact()
+    assert reloaded.tombstones == 0
+    assert reloaded.index.ntotal == N_VECTORS - 1
+    by_new, by_old_6 = returned_ids(reloaded, np.vstack([new_vector, vectors[6]]))
+    assert by_new[0] == 5 and 6 not in by_old_6
+
+
+def test_hnsw_compaction_keeps_writes_made_during_the_build(tmp_path, monkeypatch):
+    index = FAISSIndex(DIMENSION, "HNSW", str(tmp_path / "faiss_index.bin"), mmap=False)
+    vectors = random_vectors(N_VECTORS)
+    index.build(vectors, list(range(N_VECTORS)))
+    index.remove_vectors(list(range(10)))
+    late_vector = random_vectors(1, seed=8)[0]
+
+    new_index = index._new_index
+    def new_index_with_concurrent_writes(n_train=0):
+        # Runs while compact() builds the new graph outside the write lock
+        index.upsert_vector(N_VECTORS + 1, late_vector)
+        index.remove_vector(20)
+        return new_index(n_train)
+    monkeypatch.setattr(index, "_new_index", new_index_with_concurrent_writes)
+
+    assert index.compact()
+
+    assert index.get_total_vectors() == N_VECTORS - 10
+    by_late, by_removed = returned_ids(index, np.vstack([late_vector, vectors[20]]))
+    assert by_late[0] == N_VECTORS + 1
+    assert 20 not in by_removed
+
+
+@pytest.mark.parametrize("index_type", ["IVF_FLAT", "IVF_PQ"])
+def test_ivf_filled_incrementally_is_trained_once_it_has_enough_vectors(tmp_path, monkeypatch, index_type):
+    monkeypatch.setattr(settings, "FAISS_NLIST", 8)
+    index_path = str(tmp_path / "faiss_index.bin")
+    index = FAISSIndex(DIMENSION, index_type, index_path, mmap=False)
+    vectors = random_vectors(N_VECTORS)
+
+    # A first small batch is stored exactly rather than training a one-list index
+    index.upsert_vectors(vectors[:5], list(range(5)))
+    index.save()
+    assert not isinstance(index.index, faiss.IndexIVF)
+    assert [hits[0] for hits in returned_ids(index, vectors[:5])] == list(range(5))
+
+    for start in range(5, N_VECTORS, 64):
+        index.upsert_vectors(vectors[start:start + 64], list(range(start, min(start + 64, N_VECTORS))))
+    assert not isinstance(index.index, faiss.IndexIVF)
+    index.save()
+
+    assert isinstance(index.index, faiss.IndexIVF)
+    assert index.index.nlist == 8
+    assert index.get_total_vectors() == N_VECTORS
+    reloaded = FAISSIndex(DIMENSION, index_type, index_path, mmap=False)
+    assert isinstance(reloaded.index, faiss.IndexIVF)
+    hits = returned_ids(reloaded, vectors[:50], k=5)
+    assert sum(video_id in ids for video_id, ids in enumerate(hits)) >= 45
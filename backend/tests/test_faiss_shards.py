@@ -0,0 +1,210 @@
+import multiprocessing
+import os
+import stat
+import threading
+import time
+from multiprocessing.connection import Listener
+
+import faiss
+import numpy as np
+import pytest
+
+from app.core.config import settings
+from app.ml.faiss_index import FAISSIndex
+from app.ml.faiss_shards import FAISSShard, ShardError, ShardedFAISSIndex, shard_of
+
+DIMENSION = 32
+N_SHARDS = 3
+N_VECTORS = 600
+SECRET_KEY = "test-shard-secret"
+
+
+def serve(shard_id, index_path, address):
+    FAISSShard(shard_id, index_path=index_path, address=address).serve_forever()
+
+
+def stalled_shard(address, answer_handshake):
+    """Listener that never answers: it stops after the handshake, or doesn't even accept"""
+    listener = Listener(address, family="AF_UNIX", authkey=SECRET_KEY.encode())
+    if answer_handshake:
+        def accept_and_stall():
+            with listener.accept() as conn:
+                conn.recv()
+                time.sleep(30)
+        threading.Thread(target=accept_and_stall, daemon=True).start()
+    return listener
+
+
+def random_vectors(n, seed=0):
+    vectors = np.random.default_rng(seed).standard_normal((n, DIMENSION)).astype("float32")
+    faiss.normalize_L2(vectors)
+    return vectors
+
+
+@pytest.fixture
+def shards(tmp_path, monkeypatch):
+    """(ShardedFAISSIndex over N_SHARDS local shard processes, their processes)"""
+    # Shard processes are spawned and read their settings from the environment
+    monkeypatch.setenv("SECRET_KEY", SECRET_KEY)
+    monkeypatch.setenv("EMBEDDING_DIMENSION", str(DIMENSION))
+    monkeypatch.setenv("FAISS_INDEX_TYPE", "FLAT")
+    monkeypatch.setattr(settings, "SECRET_KEY", SECRET_KEY)
+
+    socket_dir = tmp_path / "shards"
+    addresses = [str(socket_dir / f"shard{shard_id}.sock") for shard_id in range(N_SHARDS)]
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=serve, args=(shard_id, str(tmp_path / f"index_shard{shard_id}.bin"), address),
+                        daemon=True)
+        for shard_id, address in enumerate(addresses)
+    ]
+    for process in processes:
+        process.start()
+
+    index = ShardedFAISSIndex(DIMENSION, N_SHARDS, addresses)
+    deadline = time.monotonic() + 60
+    while True:
+        try:
+            index.warm_up()
+            break
+        except ShardError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.1)
+
+    yield index, processes
+
+    for process in processes:
+        if process.is_alive():
+            process.terminate()
+        process.join(timeout=10)
+
+
+@pytest.fixture
+def catalog(shards, tmp_path):
+    """(sharded index, processes, single FLAT index over the same vectors, vectors)"""
+    index, processes = shards
+    vectors = random_vectors(N_VECTORS)
+    index.build(vectors, list(range(N_VECTORS)))
+    single = FAISSIndex(DIMENSION, "FLAT", str(tmp_path / "single.bin"), mmap=False)
+    single.build(vectors, list(range(N_VECTORS)))
+    return index, processes, single, vectors
+
+
+def shard_sizes(index):
+    return [index._call(shard_id, "get_total_vectors") for shard_id in range(N_SHARDS)]
+
+
+def test_search_matches_a_single_index(catalog):
+    index, _, single, vectors = catalog
+    queries = random_vectors(8, seed=1)
+
+    assert index.get_total_vectors() == N_VECTORS
+    assert shard_sizes(index) == np.bincount(shard_of(np.arange(N_VECTORS), N_SHARDS)).tolist()
+    for sharded_hits, single_hits in zip(index.search_batch(queries, k=10), single.search_batch(queries, k=10)):
+        assert [video_id for video_id, _ in sharded_hits] == [video_id for video_id, _ in single_hits]
+        assert np.allclose([score for _, score in sharded_hits], [score for _, score in single_hits], atol=1e-5)
+
+
+def test_writes_reach_only_the_owning_shard(catalog):
+    index, _, _, vectors = catalog
+    sizes = shard_sizes(index)
+    new_id = N_VECTORS + 1
+    owner = int(shard_of([new_id], N_SHARDS)[0])
+    new_vector = random_vectors(1, seed=2)[0]
+
+    index.upsert_vector(new_id, new_vector)
+
+    expected = list(sizes)
+    expected[owner] += 1
+    assert shard_sizes(index) == expected
+    assert index.search(new_vector, k=1)[0][0] == new_id
+
+    # Replacing an existing vector keeps every shard's size
+    index.upsert_vector(4, new_vector)
+    assert shard_sizes(index) == expected
+    assert 4 not in [video_id for video_id, _ in index.search(vectors[4], k=20)]
+
+    assert index.remove_vectors([new_id, 5]) == 2
+    expected[owner] -= 1
+    expected[int(shard_of([5], N_SHARDS)[0])] -= 1
+    assert shard_sizes(index) == expected
+    assert index.remove_vector(new_id) is False
+
+
+def test_exclude_ids_and_id_filter_reach_every_shard(catalog):
+    index, _, single, vectors = catalog
+    queries = vectors[:4]
+    exclude_ids = list(range(4))
+    allowed = np.zeros(N_VECTORS, dtype=bool)
+    allowed[::7] = True
+    id_filter = np.packbits(allowed, bitorder="little")
+
+    excluded_hits = index.search_batch(queries, k=10, exclude_ids=exclude_ids)
+    filtered_hits = index.search_batch(queries, k=10, exclude_ids=exclude_ids, id_filter=id_filter)
+
+    assert excluded_hits == single.search_batch(queries, k=10, exclude_ids=exclude_ids)
+    for hits in excluded_hits:
+        assert len(hits) == 10 and not {video_id for video_id, _ in hits} & set(exclude_ids)
+    assert [[video_id for video_id, _ in hits] for hits in filtered_hits] == [
+        [video_id for video_id, _ in hits]
+        for hits in single.search_batch(queries, k=10, exclude_ids=exclude_ids, id_filter=id_filter)
+    ]
+    for hits in filtered_hits:
+        assert len(hits) == 10
+        assert all(allowed[video_id] and video_id not in exclude_ids for video_id, _ in hits)
+
+
+def test_search_survives_a_dead_shard_but_writes_fail(catalog):
+    index, processes, _, vectors = catalog
+    dead = 1
+    processes[dead].kill()
+    processes[dead].join(timeout=10)
+
+    for hits in index.search_batch(vectors[:5], k=10):
+        assert len(hits) == 10
+        assert all(video_id % N_SHARDS != dead for video_id, _ in hits)
+
+    owned_by_dead = next(video_id for video_id in range(N_VECTORS) if video_id % N_SHARDS == dead)
+    with pytest.raises(ShardError):
+        index.upsert_vector(owned_by_dead, vectors[0])
+    with pytest.raises(ShardError):
+        index.remove_vectors([owned_by_dead])
+    # Writes to live shards still succeed
+    index.upsert_vector(dead + 1, vectors[0])
+
+
+def test_sockets_are_private_to_the_owner(shards, tmp_path):
+    socket_dir = tmp_path / "shards"
+
+    assert stat.S_IMODE(os.stat(socket_dir).st_mode) == 0o700
+    for shard_id in range(N_SHARDS):
+        assert stat.S_IMODE(os.stat(socket_dir / f"shard{shard_id}.sock").st_mode) == 0o600
+
+
+def test_placeholder_secret_key_is_refused(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "SECRET_KEY", "your-secret-key-change-in-production")
+    address = str(tmp_path / "shards" / "shard0.sock")
+
+    with pytest.raises(ValueError):
+        ShardedFAISSIndex(DIMENSION, 1, [address])
+    with pytest.raises(ValueError):
+        FAISSShard(0, index_path=str(tmp_path / "index_shard0.bin"), address=address).serve_forever()
+    assert not os.path.exists(address)
+
+
+@pytest.mark.parametrize("answer_handshake", [True, False], ids=["stalls-after-handshake", "never-accepts"])
+def test_stalled_shard_times_out(tmp_path, monkeypatch, answer_handshake):
+    monkeypatch.setattr(settings, "SECRET_KEY", SECRET_KEY)
+    monkeypatch.setattr(settings, "FAISS_SHARD_TIMEOUT_SECONDS", 0.5)
+    address = str(tmp_path / "shard0.sock")
+    listener = stalled_shard(address, answer_handshake)
+    index = ShardedFAISSIndex(DIMENSION, 1, [address])
+
+    try:
+        started = time.monotonic()
+        with pytest.raises(ShardError):
+            index.upsert_vector(1, random_vectors(1)[0])
+        assert time.monotonic() - started < 5
+    finally:
+        listener.close()
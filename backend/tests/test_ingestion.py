@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.ml import ingestion
+from app.ml.embeddings import embedding_service
+from app.ml.faiss_index import FAISSIndex
+from app.ml.faiss_shards import ShardError
+from app.ml.ingestion import EmbeddingIngestionWorker
+from app.models.video import Video
+
+N_VIDEOS = 5
+
+
+class FlakyIndex(FAISSIndex):
+    """FLAT index whose writes fail while down is set, like a FAISS shard that is unreachable"""
+
+    down = False
+
+    def upsert_vectors(self, vectors, video_ids):
+        if self.down:
+            raise ShardError("shard 0 unreachable")
+        super().upsert_vectors(vectors, video_ids)
+
+
+@pytest.fixture
+def index(db_session_factory, tmp_path, monkeypatch):
+    db = db_session_factory()
+    try:
+        db.add_all([Video(id=video_id, video_id=f"vid-{video_id}", title=f"Video {video_id}")
+                    for video_id in range(1, N_VIDEOS + 1)])
+        db.commit()
+    finally:
+        db.close()
+    index = FlakyIndex(embedding_service.dimension, "FLAT", str(tmp_path / "faiss_index.bin"), mmap=False)
+    monkeypatch.setattr(ingestion, "SessionLocal", db_session_factory)
+    monkeypatch.setattr(ingestion, "faiss_index", index)
+    monkeypatch.setattr(ingestion.recommendation_service, "encode_videos", lambda videos: np.stack([
+        np.eye(embedding_service.dimension, dtype="float32")[video.id] for video in videos
+    ]))
+    return index
+
+
+def unembedded(db_session_factory):
+    db = db_session_factory()
+    try:
+        return sorted(row[0] for row in db.query(Video.id).filter(Video.embedding.is_(None)).all())
+    finally:
+        db.close()
+
+
+def test_failed_index_write_leaves_videos_to_the_backfill(index, db_session_factory):
+    worker = EmbeddingIngestionWorker()
+    index.down = True
+
+    worker._process_safely([1, 2, 3])
+
+    # Nothing was committed for the index to miss, and the worker will retry
+    assert unembedded(db_session_factory) == list(range(1, N_VIDEOS + 1))
+    assert worker._backfilling
+
+    worker._backfill_safely()
+    assert not worker._backfilling
+    assert worker._backfill_retry_at is not None
+
+    index.down = False
+    while worker.backfill_batch():
+        pass
+    assert unembedded(db_session_factory) == []
+    assert index.get_total_vectors() == N_VIDEOS
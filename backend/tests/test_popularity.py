@@ -0,0 +1,74 @@
+import asyncio
+import threading
+import time
+
+from app.ml.popularity import PopularityService
+
+
+class FakeRefresh:
+    """Stands in for PopularityService.refresh: records its calls and blocks until released"""
+
+    def __init__(self, service):
+        self.service = service
+        self.calls = []
+        self.release = threading.Event()
+
+    def __call__(self, db, force=False):
+        self.calls.append(threading.current_thread().name)
+        self.release.wait(10)
+        self.service._lists = {None: [f"ranking {len(self.calls)}"]}
+        self.service._computed_at = time.time()
+
+
+def test_stale_ranking_is_served_while_one_background_refresh_runs(monkeypatch):
+    service = PopularityService()
+    service._lists = {None: ["stale ranking"]}
+    service._computed_at = time.time() - service.refresh_interval - 1
+    refresh = FakeRefresh(service)
+    monkeypatch.setattr(service, "refresh", refresh)
+
+    # Returns right away although the refresh is still blocked
+    assert [service.get_popular(None, 10) for _ in range(5)] == [["stale ranking"]] * 5
+
+    refresh.release.set()
+    deadline = time.monotonic() + 10
+    while service.get_popular(None, 10) == ["stale ranking"] and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert service.get_popular(None, 10) == ["ranking 1"]
+    assert refresh.calls == ["popularity-refresh"]
+
+
+def test_cold_start_computes_the_ranking_once(monkeypatch):
+    service = PopularityService()
+    refresh = FakeRefresh(service)
+    monkeypatch.setattr(service, "refresh", refresh)
+    results = []
+    callers = [threading.Thread(target=lambda: results.append(service.get_popular(None, 10))) for _ in range(5)]
+
+    for caller in callers:
+        caller.start()
+    time.sleep(0.1)
+    refresh.release.set()
+    for caller in callers:
+        caller.join(10)
+
+    assert len(refresh.calls) == 1
+    assert results == [["ranking 1"]] * 5
+
+
+def test_ensure_loaded_loads_off_the_event_loop(monkeypatch):
+    service = PopularityService()
+    refresh = FakeRefresh(service)
+    refresh.release.set()
+    monkeypatch.setattr(service, "refresh", refresh)
+
+    async def load_twice():
+        await service.ensure_loaded()
+        await service.ensure_loaded()
+        return threading.current_thread().name
+
+    loop_thread = asyncio.run(load_twice())
+
+    assert len(refresh.calls) == 1
+    assert refresh.calls[0] != loop_thread
+    assert service.get_popular(None, 10) == ["ranking 1"]
@@ -0,0 +1,44 @@
+import pytest
+
+from app.api.videos import filter_videos
+from app.models.video import Video
+
+
+@pytest.fixture
+def db(db_session_factory):
+    db = db_session_factory()
+    db.add_all([
+        Video(video_id="py", title="Python for Beginners", description="Variables and loops"),
+        Video(video_id="ml", title="Intro to Machine Learning", description="Training neural networks in python"),
+        Video(video_id="snake", title="Snakes of the Amazon", description="The python and the anaconda"),
+        Video(video_id="cook", title="Cooking Pasta", description="Boiling water"),
+    ])
+    db.commit()
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+def matching(db, search=None, q=None):
+    return sorted(video.video_id for video in filter_videos(db, None, search, q))
+
+
+def test_search_matches_substrings_case_insensitively(db):
+    assert matching(db, search="PYTH") == ["ml", "py", "snake"]
+    assert matching(db, search="ast") == ["cook"]
+    # A phrase is one substring, not words to match separately
+    assert matching(db, search="machine learning") == ["ml"]
+    assert matching(db, search="python -snake") == []
+
+
+def test_q_is_full_text_search(db):
+    # Whole stemmed words only
+    assert matching(db, q="pyth") == []
+    assert matching(db, q="network") == ["ml"]
+    assert matching(db, q="python -snake") == ["ml", "py"]
+    assert matching(db, q='"neural networks"') == ["ml"]
+
+
+def test_search_and_q_combine(db):
+    assert matching(db, search="beginner", q="python") == ["py"]
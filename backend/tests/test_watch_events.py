@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+
+import numpy as np
+
+from app.core.config import settings
+from app.ml import watch_events
+from app.ml.embeddings import embedding_service
+from app.ml.user_profile import user_profile_service
+from app.ml.watch_events import WatchEvent, WatchEventWriter
+from app.models.user import User
+from app.models.video import Video
+
+
+def event(video_id=1):
+    return WatchEvent(user_id=1, video_id=video_id, watch_duration=None, watch_percentage=None,
+                      watched_at=datetime.now(timezone.utc))
+
+
+def test_full_queue_refuses_events(monkeypatch):
+    monkeypatch.setattr(settings, "WATCH_QUEUE_MAX_EVENTS", 3)
+    writer = WatchEventWriter()
+
+    assert all(writer.record(event(video_id)) for video_id in range(3))
+    assert not writer.record(event(3))
+
+    assert writer.refused == 1
+    assert writer.queue.qsize() == 3
+
+
+def test_failing_batch_is_dropped_after_max_attempts(monkeypatch):
+    monkeypatch.setattr(settings, "WATCH_WRITE_MAX_ATTEMPTS", 3)
+    monkeypatch.setattr(settings, "WATCH_FLUSH_INTERVAL_SECONDS", 0.0)
+    writer = WatchEventWriter()
+    attempts = []
+
+    def failing_write(events):
+        attempts.append(len(events))
+        raise RuntimeError("database unavailable")
+    monkeypatch.setattr(writer, "write_batch", failing_write)
+
+    for video_id in range(4):
+        writer.record(event(video_id))
+    writer.flush()
+
+    assert attempts == [4, 4, 4]
+    assert writer.dropped == 4
+    assert writer.queue.empty()
+
+
+def test_batch_written_on_a_retry_is_not_dropped(monkeypatch):
+    monkeypatch.setattr(settings, "WATCH_FLUSH_INTERVAL_SECONDS", 0.0)
+    writer = WatchEventWriter()
+    attempts = []
+
+    def flaky_write(events):
+        attempts.append(list(events))
+        if len(attempts) == 1:
+            raise RuntimeError("serialization failure")
+    monkeypatch.setattr(writer, "write_batch", flaky_write)
+
+    recorded = event()
+    writer.record(recorded)
+    writer.flush()
+
+    assert attempts == [[recorded], [recorded]]
+    assert writer.dropped == 0
+
+
+def add_viewer_and_videos(db_session_factory, *videos):
+    """User 1 and the given videos, all with an embedding"""
+    db = db_session_factory()
+    try:
+        db.add(User(id=1, username="viewer", email="viewer@example.com", hashed_password="x"))
+        for video in videos:
+            video.video_id, video.title = f"vid-{video.id}", f"Video {video.id}"
+            video.embedding = np.ones(embedding_service.dimension, dtype="float32")
+        db.add_all(videos)
+        db.commit()
+    finally:
+        db.close()
+
+
+def test_view_counts_leave_updated_at_alone(db_session_factory, monkeypatch):
+    edited_at = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    add_viewer_and_videos(
+        db_session_factory, *(Video(id=video_id, views=10, updated_at=edited_at) for video_id in (1, 2))
+    )
+    monkeypatch.setattr(watch_events, "SessionLocal", db_session_factory)
+
+    WatchEventWriter().write_batch([event(1), event(1), event(2)])
+
+    db = db_session_factory()
+    try:
+        rows = db.query(Video.id, Video.views, Video.updated_at).order_by(Video.id).all()
+    finally:
+        db.close()
+    assert rows == [(1, 12, edited_at), (2, 11, edited_at)]
+
+
+def test_watches_keep_the_stored_watched_labels_up_to_date(db_session_factory, monkeypatch):
+    add_viewer_and_videos(
+        db_session_factory,
+        Video(id=1, category="Music", tags=["jazz", "live"]),
+        Video(id=2, category="Education", tags=["jazz", "theory"]),
+        Video(id=3)
+    )
+    monkeypatch.setattr(watch_events, "SessionLocal", db_session_factory)
+    writer = WatchEventWriter()
+
+    def stored_labels():
+        db = db_session_factory()
+        try:
+            return user_profile_service.get_watched_labels(db, [1])
+        finally:
+            db.close()
+
+    # The first watch creates the profile from the history
+    writer.write_batch([event(1)])
+    assert stored_labels() == {1: (["Music"], ["jazz", "live"])}
+
+    writer.write_batch([event(2), event(3), event(1)])
+    assert stored_labels() == {1: (["Education", "Music"], ["jazz", "live", "theory"])}